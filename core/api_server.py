@@ -0,0 +1,440 @@
+# core/api_server.py
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+DEFAULT_HOST = "127.0.0.1"  # محلي فقط: الخادم بلا مصادقة
+DEFAULT_PORT = 8765
+
+MAX_HEADER_COUNT = 100
+MAX_BODY_BYTES = 1024 * 1024
+IDLE_TIMEOUT = 30.0  # ثوانٍ قبل إغلاق اتصال keep-alive خامل
+
+class HTTPError(Exception):
+    """خطأ يُعاد للعميل كـ {"error": الرسالة} مع رمز الحالة"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+class TutorAPIServer:
+    """خادم HTTP محلي (asyncio، المكتبة القياسية فقط) حول SmartTutorPro
+
+    العمل الحسابي (النموذج، البحث في المستندات، تقييم المقالات) يُنفذ في مجمع خيوط؛
+    حلقة الأحداث تستقبل الاتصالات فقط. عدد المهام المتزامنة محدود بـ max_concurrency،
+    ومن ينتظر دوره محدود بـ max_queue؛ ما زاد يُرفض فوراً بـ 503 و Retry-After.
+    """
+
+    def __init__(self, tutor, host=DEFAULT_HOST, port=DEFAULT_PORT, max_concurrency=None, max_queue=64,
+                 quiz_system=None, essay_evaluator=None, latency_window=1000):
+        self.tutor = tutor
+        self.host = host
+        self.port = port
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.max_queue = max_queue
+
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="tutor-api")
+        self._slots = None  # Semaphore يُنشأ داخل حلقة الأحداث
+        self._server = None
+        self._started_at = None
+
+        # الاختبارات والمقالات تُنشأ عند أول طلب
+        self._quiz_system = quiz_system
+        self._essay_evaluator = essay_evaluator
+
+        self.routes = {
+            ("GET", "/health"): self.handle_health,
+            ("GET", "/metrics"): self.handle_metrics,
+            ("POST", "/ask"): self.handle_ask,
+            ("POST", "/ask/stream"): self.handle_ask_stream,
+            ("POST", "/documents"): self.handle_add_document,
+            ("POST", "/quiz"): self.handle_generate_quiz,
+            ("POST", "/quiz/evaluate"): self.handle_evaluate_quiz,
+            ("POST", "/essay"): self.handle_evaluate_essay
+        }
+
+        # إحصائيات
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.requests = {}
+        self.statuses = {}
+        self.latencies = deque(maxlen=latency_window)
+
+    # ---- التشغيل ----
+
+    async def start(self):
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]  # المنفذ الفعلي عند port=0
+        self._started_at = time.time()
+        print(f"✅ خادم SmartTutor يعمل على http://{self.host}:{self.port}")
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=True)
+
+    # ---- المهام الحسابية ----
+
+    @asynccontextmanager
+    async def _slot(self):
+        """مكان واحد ضمن حد التزامن؛ 503 فوراً إذا امتلأ طابور الانتظار"""
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "الخادم مشغول، حاول بعد قليل", {"Retry-After": "1"})
+
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    async def run_blocking(self, fn, *args, **kwargs):
+        """تنفيذ fn في مجمع الخيوط ضمن حد التزامن؛ 503 إذا امتلأ طابور الانتظار"""
+        async with self._slot():
+            return await asyncio.get_running_loop().run_in_executor(self.executor, partial(fn, *args, **kwargs))
+
+    # ---- بروتوكول HTTP ----
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), IDLE_TIMEOUT)
+                except HTTPError as e:
+                    await self._write_json(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._dispatch(writer, method, path, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    async def _read_line(reader):
+        """سطر واحد؛ السطر الأطول من حد القارئ (64 كيلوبايت) يُرفض بـ 431"""
+        try:
+            return await reader.readline()
+        except (ValueError, asyncio.LimitOverrunError):
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "سطر طلب أو رأس طويل جداً")
+
+    async def _read_request(self, reader):
+        """قراءة طلب واحد: (الطريقة، المسار، الرؤوس، الجسم) أو None عند إغلاق الاتصال"""
+        request_line = await self._read_line(reader)
+        if not request_line.strip():
+            return None
+
+        try:
+            method, target, _ = request_line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "سطر طلب غير صالح")
+
+        headers = {}
+        while True:
+            line = await self._read_line(reader)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADER_COUNT:
+                raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "رؤوس كثيرة جداً")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Content-Length غير صالح")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "جسم الطلب كبير جداً")
+
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), urlsplit(target).path, headers, body
+
+    async def _dispatch(self, writer, method, path, body, keep_alive):
+        started = time.perf_counter()
+        handler = self.routes.get((method, path))
+        route = path if handler else "unknown"
+
+        try:
+            if handler is None:
+                if any(route_path == path for _, route_path in self.routes):
+                    raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"الطريقة {method} غير مدعومة لـ {path}")
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"مسار غير موجود: {path}")
+
+            payload = self._parse_json(body) if method == "POST" else {}
+            result = await handler(payload)
+
+            status = HTTPStatus.OK
+            if hasattr(result, "__aiter__"):
+                await self._write_stream(writer, result, keep_alive)
+            else:
+                await self._write_json(writer, status, result, keep_alive)
+        except HTTPError as e:
+            status = e.status
+            await self._write_json(writer, status, {"error": e.message}, keep_alive, e.headers)
+        except Exception as e:
+            print(f"❌ خطأ في معالجة الطلب {path}: {e}")
+            status = HTTPStatus.INTERNAL_SERVER_ERROR
+            await self._write_json(writer, status, {"error": "خطأ داخلي في الخادم"}, keep_alive)
+
+        self.requests[route] = self.requests.get(route, 0) + 1
+        self.statuses[int(status)] = self.statuses.get(int(status), 0) + 1
+        self.latencies.append(time.perf_counter() - started)
+
+    @staticmethod
+    def _parse_json(body):
+        if not body:
+            return {}
+        try:
+            payload = json.loads(body.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "جسم الطلب ليس JSON صالحاً")
+        if not isinstance(payload, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "جسم الطلب يجب أن يكون كائن JSON")
+        return payload
+
+    @staticmethod
+    def _status_line(status):
+        status = HTTPStatus(status)
+        return f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+
+    async def _write_json(self, writer, status, payload, keep_alive, extra_headers=None):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        headers = {
+            "Content-Type": "application/json; charset=utf-8",
+            "Content-Length": str(len(body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **(extra_headers or {})
+        }
+        head = self._status_line(status) + "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await writer.drain()
+
+    async def _write_stream(self, writer, chunks, keep_alive):
+        """استجابة مقسمة (chunked): سطر JSON لكل عنصر فور جهوزيته
+
+        العنصر الأول يُنتظر قبل إرسال الرؤوس، فخطأ البداية (مثل 503) يبقى استجابة JSON عادية.
+        المولد يُغلق دائماً، حتى عند انقطاع العميل.
+        """
+        def write_chunk(item):
+            line = json.dumps(item, ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+            writer.write(f"{len(line):X}\r\n".encode("latin-1") + line + b"\r\n")
+
+        try:
+            try:
+                first = [await chunks.__anext__()]
+            except StopAsyncIteration:
+                first = []
+
+            head = (self._status_line(HTTPStatus.OK) +
+                    "Content-Type: application/x-ndjson; charset=utf-8\r\n"
+                    "Transfer-Encoding: chunked\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+            writer.write(head.encode("latin-1"))
+
+            try:
+                for item in first:
+                    write_chunk(item)
+                    await writer.drain()
+                async for item in chunks:
+                    write_chunk(item)
+                    await writer.drain()
+            except ConnectionError:
+                raise
+            except HTTPError as e:
+                # الرؤوس أُرسلت بالفعل: الخطأ يصبح آخر سطر في الاستجابة
+                write_chunk({"error": e.message})
+            except Exception as e:
+                print(f"❌ خطأ أثناء بث الإجابة: {e}")
+                write_chunk({"error": "خطأ داخلي في الخادم"})
+
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            await chunks.aclose()
+
+    # ---- المسارات ----
+
+    @staticmethod
+    def _require(payload, *names):
+        missing = [name for name in names if payload.get(name) in (None, "")]
+        if missing:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"حقول مطلوبة: {', '.join(missing)}")
+        return [payload[name] for name in names]
+
+    async def handle_health(self, payload):
+        return {
+            "status": "ok",
+            "uptime_seconds": round(time.time() - self._started_at, 1) if self._started_at else 0.0,
+            "smart_mode": getattr(self.tutor, "smart_mode", None)
+        }
+
+    async def handle_metrics(self, payload):
+        latencies = sorted(self.latencies)
+
+        def percentile(q):
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2) if latencies else 0.0
+
+        metrics = {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "requests": dict(self.requests),
+            "statuses": dict(self.statuses),
+            "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99)}
+        }
+        for name in ("cache", "inflight"):
+            component = getattr(self.tutor, name, None)
+            if component is not None and hasattr(component, "get_stats"):
+                # خارج حد التزامن حتى تبقى المقاييس متاحة تحت الضغط
+                metrics[name] = await asyncio.get_running_loop().run_in_executor(None, component.get_stats)
+        return metrics
+
+    async def handle_ask(self, payload):
+        (question,) = self._require(payload, "question")
+        return await self.run_blocking(
+            self.tutor.process_question, question, payload.get("subject"),
+            payload.get("smart", True), payload.get("target_language", "ar")
+        )
+
+    async def handle_ask_stream(self, payload):
+        """أقسام الإجابة كأسطر JSON فور جهوزيتها (stream_question)"""
+        (question,) = self._require(payload, "question")
+        args = (question, payload.get("subject"), payload.get("smart", True), payload.get("target_language", "ar"))
+
+        async def stream():
+            # مكان واحد في حد التزامن للبث كله، فلا يُرفض بث بعد بدئه
+            async with self._slot():
+                sections = self.tutor.stream_question(*args)
+                done = object()
+                step = None
+                try:
+                    while True:
+                        step = self.executor.submit(next, sections, done)
+                        item = await asyncio.wrap_future(step)
+                        if item is done:
+                            break
+                        section, content = item
+                        yield {"section": section, "content": content}
+                finally:
+                    # المولد لا يُغلق أثناء تنفيذ قسم في خيط آخر (مثلاً بعد انقطاع العميل)
+                    if step is not None and not step.done():
+                        await asyncio.wait([asyncio.wrap_future(step)])
+                    sections.close()
+
+        return stream()
+
+    async def handle_add_document(self, payload):
+        (path,) = self._require(payload, "path")
+        if not os.path.isfile(path):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"الملف غير موجود: {path}")
+        success, message = await self.run_blocking(self.tutor.add_document, path, payload.get("subject", "general"))
+        return {"success": success, "message": message}
+
+    def quiz_system(self):
+        if self._quiz_system is None:
+            from core.quiz_system import QuizSystem
+            self._quiz_system = QuizSystem(self.tutor.ai_model.knowledge_base)
+        return self._quiz_system
+
+    def essay_evaluator(self):
+        if self._essay_evaluator is None:
+            from writing_assistant import AdvancedEssayEvaluator
+            self._essay_evaluator = AdvancedEssayEvaluator()
+        return self._essay_evaluator
+
+    async def handle_generate_quiz(self, payload):
+        (subject,) = self._require(payload, "subject")
+        try:
+            num_questions = int(payload.get("num_questions", 5))
+        except (TypeError, ValueError):
+            num_questions = 0
+        if num_questions < 1:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "num_questions يجب أن يكون عدداً صحيحاً موجباً")
+
+        quiz = await self.run_blocking(
+            lambda: self.quiz_system().generate_quiz(subject, payload.get("difficulty", "medium"), num_questions)
+        )
+        if quiz is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"لا توجد أسئلة لمادة: {subject}")
+        return quiz
+
+    async def handle_evaluate_quiz(self, payload):
+        quiz, answers = self._require(payload, "quiz", "answers")
+        if not isinstance(quiz, dict) or not isinstance(quiz.get("questions"), list) or not quiz["questions"]:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "اختبار غير صالح")
+        return await self.run_blocking(lambda: self.quiz_system().evaluate_quiz(quiz, answers))
+
+    async def handle_evaluate_essay(self, payload):
+        text, topic = self._require(payload, "text", "topic")
+        return await self.run_blocking(
+            lambda: self.essay_evaluator().evaluate_essay(
+                text, payload.get("language", "arabic"), topic, payload.get("student_level", "intermediate")
+            )
+        )
+
+def enable_offline_mode():
+    """النماذج تُقرأ من الذاكرة المحلية فقط"""
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+def run_api_server(host=DEFAULT_HOST, port=DEFAULT_PORT, max_concurrency=None, max_queue=64, tutor=None):
+    """تشغيل الخادم محلياً دون أي اتصال بالإنترنت؛ المعلم الذي يُنشأ هنا يُغلق عند التوقف"""
+    owns_tutor = tutor is None
+    if owns_tutor:
+        enable_offline_mode()
+        from main import SmartTutorPro
+        tutor = SmartTutorPro()
+    # جلب صفحات الويب معطل
+    tutor.doc_processor.online_enabled = False
+
+    server = TutorAPIServer(tutor, host, port, max_concurrency, max_queue)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("\n👋 تم إيقاف الخادم")
+    finally:
+        if owns_tutor:
+            tutor.close()
+
+if __name__ == "__main__":
+    run_api_server()
@@ -2,6 +2,7 @@
 import os
 import sqlite3
 import json
+import hashlib
 import re
 import time
 from pathlib import Path
@@ -21,6 +22,8 @@ import numpy as np
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 
+from utils.text_normalization import normalize_text
+
 class DocumentProcessor:
     def __init__(self, base_dir: str = "smarttutor_data"):
         self.base_dir = Path(base_dir)
@@ -156,7 +159,7 @@ class DocumentProcessor:
         return safe[:120]
     
     def embed_texts(self, texts: List[str]) -> np.ndarray:
-        """إنشاء تضمينات للنصوص"""
+        """إنشاء تضمينات للنصوص كما هي (النموذج العصبي يرى التشكيل والهمزات)"""
         if not texts:
             return np.array([])
         
@@ -182,33 +185,7 @@ class DocumentProcessor:
         chunks = self.chunk_text(text)
         if not chunks:
             return False, "لا يمكن تقسيم النص إلى أجزاء مناسبة"
-        # في core/document_processor.py - التعلم التلقائي
-def learn_from_documents(self):
-    """التعلم التلقائي من المستندات المضافة"""
-    for subject in self.ram_knowledge:
-        if subject not in self.known_subjects:
-            print(f"🎯 تعلم مادة جديدة: {subject}")
-            self._add_new_subject_to_knowledge(subject)
-
-def _add_new_subject_to_knowledge(self, subject):
-    """إضافة مادة جديدة إلى قاعدة المعرفة"""
-    # يمكنك هنا إضافة المنطق لإنشاء معرفة أولية للمادة الجديدة
-    # بناءً على المحتوى المستخرج من المستندات
-    
-    basic_concepts = {
-        "basic": {
-            "ar": f"هذا مفهوم أساسي في مادة {subject}",
-            "en": f"This is a basic concept in {subject}",
-            "fr": f"C'est un concept de base en {subject}"
-        }
-    }
-    
-    # إضافة للمعرفة المؤقتة
-    if subject not in self.ram_knowledge:
-        self.ram_knowledge[subject] = {}
-    
-        # يمكن حفظها بشكل دائم أيضاً
-        self._save_subject_knowledge(subject, basic_concepts)
+        
         # إنشاء التضمينات
         embeddings = self.embed_texts(chunks)
         
@@ -235,6 +212,15 @@ def _add_new_subject_to_knowledge(self, subject):
         self.extract_and_save_concepts(chunks, subject, title)
         
         return True, f"تمت إضافة المستند: {title} ({len(chunks)} جزء)"
+
+    def fingerprint(self) -> str:
+        """بصمة فهرس المستندات المحمل: نموذج التضمين والأجزاء والمفاهيم المستخرجة"""
+        source = json.dumps(
+            [self.model_name, sorted(self.ram_chunks.items()), self.ram_knowledge],
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
     
     def extract_and_save_concepts(self, chunks: List[str], subject: str, source: str):
         """استخراج وحفظ المفاهيم من النص"""
@@ -255,17 +241,17 @@ def _add_new_subject_to_knowledge(self, subject):
             if 3 <= len(words) <= 25:  # جمل معقولة الطول
                 candidates.append(sentence[:200])  # تقليل الطول
         
-        # إزالة التكرارات
-        unique_candidates = list(set(candidates))
+        # إزالة التكرارات (الصيغ المختلفة لنفس الجملة، مثل التشكيل وأشكال الهمزة، مفتاحها واحد)
+        unique_candidates = {normalize_text(candidate): candidate for candidate in candidates}
         
         # حفظ المفاهيم
         if subject not in self.ram_knowledge:
             self.ram_knowledge[subject] = {}
         
-        for concept in unique_candidates:
+        for concept, original in unique_candidates.items():
             if concept not in self.ram_knowledge[subject]:
                 self.ram_knowledge[subject][concept] = {
-                    "explain": concept,
+                    "explain": original,
                     "weight": 1,
                     "sources": [source]
                 }
@@ -279,7 +265,7 @@ def _add_new_subject_to_knowledge(self, subject):
         top_k = top_k or self.top_k
         
         # تضمين السؤال
-        question_embedding = self.model.encode([question], convert_to_numpy=True)
+        question_embedding = self.embed_texts([question])
         
         results = []
         
@@ -309,8 +295,8 @@ def _add_new_subject_to_knowledge(self, subject):
         if subject and subject in self.ram_knowledge:
             knowledge_items = list(self.ram_knowledge[subject].items())
             if knowledge_items:
-                concepts = [item[0] for item in knowledge_items]
-                concept_embeddings = self.model.encode(concepts, convert_to_numpy=True)
+                # المفتاح المطبَّع للبحث وإزالة التكرار فقط؛ التضمين للنص الأصلي
+                concept_embeddings = self.embed_texts([data['explain'] for _, data in knowledge_items])
                 
                 concept_similarities = cosine_similarity(question_embedding, concept_embeddings)[0]
                 top_concept_indices = np.argsort(concept_similarities)[::-1][:top_k]
@@ -363,6 +349,34 @@ def _add_new_subject_to_knowledge(self, subject):
         except Exception as e:
             return None, f"خطأ في جلب المحتوى: {e}"
 
+# في core/document_processor.py - التعلم التلقائي
+def learn_from_documents(self):
+    """التعلم التلقائي من المستندات المضافة"""
+    for subject in self.ram_knowledge:
+        if subject not in self.known_subjects:
+            print(f"🎯 تعلم مادة جديدة: {subject}")
+            self._add_new_subject_to_knowledge(subject)
+
+def _add_new_subject_to_knowledge(self, subject):
+    """إضافة مادة جديدة إلى قاعدة المعرفة"""
+    # يمكنك هنا إضافة المنطق لإنشاء معرفة أولية للمادة الجديدة
+    # بناءً على المحتوى المستخرج من المستندات
+    
+    basic_concepts = {
+        "basic": {
+            "ar": f"هذا مفهوم أساسي في مادة {subject}",
+            "en": f"This is a basic concept in {subject}",
+            "fr": f"C'est un concept de base en {subject}"
+        }
+    }
+    
+    # إضافة للمعرفة المؤقتة
+    if subject not in self.ram_knowledge:
+        self.ram_knowledge[subject] = {}
+    
+        # يمكن حفظها بشكل دائم أيضاً
+        self._save_subject_knowledge(subject, basic_concepts)
+
 # اختبار النظام
 def test_document_processor():
     """اختبار نظام معالجة المستندات"""
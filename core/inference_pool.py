@@ -0,0 +1,274 @@
+# core/inference_pool.py
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+import torch.multiprocessing as mp
+
+from models.checkpoint_io import materialize_weights
+from models.fast_tokenizer import CompiledTokenizer
+
+def _worker_spec(ai):
+    """مدخلات قابلة للنقل بـ pickle لعامل spawn: النموذج (أوزانه في ذاكرة مشتركة) وما يلزم لإعادة بناء الباقي"""
+    return {
+        "model": ai.model,
+        "tokenizer": ai.tokenizer,
+        "quantized": ai.quantized,
+        "early_exit": ai.early_exit,
+        "backend": ai.backend_name,
+        "backend_path": getattr(ai.backend, "path", None)
+    }
+
+def _rebuild_ai(model, tokenizer, quantized, early_exit, backend, backend_path):
+    """بناء PolyglotEducationalAI داخل العامل حول أوزان العملية الرئيسية المشتركة"""
+    from models.polyglot_tutor import PolyglotEducationalAI
+
+    ai = PolyglotEducationalAI(early_exit=early_exit)
+    ai.model, ai.config, ai.quantized = model, model.config, quantized
+    ai.tokenizer = tokenizer
+    ai.token_encoder = CompiledTokenizer(tokenizer, model.config.max_position_embeddings)
+    ai.set_backend(backend, backend_path)
+    return ai
+
+def _worker_main(worker_id, ai, requests, results, num_threads):
+    """حلقة العامل: استقبال دفعات الأسئلة وإرجاع الإجابات"""
+    # خيط واحد لكل عامل حتى لا تتزاحم العمليات على الأنوية
+    torch.set_num_threads(num_threads)
+    if isinstance(ai, dict):
+        ai = _rebuild_ai(**ai)
+
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+
+        request_id, questions, target_language = request
+        try:
+            results.put((request_id, worker_id, ai.ask_questions(questions, target_language), None))
+        except Exception as e:
+            results.put((request_id, worker_id, None, repr(e)))
+
+class InferencePool:
+    """مجموعة عمليات استدلال تتشارك أوزان نموذج واحد
+
+    يُحمَّل PolyglotEducationalAI مرة واحدة في العملية الرئيسية. مع fork ترث العمليات
+    الأوزان بنسخ-عند-الكتابة (والاستدلال لا يكتب فيها). مع spawn تُنقل الأوزان
+    إلى ذاكرة مشتركة (share_memory) ويُعاد بناء بقية النموذج داخل كل عامل. توزيع الطلبات حسب أقصر طابور أو بالتناوب.
+    العامل الذي يتوقف فجأة تفشل طلباته الجارية ولا تُرسل له طلبات جديدة.
+    """
+
+    LIVENESS_INTERVAL = 0.5  # ثوانٍ بين فحوص حياة العمال عندما لا تصل نتائج
+
+    def __init__(self, num_workers=None, model_path=None, dispatch="least_loaded",
+                 start_method=None, threads_per_worker=1, ai=None, result_timeout=60.0, **ai_kwargs):
+        if dispatch not in ("least_loaded", "round_robin"):
+            raise ValueError(f"طريقة توزيع غير معروفة: {dispatch}")
+
+        if ai is None:
+            from models.polyglot_tutor import PolyglotEducationalAI
+            ai = PolyglotEducationalAI(model_path=model_path, **ai_kwargs)
+
+        # رفع الأوزان الكسولة قبل بدء العمال حتى يتشاركوا نسخة واحدة بدل نسخة خاصة لكل عامل
+        materialize_weights(ai.model)
+
+        if start_method is None:
+            start_method = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+        worker_ai = ai
+        if start_method != "fork":
+            ai.model.share_memory()
+            worker_ai = _worker_spec(ai)
+
+        self.dispatch = dispatch
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.result_timeout = result_timeout
+        context = mp.get_context(start_method)
+
+        self._results = context.Queue()
+        self._queues = [context.Queue() for _ in range(self.num_workers)]
+        self._workers = [
+            context.Process(
+                target=_worker_main,
+                args=(worker_id, worker_ai, self._queues[worker_id], self._results, threads_per_worker),
+                daemon=True
+            )
+            for worker_id in range(self.num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+        self._lock = threading.Lock()
+        self._pending = {}  # رقم الطلب: (Future، رقم العامل)
+        self._depth = [0] * self.num_workers
+        self._alive = [True] * self.num_workers
+        self._request_ids = itertools.count()
+        self._round_robin = itertools.cycle(range(self.num_workers))
+        self.dispatched = [0] * self.num_workers
+        self._closed = False
+
+        self._collector = threading.Thread(target=self._collect_results, daemon=True)
+        self._collector.start()
+
+    def _choose_worker(self):
+        """اختيار عامل حي (يجب استدعاؤها تحت القفل)"""
+        if not any(self._alive):
+            raise RuntimeError("توقف كل عمال مجموعة الاستدلال")
+        if self.dispatch == "round_robin":
+            return next(worker_id for worker_id in self._round_robin if self._alive[worker_id])
+        alive = [worker_id for worker_id in range(self.num_workers) if self._alive[worker_id]]
+        return min(alive, key=self._depth.__getitem__)
+
+    def submit(self, questions, target_language="ar"):
+        """إرسال دفعة أسئلة لعامل واحد؛ يُرجع Future بقائمة النتائج"""
+        if self._closed:
+            raise RuntimeError("تم إغلاق مجموعة الاستدلال")
+
+        future = Future()
+        with self._lock:
+            request_id = next(self._request_ids)
+            worker_id = self._choose_worker()
+            self._pending[request_id] = (future, worker_id)
+            self._depth[worker_id] += 1
+            self.dispatched[worker_id] += 1
+
+        self._queues[worker_id].put((request_id, list(questions), target_language))
+        return future
+
+    def ask_question(self, question, target_language="ar"):
+        """نفس واجهة PolyglotEducationalAI.ask_question (TimeoutError بعد result_timeout)"""
+        return self.submit([question], target_language).result(timeout=self.result_timeout)[0]
+
+    def ask_questions(self, questions, target_language="ar", chunk_size=32):
+        """تقسيم الأسئلة على العمال بالتوازي مع الحفاظ على الترتيب (مهلة واحدة للدفعات كلها)"""
+        futures = [
+            self.submit(questions[start:start + chunk_size], target_language)
+            for start in range(0, len(questions), chunk_size)
+        ]
+        if self.result_timeout is None:
+            return [result for future in futures for result in future.result()]
+
+        deadline = time.monotonic() + self.result_timeout
+        return [result for future in futures
+                for result in future.result(timeout=max(0.0, deadline - time.monotonic()))]
+
+    def _collect_results(self):
+        while True:
+            try:
+                message = self._results.get(timeout=self.LIVENESS_INTERVAL)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            if message is None:
+                break
+
+            request_id, worker_id, answers, error = message
+            with self._lock:
+                pending = self._pending.pop(request_id, None)
+                if pending is not None:
+                    self._depth[worker_id] -= 1
+            if pending is None:
+                continue  # فشل الطلب سابقاً لتوقف العامل
+
+            if error is None:
+                pending[0].set_result(answers)
+            else:
+                pending[0].set_exception(RuntimeError(error))
+            self._check_workers()
+
+    def _check_workers(self):
+        """إفشال طلبات العمال المتوقفين حتى لا ينتظرها المستدعون إلى الأبد"""
+        for worker_id, worker in enumerate(self._workers):
+            if not self._alive[worker_id] or worker.is_alive():
+                continue
+
+            with self._lock:
+                self._alive[worker_id] = False
+                failed = [request_id for request_id, (_, owner) in self._pending.items() if owner == worker_id]
+                futures = [self._pending.pop(request_id)[0] for request_id in failed]
+                self._depth[worker_id] = 0
+
+            if not self._closed:
+                print(f"⚠️ توقف العامل {worker_id} (رمز الخروج {worker.exitcode})، فشل {len(futures)} طلب")
+            for future in futures:
+                future.set_exception(RuntimeError(f"توقف العامل {worker_id} (رمز الخروج {worker.exitcode})"))
+
+    def worker_pids(self):
+        return [worker.pid for worker in self._workers]
+
+    def get_stats(self):
+        """عدد العمال والطلبات الجارية وتوزيع الطلبات"""
+        with self._lock:
+            return {
+                "workers": self.num_workers,
+                "dispatch": self.dispatch,
+                "in_flight": len(self._pending),
+                "queue_depth": list(self._depth),
+                "dispatched": list(self.dispatched),
+                "alive": list(self._alive)
+            }
+
+    def close(self):
+        """إيقاف العمال بعد إنهاء الطلبات الجارية"""
+        if self._closed:
+            return
+        self._closed = True
+
+        for requests in self._queues:
+            requests.put(None)
+        for worker in self._workers:
+            worker.join()
+
+        self._results.put(None)
+        self._collector.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _private_memory_mb(pid):
+    """الصفحات الخاصة فعلاً بعملية (غير المشتركة مع الأب) من smaps_rollup على لينكس"""
+    try:
+        private_kb = 0
+        with open(f"/proc/{pid}/smaps_rollup") as smaps:
+            for line in smaps:
+                if line.startswith(("Private_Clean", "Private_Dirty")):
+                    private_kb += int(line.split()[1])
+        return private_kb / 1024
+    except OSError:
+        return None
+
+def benchmark_inference_pool(worker_counts=(1, 2, 4), num_questions=512):
+    """الإنتاجية والذاكرة الخاصة لكل عامل مع عدد متزايد من العمليات"""
+    import time
+    from models.polyglot_tutor import PolyglotEducationalAI
+    from models.model_optimizer import ModelOptimizer
+
+    # المسار العصبي فقط حتى يُقاس الاستدلال فعلاً
+    ai = PolyglotEducationalAI(early_exit=False)
+    calibration = ModelOptimizer.build_calibration_questions(ai.knowledge_base)
+    questions = [calibration[i % len(calibration)] for i in range(num_questions)]
+    model_mb = sum(p.numel() * p.element_size() for p in ai.model.parameters()) / 1024 ** 2
+
+    results = {}
+    for num_workers in worker_counts:
+        with InferencePool(num_workers, ai=ai) as pool:
+            pool.ask_questions(questions[:64])  # تسخين
+            started = time.perf_counter()
+            pool.ask_questions(questions, chunk_size=16)
+            throughput = num_questions / (time.perf_counter() - started)
+            private = [_private_memory_mb(pid) for pid in pool.worker_pids()]
+
+        results[num_workers] = {"throughput": throughput, "worker_private_mb": private}
+        private_text = ", ".join(f"{mb:.0f}" for mb in private if mb is not None)
+        print(f"📊 {num_workers} عامل: {throughput:.1f} سؤال/ث | ذاكرة خاصة لكل عامل: {private_text} ميجابايت "
+              f"(حجم أوزان النموذج {model_mb:.0f} ميجابايت)")
+
+    return results
+
+if __name__ == "__main__":
+    benchmark_inference_pool()
@@ -0,0 +1,61 @@
+# core/single_flight.py
+import threading
+from concurrent.futures import Future
+
+class SingleFlight:
+    """دمج الطلبات المتطابقة الجارية: أول طلب يحسب والبقية تنتظر نفس النتيجة"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+        # إحصائيات
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """تنفيذ fn مرة واحدة لكل مفتاح جارٍ وإرجاع نتيجتها لكل المنتظرين"""
+        with self._lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[key] = future
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not is_leader:
+            # الاستثناء يُعاد رفعه لدى كل المنتظرين أيضاً
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._forget(key)
+            future.set_exception(e)
+            raise
+
+        self._forget(key)
+        future.set_result(result)
+        return result
+
+    def _forget(self, key):
+        # نحذف المفتاح قبل إعلان النتيجة حتى تبدأ الطلبات اللاحقة حساباً (أو قراءة تخزين) جديداً
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def in_flight(self):
+        """عدد المفاتيح قيد الحساب حالياً"""
+        with self._lock:
+            return len(self._inflight)
+
+    def get_stats(self):
+        """إحصائيات الدمج"""
+        total = self.executions + self.coalesced
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight(),
+            "coalesced_ratio": round(self.coalesced / total, 3) if total else 0.0
+        }
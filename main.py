@@ -7,59 +7,187 @@ SmartTutor Pro - النظام التعليمي الذكي المتكامل
 
 import os
 import sys
+import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # إضافة المسارات للمكتبات
 sys.path.append(str(Path(__file__).parent))
 
 from models.polyglot_tutor import PolyglotEducationalAI
+from models.checkpoint_io import fingerprint_weights
 from core.document_processor import DocumentProcessor
-from ui.kivy_interface import EnhancedTutorApp
+from core.cache_system import SmartCache
+from core.single_flight import SingleFlight
 
 class SmartTutorPro:
     """النظام التعليمي الذكي المتكامل"""
     
-    def __init__(self):
-        self.ai_model = PolyglotEducationalAI()
-        self.doc_processor = DocumentProcessor()
+    def __init__(self, hedged: bool = False, ai_model=None, doc_processor=None, cache=None):
+        self.ai_model = ai_model or PolyglotEducationalAI()
+        self.doc_processor = doc_processor or DocumentProcessor()
         self.smart_mode = True
         
+        # تشغيل البحث في المستندات بالتوازي مع النموذج الذكي بدلاً من بعده؛
+        # الخيوط تُنشأ عند أول استخدام وتُغلق بـ close()
+        self.hedged = hedged
+        self._executor = ThreadPoolExecutor(thread_name_prefix="tutor-hedge")
+        self._searches = set()  # عمليات البحث الجارية أو المنتظرة، يلغيها close()
+        
+        # دمج الأسئلة المتطابقة المتزامنة (مثلاً فصل كامل يسأل نفس السؤال)
+        self.inflight = SingleFlight()
+        
+        # تخزين الإجابات الكاملة؛ الإصدار جزء من المفتاح ويُحسب من حالة المصادر الفعلية،
+        # فالعمليات ذات الأوزان والمستندات نفسها تتشارك التخزين المؤقت الدائم والمختلفة لا تتشاركه
+        self.cache = cache or SmartCache()
+        self._weights_fingerprint = fingerprint_weights(self.ai_model.model)
+        self.sources_version = None
+        self._refresh_sources_version()
+        
         print("🚀 تم تحميل SmartTutor Pro بنجاح!")
         print("📚 النظام جاهز للتعلم متعدد اللغات")
     
-    def process_question(self, question: str, subject: str = None, use_smart_ai: bool = True):
+    def process_question(self, question: str, subject: str = None, use_smart_ai: bool = True,
+                         target_language: str = "ar"):
         """معالجة السؤال باستخدام النظام المدمج"""
+        cache_params = self._cache_params(use_smart_ai, target_language)
+        
+        # سؤال مكرر: قراءة واحدة من التخزين المؤقت
+        cached_result = self.cache.get(question, subject, **cache_params)
+        if cached_result is not None:
+            return cached_result
+        
+        request_key = self.cache.get_cache_key(question, subject, **cache_params)
+        result = self.inflight.do(
+            request_key, self._answer_and_cache,
+            question, subject, use_smart_ai, target_language, cache_params
+        )
+        
+        # نسخة لكل مستدعٍ حتى لا يعدّل أحدهم نتيجة الآخرين
+        return dict(result)
+    
+    def _cache_params(self, use_smart_ai: bool, target_language: str):
+        """كل ما يؤثر على الإجابة غير السؤال والمادة"""
+        return {
+            'smart_mode': bool(use_smart_ai and self.smart_mode),
+            'target_language': target_language,
+            'sources_version': self.sources_version
+        }
+    
+    def _answer_and_cache(self, question, subject, use_smart_ai, target_language, cache_params, search=None):
+        """حساب الإجابة مرة واحدة وحفظها لبقية المنتظرين والأسئلة اللاحقة"""
+        started = time.perf_counter()
+        result = self._answer_question(question, subject, use_smart_ai, target_language, search)
+        
+        # تكلفة الحساب تساعد التخزين المؤقت على إبقاء الإجابات المكلفة
+        self.cache.set(question, result, subject, cost=time.perf_counter() - started, **cache_params)
+        return result
+    
+    def _refresh_sources_version(self):
+        """إعادة حساب إصدار مصادر الإجابة من الأوزان والمحتوى التعليمي وفهرس المستندات"""
+        content = json.dumps([
+            self._weights_fingerprint,
+            self.ai_model.knowledge_base.subjects.fingerprint(),
+            self.doc_processor.fingerprint()
+        ])
+        self.sources_version = hashlib.md5(content.encode('utf-8')).hexdigest()[:12]
+        return self.sources_version
+    
+    def _answer_question(self, question: str, subject: str = None, use_smart_ai: bool = True,
+                         target_language: str = "ar", search=None):
+        """المسار الكامل للإجابة: النموذج الذكي ثم المستندات ثم الإجابة الافتراضية
+        
+        search: بحث متوازٍ بدأه المستدعي (stream_question) يُستخدم بدل بدء بحث جديد.
+        """
         
         # استخدام النموذج الذكي إذا كان مفعلاً
+        if use_smart_ai and self.smart_mode and self.hedged:
+            return self._answer_hedged(question, subject, target_language, search)
+        
         if use_smart_ai and self.smart_mode:
-            try:
-                smart_result = self.ai_model.ask_question(question)
-                
-                if smart_result.get('confidence', 0) > 0.6:
-                    return {
-                        'type': 'smart_ai',
-                        'answer': smart_result['answer'],
-                        'confidence': smart_result['confidence'],
-                        'subject': smart_result['detected_subject'],
-                        'language': smart_result['detected_language'],
-                        'source': 'polyglot_ai'
-                    }
-            except Exception as e:
-                print(f"⚠️ النموذج الذكي غير متاح: {e}")
+            smart_result = self._smart_answer(question, target_language)
+            if smart_result is not None:
+                return smart_result
         
         # البحث في المستندات
-        doc_results = self.doc_processor.search_documents(question, subject)
+        doc_results = self._search_documents(question, subject)
         if doc_results:
-            best_result = doc_results[0]
-            return {
-                'type': 'document_search',
-                'answer': best_result['content'],
-                'confidence': best_result['score'],
-                'subject': best_result.get('subject', subject or 'general'),
-                'source': 'document_corpus'
-            }
+            return self._document_answer(doc_results, subject)
         
         # الإجابة الافتراضية
+        return self._fallback_answer(subject)
+    
+    def _answer_hedged(self, question: str, subject: str = None, target_language: str = "ar", search=None):
+        """نفس إجابة _answer_question مع تشغيل النموذج الذكي والبحث في المستندات معاً
+        
+        إجابة النموذج الواثقة لها الأولوية: تُعاد فور جهوزيتها ويُلغى البحث (أو تُهمل نتيجته إن
+        كان قد بدأ)، وإلا فنتيجة البحث؛ فالزمن أطول المسارين لا مجموعهما. البحث الذي بدأه
+        المستدعي لا يُلغى لأنه يعرض نتيجته كمقتطفات.
+        """
+        external_search = search is not None
+        smart_result, search = self._hedged_pair(question, subject, target_language, search)
+        if smart_result is not None:
+            if not external_search:
+                search.cancel()
+            return smart_result
+    
+        doc_results = search.result()
+        if doc_results:
+            return self._document_answer(doc_results, subject)
+        return self._fallback_answer(subject)
+    
+    def _hedged_pair(self, question: str, subject: str = None, target_language: str = "ar", search=None):
+        """بدء البحث في المستندات في الخلفية (إن لم يبدأ) ثم تشغيل النموذج الذكي: (إجابة النموذج، Future البحث)"""
+        if search is None:
+            search = self._submit_search(question, subject)
+        return self._smart_answer(question, target_language), search
+    
+    def _submit_search(self, question: str, subject: str = None):
+        """بدء البحث في المستندات في خيط الخلفية؛ يبقى متتبعاً حتى ينتهي"""
+        search = self._executor.submit(self._search_documents, question, subject)
+        self._searches.add(search)
+        search.add_done_callback(self._searches.discard)
+        return search
+    
+    def _search_documents(self, question: str, subject: str = None):
+        """البحث في المستندات؛ الفشل يعني عدم وجود نتائج حتى يبقى المسار الآخر متاحاً"""
+        try:
+            return self.doc_processor.search_documents(question, subject)
+        except Exception as e:
+            print(f"⚠️ البحث في المستندات غير متاح: {e}")
+            return []
+    
+    def _smart_answer(self, question: str, target_language: str):
+        """إجابة النموذج الذكي إذا كانت ثقته كافية، وإلا None"""
+        try:
+            smart_result = self.ai_model.ask_question(question, target_language)
+            
+            if smart_result.get('confidence', 0) > 0.6:
+                return {
+                    'type': 'smart_ai',
+                    'answer': smart_result['answer'],
+                    'confidence': smart_result['confidence'],
+                    'subject': smart_result['detected_subject'],
+                    'language': smart_result['detected_language'],
+                    'source': 'polyglot_ai'
+                }
+        except Exception as e:
+            print(f"⚠️ النموذج الذكي غير متاح: {e}")
+        return None
+    
+    def _document_answer(self, doc_results, subject: str = None):
+        best_result = doc_results[0]
+        return {
+            'type': 'document_search',
+            'answer': best_result['content'],
+            'confidence': best_result['score'],
+            'subject': best_result.get('subject', subject or 'general'),
+            'source': 'document_corpus'
+        }
+    
+    def _fallback_answer(self, subject: str = None):
         return {
             'type': 'fallback',
             'answer': "أحتاج إلى مزيد من المعلومات للإجابة على سؤالك. يمكنك:\n• توضيح سؤالك\n• إضافة مواد تعليمية\n• تغيير صيغة السؤال",
@@ -68,43 +196,167 @@ class SmartTutorPro:
             'source': 'fallback'
         }
     
+    def stream_question(self, question: str, subject: str = None, use_smart_ai: bool = True,
+                        target_language: str = "ar"):
+        """مثل process_question لكن يعطي أقسام الإجابة فور جهوزيتها كأزواج (القسم، النص)
+        
+        الترتيب: أقسام الإجابة (header, explanation, example, application...) ثم مقتطفات المستندات
+        ("document") تحت إجابة النموذج. آخر زوج ("result", النتيجة) بنفس صيغة process_question.
+        الإجابة المخزنة تُبث مباشرة دون بحث جديد؛ وإلا تُحسب عبر inflight فتتشارك الطلبات
+        المتطابقة المتزامنة (بثاً أو لا) تمريرة واحدة للنموذج.
+        """
+        cache_params = self._cache_params(use_smart_ai, target_language)
+        
+        cached_result = self.cache.get(question, subject, **cache_params)
+        if cached_result is not None:
+            yield from self._result_sections(cached_result, target_language)
+            yield 'result', dict(cached_result)
+            return
+        
+        # في الوضع المتوازي يبدأ بحث المقتطفات مع النموذج ويستخدمه المسار المتوازي نفسه،
+        # فتكون المقتطفات جاهزة غالباً بعد الإجابة
+        search = None
+        if use_smart_ai and self.smart_mode and self.hedged:
+            search = self._submit_search(question, subject)
+        
+        request_key = self.cache.get_cache_key(question, subject, **cache_params)
+        result = dict(self.inflight.do(
+            request_key, self._answer_and_cache,
+            question, subject, use_smart_ai, target_language, cache_params, search
+        ))
+        yield from self._result_sections(result, target_language)
+        
+        if result['type'] == 'smart_ai':
+            doc_results = search.result() if search else self._search_documents(question, subject)
+            for doc in doc_results:
+                yield 'document', doc['content']
+        
+        yield 'result', result
+    
+    def _result_sections(self, result, target_language: str):
+        """أقسام العرض لنتيجة جاهزة: أقسام إجابة النموذج، أو مقتطف المستند، أو النص كما هو"""
+        if result['type'] == 'smart_ai':
+            return self.ai_model.answer_generator.split_sections(result['answer'], target_language)
+        if result['type'] == 'document_search':
+            return [('document', result['answer'])]
+        return [('answer', result['answer'])]
+    
     def add_document(self, file_path: str, subject: str = "general"):
         """إضافة مستند جديد"""
-        return self.doc_processor.add_document(file_path, subject)
+        success, message = self.doc_processor.add_document(file_path, subject)
+        
+        if success:
+            # المستند الجديد يغير مصادر الإجابة، فلا نعيد إجابات قديمة من التخزين المؤقت
+            self._refresh_sources_version()
+        
+        return success, message
+    
+    def load_model(self, model_path: str):
+        """تحميل أوزان جديدة للنموذج الذكي"""
+        loaded = self.ai_model.load_model(model_path)
+        
+        if loaded:
+            self._weights_fingerprint = fingerprint_weights(self.ai_model.model)
+            self._refresh_sources_version()
+        
+        return loaded
     
     def toggle_smart_mode(self):
         """تبديل الوضع الذكي"""
         self.smart_mode = not self.smart_mode
         return self.smart_mode
+    
+    def toggle_hedged_mode(self):
+        """تبديل تشغيل البحث في المستندات بالتوازي مع النموذج"""
+        self.hedged = not self.hedged
+        return self.hedged
+    
+    def close(self):
+        """إيقاف خيوط البحث المتوازي وإلغاء ما لم يبدأ منه، وتسجيل إصابات التخزين المؤقت"""
+        # cancel_futures في shutdown يتطلب Python 3.9، فنلغي عمليات البحث المتتبعة بأنفسنا
+        for search in list(self._searches):
+            search.cancel()
+        self._executor.shutdown(wait=False)
+        self.cache.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+def benchmark_hedged_execution(tutor=None, num_questions=200):
+    """زمن الإجابة (p50/p90/p99) للمسارين بالتتابع مقابل التوازي، بدون التخزين المؤقت"""
+    import numpy as np
+    from models.model_optimizer import ModelOptimizer
+    
+    owns_tutor = tutor is None
+    tutor = tutor or SmartTutorPro()
+    calibration = ModelOptimizer.build_calibration_questions(tutor.ai_model.knowledge_base)
+    questions = [calibration[i % len(calibration)] for i in range(num_questions)]
+    
+    original_mode = tutor.hedged
+    results = {}
+    for name, hedged in (("sequential", False), ("hedged", True)):
+        tutor.hedged = hedged
+        tutor._answer_question(questions[0])  # تسخين
+        
+        latencies, answers = [], []
+        for question in questions:
+            started = time.perf_counter()
+            answers.append(tutor._answer_question(question)['type'])
+            latencies.append((time.perf_counter() - started) * 1000)
+        
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        results[name] = {"p50_ms": p50, "p90_ms": p90, "p99_ms": p99, "answer_types": answers}
+        print(f"📊 {name}: p50 {p50:.1f} مللي ث | p90 {p90:.1f} مللي ث | p99 {p99:.1f} مللي ث")
+    tutor.hedged = original_mode
+    
+    same = sum(a == b for a, b in zip(results["sequential"]["answer_types"], results["hedged"]["answer_types"]))
+    low_confidence = sum(kind != 'smart_ai' for kind in results["sequential"]["answer_types"])
+    print(f"📊 {low_confidence}/{num_questions} سؤال احتاج البحث في المستندات، تطابق نوع الإجابة {same}/{num_questions}")
+    
+    if owns_tutor:
+        tutor.close()
+    return results
 
 def run_cli_demo():
     """تشغيل نسخة CLI للاختبار"""
     print("🎯 SmartTutor Pro - الوضع التفاعلي")
     print("=" * 50)
     
-    tutor = SmartTutorPro()
-    
-    while True:
-        print("\n" + "="*50)
-        question = input("❓ اكتب سؤالك (أو 'exit' للخروج): ").strip()
-        
-        if question.lower() in ['exit', 'quit', 'خروج']:
-            break
-        
-        if not question:
-            continue
-        
-        print("🔄 جاري المعالجة...")
-        result = tutor.process_question(question)
-        
-        print(f"\n💡 الإجابة ({result['type']}):")
-        print(f"📚 المادة: {result['subject']}")
-        print(f"📊 الثقة: {result['confidence']:.2f}")
-        print(f"🔍 المصدر: {result['source']}")
-        print(f"\n{result['answer']}")
+    with SmartTutorPro() as tutor:
+        while True:
+            print("\n" + "="*50)
+            question = input("❓ اكتب سؤالك (أو 'exit' للخروج): ").strip()
+            
+            if question.lower() in ['exit', 'quit', 'خروج']:
+                break
+            
+            if not question:
+                continue
+            
+            print("🔄 جاري المعالجة...\n")
+            
+            # عرض كل قسم فور وصوله بدل انتظار الإجابة كاملة
+            result = None
+            for section, content in tutor.stream_question(question):
+                if section == 'result':
+                    result = content
+                elif section == 'document':
+                    print(f"📄 {content[:300]}\n", flush=True)
+                else:
+                    print(f"{content}\n", flush=True)
+            
+            print(f"💡 نوع الإجابة: {result['type']}")
+            print(f"📚 المادة: {result['subject']}")
+            print(f"📊 الثقة: {result['confidence']:.2f}")
+            print(f"🔍 المصدر: {result['source']}")
 
 def run_gui():
     """تشغيل الواجهة الرسومية"""
+    # Kivy يُستورد فقط عند طلب الواجهة حتى يعمل وضع CLI بدونه
+    from ui.kivy_interface import EnhancedTutorApp
     app = EnhancedTutorApp()
     app.run()
 
@@ -112,10 +364,13 @@ if __name__ == "__main__":
     print("🎓 SmartTutor Pro - النظام التعليمي الذكي")
     print("1. الوضع التفاعلي (CLI)")
     print("2. الواجهة الرسومية (GUI)")
+    print("3. قياس زمن الإجابة (تتابع مقابل توازي)")
     
-    choice = input("اختر الوضع (1 أو 2): ").strip()
+    choice = input("اختر الوضع (1 أو 2 أو 3): ").strip()
     
     if choice == "1":
         run_cli_demo()
+    elif choice == "3":
+        benchmark_hedged_execution()
     else:
         run_gui()
@@ -0,0 +1,67 @@
+# models/aho_corasick.py
+from collections import deque
+
+class AhoCorasick:
+    """مطابق أنماط متعددة: كل الأنماط في آلة واحدة ومرور خطي واحد على النص"""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        self._built = True
+        self.pattern_count = 0
+
+    def add(self, pattern, payload):
+        """إضافة نمط مع حمولته (تُعاد عند كل تطابق)"""
+        if not pattern:
+            return
+
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+                self._goto[node][char] = next_node
+            node = next_node
+
+        self._output[node] += (payload,)
+        self.pattern_count += 1
+        self._built = False
+
+    def build(self):
+        """حساب روابط الفشل بالعرض أولاً ودمج مخرجات اللواحق"""
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] += self._output[self._fail[child]]
+
+        self._built = True
+        return self
+
+    def iter_matches(self, text):
+        """كل التطابقات كـ (موضع نهاية النمط، الحمولة) في مرور واحد"""
+        if not self._built:
+            self.build()
+
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for payload in output[node]:
+                yield index, payload
@@ -1,180 +1,116 @@
 # models/answer_generator.py
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from .answer_snapshot import AnswerSnapshot
+from .question_classifier import QUESTION_TYPE_WORDS
+from utils.text_normalization import normalize_text
+
+ANSWER_CONTENT_PATH = Path(__file__).parent / "content" / "answer_templates.json"
+ANSWER_CONTENT_VERSION = 1
+
+@lru_cache(maxsize=None)
+def load_answer_content(path=ANSWER_CONTENT_PATH):
+    """القوالب والأمثلة من ملف المحتوى (تُقرأ مرة واحدة لكل عملية؛ للقراءة فقط)"""
+    content = json.loads(Path(path).read_text(encoding="utf-8"))
+    if content.get("format_version") != ANSWER_CONTENT_VERSION:
+        raise ValueError(f"إصدار قوالب غير مدعوم: {content.get('format_version')}")
+    return content
+
+LANGUAGE_SUFFIX_PATTERN = re.compile(r"\{(\w+?)_(ar|en|fr)\}")
+
+def compile_templates(templates):
+    """تجميع القوالب لكل لغة: الحقول {name_ar} تصبح {name}، ويُحفظ format_map الجاهز لكل قالب
+    
+    كل قالب يستقبل حقول لغته فقط بدلاً من حقول اللغات الثلاث.
+    """
+    compiled = {}
+    for question_type, by_language in templates.items():
+        compiled[question_type] = {}
+        for language, template in by_language.items():
+            own_fields = LANGUAGE_SUFFIX_PATTERN.sub(
+                lambda match: "{" + match.group(1) + "}" if match.group(2) == language else match.group(0),
+                template
+            )
+            compiled[question_type][language] = own_fields.format_map
+    return compiled
+
+SECTION_SEPARATOR = "\n\n"
+TEMPLATE_FIELD_PATTERN = re.compile(r"\{(\w+?)(?:_(?:ar|en|fr))?\}")
+
+def compile_section_patterns(templates):
+    """نمط لكل قالب يقسم الإجابة المولدة منه إلى أقسامها: {اللغة: [(أسماء الأقسام، النمط)]}
+    
+    أقسام القالب مفصولة بسطر فارغ؛ الأول "header" وكل قسم بعده يُسمى بأول حقل فيه
+    (مثلاً header, explanation, example, application لقالب الشرح).
+    """
+    compiled = {}
+    for by_language in templates.values():
+        for language, template in by_language.items():
+            names, parts = [], []
+            for position, chunk in enumerate(template.split(SECTION_SEPARATOR)):
+                fields = TEMPLATE_FIELD_PATTERN.findall(chunk)
+                names.append("header" if position == 0 or not fields else fields[0])
+                static = TEMPLATE_FIELD_PATTERN.split(chunk)[::2]
+                parts.append("(" + ".*?".join(re.escape(text) for text in static) + ")")
+            pattern = re.compile(r"\A" + re.escape(SECTION_SEPARATOR).join(parts) + r"\Z", re.DOTALL)
+            compiled.setdefault(language, []).append((tuple(names), pattern))
+    return compiled
+
 class SmartAnswerGenerator:
-    def __init__(self, knowledge_base):
+    def __init__(self, knowledge_base, snapshot_path=AnswerSnapshot.DEFAULT_PATH, render_cache_size=1024):
         self.kb = knowledge_base
         self.templates = self._load_smart_templates()
         self.examples = self._load_examples()
+        self.defaults = load_answer_content()["defaults"]
+        self.compiled_templates = compile_templates(self.templates)
+        self.section_patterns = compile_section_patterns(self.templates)
+        
+        # إجابات المفاهيم المعروفة مُعدّة مسبقاً (None لتعطيل اللقطة)
+        self.snapshot = AnswerSnapshot(self, snapshot_path) if snapshot_path else None
+        knowledge_base.add_change_listener(self._knowledge_changed)
+        
+        # ذاكرة LRU للإجابات المولدة: المفتاح (النوع، المادة، المفاهيم، اللغة)
+        self._render_cached = lru_cache(maxsize=render_cache_size)(self._render) if render_cache_size else self._render
     
     def _load_smart_templates(self):
-        return {
-            "explanation": {
-                "ar": """📚 **شرح {concept}**
-
-{explanation_ar}
-
-💡 **مثال توضيحي:**
-{example_ar}
-
-🎯 **التطبيق العملي:**
-{application_ar}""",
-
-                "en": """📚 **Explanation of {concept}**
-
-{explanation_en}
-
-💡 **Example:**
-{example_en}
-
-🎯 **Practical Application:**
-{application_en}""",
-
-                "fr": """📚 **Explication de {concept}**
-
-{explanation_fr}
-
-💡 **Exemple:**
-{example_fr}
-
-🎯 **Application Pratique:**
-{application_fr}"""
-            },
-            
-            "comparison": {
-                "ar": """🔄 **المقارنة بين {concept1} و {concept2}**
-
-{comparison_ar}
-
-📊 **الفرق الرئيسي:**
-{difference_ar}
-
-💡 **مثال للمقارنة:**
-{example_ar}""",
-
-                "en": """🔄 **Comparison between {concept1} and {concept2}**
-
-{comparison_en}
-
-📊 **Main Difference:**
-{difference_en}
-
-💡 **Comparison Example:**
-{example_en}""",
-
-                "fr": """🔄 **Comparaison entre {concept1} et {concept2}**
-
-{comparison_fr}
-
-📊 **Différence Principale:**
-{difference_fr}
-
-💡 **Exemple de Comparaison:**
-{example_fr}"""
-            },
-            
-            "step_by_step": {
-                "ar": """🎯 **خطوات الحل:**
-
-{steps_ar}
-
-📝 **الشرح التفصيلي:**
-{explanation_ar}
-
-💡 **نصيحة مهمة:**
-{tip_ar}""",
-
-                "en": """🎯 **Solution Steps:**
-
-{steps_en}
-
-📝 **Detailed Explanation:**
-{explanation_en}
-
-💡 **Important Tip:**
-{tip_en}""",
-
-                "fr": """🎯 **Étapes de Résolution:**
-
-{steps_fr}
-
-📝 **Explication Détaillée:**
-{explanation_fr}
-
-💡 **Conseil Important:**
-{tip_fr}"""
-            },
-            
-            "general": {
-                "ar": """🤔 **سؤالك عن {subject_ar}**
-
-{answer_ar}
-
-📚 **لمزيد من التعلم:**
-{suggestion_ar}""",
-
-                "en": """🤔 **Your question about {subject_en}**
-
-{answer_en}
-
-📚 **For further learning:**
-{suggestion_en}""",
-
-                "fr": """🤔 **Votre question sur {subject_fr}**
-
-{answer_fr}
-
-📚 **Pour approfondir:**
-{suggestion_fr}"""
-            }
-        }
+        return load_answer_content()["templates"]
     
     def _load_examples(self):
-        return {
-            "algebra": {
-                "ar": {
-                    "example": "مثال: حل المعادلة 2س + 5 = 11\nالحل: 2س = 6 ⇒ س = 3",
-                    "application": "تستخدم المعادلات في حساب القيم المجهولة في الفيزياء والاقتصاد",
-                    "steps": "1. عزل الحد المجهول\n2. تطبيق العمليات العكسية\n3. التحقق من الحل",
-                    "tip": "تأكد من تطبيق نفس العملية على طرفي المعادلة"
-                },
-                "en": {
-                    "example": "Example: Solve equation 2x + 5 = 11\nSolution: 2x = 6 ⇒ x = 3",
-                    "application": "Equations are used to calculate unknown values in physics and economics",
-                    "steps": "1. Isolate the unknown term\n2. Apply inverse operations\n3. Verify the solution",
-                    "tip": "Make sure to apply the same operation to both sides of the equation"
-                },
-                "fr": {
-                    "example": "Exemple: Résoudre l'équation 2x + 5 = 11\nSolution: 2x = 6 ⇒ x = 3",
-                    "application": "Les équations sont utilisées pour calculer des valeurs inconnues en physique et économie",
-                    "steps": "1. Isoler le terme inconnu\n2. Appliquer les opérations inverses\n3. Vérifier la solution",
-                    "tip": "Assurez-vous d'appliquer la même opération des deux côtés de l'équation"
-                }
-            },
-            "grammar": {
-                "ar": {
-                    "example": "الجملة: 'الطالب يذاكر الدرس'\nالإعراب: يذاكر: فعل مضارع مرفوع",
-                    "application": "تستخدم القواعد في الكتابة الصحيحة والتحليل الأدبي",
-                    "steps": "1. تحديد نوع الكلمة\n2. معرفة موقعها الإعرابي\n3. تطبيق القاعدة المناسبة",
-                    "tip": "انتبه للحركات الإعرابية فهي مفتاح الإعراب الصحيح"
-                },
-                "en": {
-                    "example": "Sentence: 'The student studies the lesson'\nAnalysis: studies: present tense verb",
-                    "application": "Grammar is used in correct writing and literary analysis",
-                    "steps": "1. Identify word type\n2. Determine grammatical position\n3. Apply appropriate rule",
-                    "tip": "Pay attention to verb tenses and subject-verb agreement"
-                },
-                "fr": {
-                    "example": "Phrase: 'L'étudiant étudie la leçon'\nAnalyse: étudie: verbe au présent",
-                    "application": "La grammaire est utilisée dans l'écriture correcte et l'analyse littéraire",
-                    "steps": "1. Identifier le type de mot\n2. Déterminer la position grammaticale\n3. Appliquer la règle appropriée",
-                    "tip": "Attention à l'accord du verbe avec le sujet"
-                }
-            }
+        return load_answer_content()["examples"]
+    
+    def _render(self, question_type, subject, concept_ids, target_language):
+        renderers = {
+            "explanation": lambda: self.render_explanation(concept_ids[0], subject, target_language),
+            "comparison": lambda: self.render_comparison(concept_ids[0], concept_ids[1], subject, target_language),
+            "step_by_step": lambda: self.render_step_by_step(concept_ids[0] if concept_ids else None, subject,
+                                                             target_language),
+            "general": lambda: self.render_general_answer(subject, target_language)
         }
+        return renderers[question_type]()
+    
+    def _knowledge_changed(self):
+        """بعد تعديل قاعدة المعرفة: مسح الإجابات المحفوظة ومطابقة اللقطة مع البصمة الجديدة"""
+        self.clear_render_cache()
+        if self.snapshot:
+            self.snapshot.invalidate()
+    
+    def clear_render_cache(self):
+        """مسح الإجابات المحفوظة (بعد تعديل المحتوى أو القوالب)"""
+        if hasattr(self._render_cached, "cache_clear"):
+            self._render_cached.cache_clear()
+    
+    def render_cache_info(self):
+        """إحصائيات ذاكرة الإجابات"""
+        return self._render_cached.cache_info() if hasattr(self._render_cached, "cache_info") else None
     
-    def generate_response(self, question, subject, source_language, target_language="ar"):
-        """توليد إجابة ذكية باستخدام RAG المحسن"""
+    def generate_response(self, question, subject, source_language, target_language="ar", question_type=None):
+        """توليد إجابة ذكية باستخدام RAG المحسن (question_type من المصنف الموحد إن وُجد)"""
         
-        question_type = self.detect_question_type(question, source_language)
+        if question_type is None:
+            question_type = self.detect_question_type(question, source_language)
         relevant_concepts = self.find_relevant_concepts(question, subject, source_language)
         
         if question_type == "explanation" and relevant_concepts:
@@ -186,97 +122,111 @@ class SmartAnswerGenerator:
         else:
             return self.generate_general_answer(question, subject, target_language)
     
+    def split_sections(self, answer, target_language):
+        """أقسام الإجابة [(الاسم، النص)] حسب القالب الذي ولّدها؛ الإجابة كلها قسم "answer" إن لم تطابق قالباً"""
+        for names, pattern in self.section_patterns.get(target_language, ()):
+            match = pattern.match(answer)
+            if match:
+                return list(zip(names, match.groups()))
+        return [("answer", answer)]
+    
     def detect_question_type(self, question, language):
-        question_lower = question.lower()
-        
-        explanation_words = {
-            "ar": ["ما هو", "ما هي", "اشرح", "عرف", "مفهوم", "شرح", "ماذا يعني"],
-            "en": ["what is", "explain", "define", "concept of", "describe", "meaning of"],
-            "fr": ["qu'est-ce que", "expliquez", "définir", "concept de", "décrivez", "signification de"]
-        }
-        
-        comparison_words = {
-            "ar": ["قارن", "الفرق بين", "ما الفرق", "المقارنة", "اختلاف", "مقارنة"],
-            "en": ["compare", "difference between", "what is the difference", "comparison", "different"],
-            "fr": ["comparez", "différence entre", "quelle est la différence", "comparaison", "différent"]
-        }
+        question_normalized = normalize_text(question)
         
-        step_words = {
-            "ar": ["كيف", "طريقة", "خطوات", "حل", "طريقة حل", "كيفية"],
-            "en": ["how", "method", "steps", "solve", "solution", "way to"],
-            "fr": ["comment", "méthode", "étapes", "résoudre", "solution", "façon de"]
-        }
-        
-        for word in explanation_words[language]:
-            if word in question_lower:
-                return "explanation"
-        
-        for word in comparison_words[language]:
-            if word in question_lower:
-                return "comparison"
-        
-        for word in step_words[language]:
-            if word in question_lower:
-                return "step_by_step"
+        for question_type, words in QUESTION_TYPE_WORDS.items():
+            for word in words.get(language, ()):
+                if word in question_normalized:
+                    return question_type
         
         return "general"
     
     def find_relevant_concepts(self, question, subject, language):
-        """إيجاد المفاهيم ذات الصلة باستخدام مطابقة ذكية"""
-        relevant = []
-        subject_data = self.kb.subjects.get(subject, {})
-        
-        question_words = set(question.lower().split())
-        
-        for concept_id, concept_data in subject_data.get("concepts", {}).items():
-            # البحث في النص العربي للمفهوم
-            concept_text = concept_data.get("ar", "").lower()
-            concept_words = set(concept_text.split())
-            
-            # حساب التشابه باستخدام تقاطع الكلمات
-            common_words = question_words & concept_words
-            if len(common_words) >= 1:
-                relevant.append(concept_id)
-            
-            # البحث في اسم المفهوم نفسه
-            if concept_id in question.lower():
-                relevant.append(concept_id)
-        
-        return list(set(relevant))[:3]  # إرجاع 3 مفاهيم فريدة كحد أقصى
+        """إيجاد المفاهيم ذات الصلة من الفهرس المعكوس (شروح اللغات الثلاث، مرتبة حسب TF-IDF)"""
+        index = self.kb.concept_index(subject)
+        if index is None:
+            return []
+        return index.search(question, top_k=3)  # 3 مفاهيم فريدة كحد أقصى
     
     def generate_explanation(self, concept_id, subject, target_language):
         """توليد شرح مفصل مع أمثلة"""
+        if self.snapshot:
+            answer = self.snapshot.lookup(subject, concept_id, "explanation", target_language)
+            if answer is not None:
+                return answer
+        
+        return self._render_cached("explanation", subject, (concept_id,), target_language)
+    
+    def render_explanation(self, concept_id, subject, target_language):
+        """بناء الشرح من القالب المجمّع للغة الهدف"""
         concept_data = self.kb.subjects[subject]["concepts"][concept_id]
         example_data = self.examples.get(concept_id, {}).get(target_language, {})
+        defaults = self.defaults["explanation"][target_language]
         
-        return self.templates["explanation"][target_language].format(
-            concept=concept_id,
-            explanation_ar=concept_data.get("ar", ""),
-            explanation_en=concept_data.get("en", ""),
-            explanation_fr=concept_data.get("fr", ""),
-            example_ar=example_data.get("example", "لا يوجد مثال متاح"),
-            example_en=example_data.get("example", "No example available"),
-            example_fr=example_data.get("example", "Aucun exemple disponible"),
-            application_ar=example_data.get("application", "تطبيق عملي في الحياة اليومية"),
-            application_en=example_data.get("application", "Practical application in daily life"),
-            application_fr=example_data.get("application", "Application pratique dans la vie quotidienne")
-        )
+        return self.compiled_templates["explanation"][target_language]({
+            "concept": concept_id,
+            "explanation": concept_data.get(target_language, ""),
+            "example": example_data.get("example", defaults["example"]),
+            "application": example_data.get("application", defaults["application"])
+        })
+    
+    def generate_comparison(self, concept1, concept2, subject, target_language):
+        """توليد مقارنة بين مفهومين من نفس المادة"""
+        return self._render_cached("comparison", subject, (concept1, concept2), target_language)
+    
+    def render_comparison(self, concept1, concept2, subject, target_language):
+        """بناء المقارنة من القالب المجمّع: تعريف كل مفهوم ثم الفرق ومثال"""
+        concepts = self.kb.subjects[subject]["concepts"]
+        defaults = self.defaults["comparison"][target_language]
+        example_data = self.examples.get(concept1, {}).get(target_language) or \
+            self.examples.get(concept2, {}).get(target_language, {})
+        
+        return self.compiled_templates["comparison"][target_language]({
+            "concept1": concept1,
+            "concept2": concept2,
+            "comparison": "\n".join(
+                f"• **{concept_id}**: {concepts[concept_id].get(target_language, '')}" for concept_id in (concept1, concept2)
+            ),
+            "difference": defaults["difference"],
+            "example": example_data.get("example", defaults["example"])
+        })
+    
+    def generate_step_by_step(self, question, subject, target_language):
+        """توليد خطوات حل حسب أقرب مفهوم للسؤال (أو خطوات عامة للمادة)"""
+        relevant_concepts = self.find_relevant_concepts(question, subject, target_language)
+        return self._render_cached("step_by_step", subject, tuple(relevant_concepts[:1]), target_language)
+    
+    def render_step_by_step(self, concept_id, subject, target_language):
+        """بناء خطوات الحل من القالب المجمّع"""
+        subject_data = self.kb.subjects.get(subject, {})
+        concept_data = subject_data.get("concepts", {}).get(concept_id, {})
+        example_data = self.examples.get(concept_id, {}).get(target_language, {})
+        defaults = self.defaults["step_by_step"][target_language]
+        
+        return self.compiled_templates["step_by_step"][target_language]({
+            "steps": example_data.get("steps", defaults["steps"]),
+            "explanation": concept_data.get(target_language) or self.defaults["general"][target_language]["answer"],
+            "tip": example_data.get("tip", defaults["tip"])
+        })
     
     def generate_general_answer(self, question, subject, target_language):
         """توليد إجابة عامة"""
+        if self.snapshot:
+            answer = self.snapshot.lookup(subject, None, "general", target_language)
+            if answer is not None:
+                return answer
+        
+        return self._render_cached("general", subject, (), target_language)
+    
+    def render_general_answer(self, subject, target_language):
+        """بناء الإجابة العامة من القالب المجمّع (لا تعتمد على نص السؤال)"""
         subject_data = self.kb.subjects.get(subject, {})
+        defaults = self.defaults["general"][target_language]
         
-        return self.templates["general"][target_language].format(
-            subject_ar=subject_data.get("name", {}).get("ar", subject),
-            subject_en=subject_data.get("name", {}).get("en", subject),
-            subject_fr=subject_data.get("name", {}).get("fr", subject),
-            answer_ar="هذا سؤال مهم في هذه المادة. أنصحك بالتركيز على المبادئ الأساسية والممارسة المستمرة.",
-            answer_en="This is an important question in this subject. I advise you to focus on basic principles and continuous practice.",
-            answer_fr="C'est une question importante dans cette matière. Je vous conseille de vous concentrer sur les principes de base et la pratique continue.",
-            suggestion_ar="جرب حل تمارين تطبيقية واطلب المساعدة من معلمك إذا needed.",
-            suggestion_en="Try solving practical exercises and ask your teacher for help if needed.",
-            suggestion_fr="Essayez de résoudre des exercices pratiques et demandez de l'aide à votre enseignant si nécessaire."
-        )
+        return self.compiled_templates["general"][target_language]({
+            "subject": subject_data.get("name", {}).get(target_language, subject),
+            "answer": defaults["answer"],
+            "suggestion": defaults["suggestion"]
+        })
 # في models/answer_generator.py - التكيف مع المواد الجديدة
 def generate_response(self, question, subject, source_language, target_language="ar"):
     """توليد إجابة ذكية - تتكيف مع أي مادة"""
@@ -333,3 +283,40 @@ Actuellement, je fournis des réponses générales pour cette matière.
     }
     
     return templates.get(target_language, templates["ar"])
+
+def benchmark_answer_rendering(repeats=2000):
+    """زمن توليد الإجابة: format بحقول اللغات الثلاث، القالب المجمّع للغة واحدة، والذاكرة"""
+    import time
+    from .knowledge_base import EducationalKnowledgeBase
+
+    generator = SmartAnswerGenerator(EducationalKnowledgeBase(), snapshot_path=None)
+    concept_data = generator.kb.subjects["math"]["concepts"]["algebra"]
+    example_data = generator.examples["algebra"]["en"]
+
+    def all_languages_format():
+        # الطريقة السابقة: القالب الخام مع حقول اللغات الثلاث في كل استدعاء
+        return generator.templates["explanation"]["en"].format(
+            concept="algebra",
+            **{f"explanation_{lang}": concept_data.get(lang, "") for lang in ("ar", "en", "fr")},
+            **{f"example_{lang}": example_data["example"] for lang in ("ar", "en", "fr")},
+            **{f"application_{lang}": example_data["application"] for lang in ("ar", "en", "fr")}
+        )
+
+    variants = (
+        ("format_all_languages", all_languages_format),
+        ("compiled", lambda: generator.render_explanation("algebra", "math", "en")),
+        ("memoized", lambda: generator.generate_explanation("algebra", "math", "en"))
+    )
+    results = {}
+    for name, render in variants:
+        started = time.perf_counter()
+        for _ in range(repeats):
+            render()
+        results[name] = (time.perf_counter() - started) / repeats * 1e6
+
+    print(f"📊 شرح مفهوم: format بحقول 3 لغات {results['format_all_languages']:.1f} ميكروثانية، "
+          f"قالب مجمّع {results['compiled']:.1f}، من الذاكرة {results['memoized']:.2f} ميكروثانية")
+    return results
+
+if __name__ == "__main__":
+    benchmark_answer_rendering()
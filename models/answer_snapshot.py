@@ -0,0 +1,110 @@
+# models/answer_snapshot.py
+import json
+import zlib
+import hashlib
+from pathlib import Path
+
+from utils.config import Config
+from utils.helpers import atomic_write_bytes
+
+class AnswerSnapshot:
+    """لقطة مُعدّة مسبقاً لإجابات مفاهيم قاعدة المعرفة (للقراءة فقط)"""
+
+    FORMAT_VERSION = 1
+    DEFAULT_PATH = Config.DATA_DIR / "snapshots" / "answers.json.z"
+    LANGUAGES = ("ar", "en", "fr")
+
+    def __init__(self, answer_generator, snapshot_path=DEFAULT_PATH):
+        self.generator = answer_generator
+        self.snapshot_path = Path(snapshot_path)
+        self._answers = None  # تحميل كسول عند أول استخدام
+
+    @staticmethod
+    def make_key(subject, concept_id, question_type, language):
+        """مفتاح الإجابة: (المادة، المفهوم، نوع السؤال، اللغة)"""
+        return f"{subject}|{concept_id or ''}|{question_type}|{language}"
+
+    def fingerprint(self):
+        """بصمة كل ما تعتمد عليه الإجابات: المحتوى والقوالب والأمثلة والنصوص الافتراضية"""
+        source = json.dumps(
+            [self.FORMAT_VERSION, self.generator.kb.subjects.fingerprint(), self.generator.templates,
+             self.generator.examples, self.generator.defaults],
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+    def build(self):
+        """توليد كل الإجابات الثابتة من القوالب"""
+        answers = {}
+
+        for subject, subject_data in self.generator.kb.subjects.items():
+            for language in self.LANGUAGES:
+                answers[self.make_key(subject, None, "general", language)] = \
+                    self.generator.render_general_answer(subject, language)
+
+                for concept_id in subject_data.get("concepts", {}):
+                    answers[self.make_key(subject, concept_id, "explanation", language)] = \
+                        self.generator.render_explanation(concept_id, subject, language)
+
+        return answers
+
+    def save(self, answers, fingerprint):
+        """حفظ اللقطة كـ JSON مضغوط مع بصمة قاعدة المعرفة"""
+        payload = {
+            "version": self.FORMAT_VERSION,
+            "fingerprint": fingerprint,
+            "answers": answers
+        }
+        raw = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(self.snapshot_path, zlib.compress(raw, 9))
+
+    def load(self):
+        """تحميل اللقطة والتحقق من سلامتها، وإعادة توليدها إذا تغيرت قاعدة المعرفة"""
+        fingerprint = self.fingerprint()
+
+        try:
+            payload = json.loads(zlib.decompress(self.snapshot_path.read_bytes()).decode('utf-8'))
+            if payload.get("version") == self.FORMAT_VERSION and payload.get("fingerprint") == fingerprint:
+                self._answers = payload["answers"]
+                return self._answers
+        except (OSError, ValueError, zlib.error):
+            pass
+
+        print("🔄 جاري إعادة توليد لقطة الإجابات...")
+        answers = self.build()
+        try:
+            self.save(answers, fingerprint)
+        except OSError as e:
+            print(f"⚠️ تعذر حفظ لقطة الإجابات: {e}")
+
+        self._answers = answers
+        return answers
+
+    def invalidate(self):
+        """بعد تعديل قاعدة المعرفة: إعادة التحقق من البصمة عند البحث التالي"""
+        self._answers = None
+
+    def lookup(self, subject, concept_id, question_type, language):
+        """البحث عن إجابة جاهزة، أو None إذا لم تكن في اللقطة"""
+        if self._answers is None:
+            self.load()
+        return self._answers.get(self.make_key(subject, concept_id, question_type, language))
+
+def build_answer_snapshot(snapshot_path=AnswerSnapshot.DEFAULT_PATH):
+    """خطوة البناء: توليد لقطة الإجابات وحفظها"""
+    from .knowledge_base import EducationalKnowledgeBase
+    from .answer_generator import SmartAnswerGenerator
+
+    generator = SmartAnswerGenerator(EducationalKnowledgeBase(), snapshot_path=snapshot_path)
+    snapshot = generator.snapshot
+    answers = snapshot.build()
+    snapshot.save(answers, snapshot.fingerprint())
+
+    print(f"✅ تم حفظ {len(answers)} إجابة في {snapshot.snapshot_path}")
+    return answers
+
+if __name__ == "__main__":
+    build_answer_snapshot()
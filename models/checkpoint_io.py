@@ -0,0 +1,306 @@
+# models/checkpoint_io.py
+import json
+import hashlib
+import warnings
+from pathlib import Path
+
+import torch
+from safetensors import safe_open
+from safetensors.torch import save_file
+
+from .polyglot_model import PolyglotTutorConfig, PolyglotTutorModel
+
+FORMAT_VERSION = 1
+WEIGHTS_SUFFIX = ".safetensors"
+
+# لواحق مفاتيح طبقات Linear المكممة داخل ملف safetensors
+INT8_WEIGHT = ".weight_int8"
+INT8_SCALE = ".weight_scale"
+INT8_ZERO_POINT = ".weight_zero_point"
+
+def sidecar_path(path):
+    """ملف JSON المرافق: الإعدادات والمفردات ونوع التكميم"""
+    return Path(path).with_suffix(".json")
+
+def _quantized_linears(model):
+    return {
+        name: module for name, module in model.named_modules()
+        if isinstance(module, torch.ao.nn.quantized.dynamic.Linear)
+    }
+
+def _upcast_module(module):
+    """رفع أوزان وحدة واحدة المؤجلة إلى النوع المطلوب وإزالة خطافها"""
+    pending = module.__dict__.pop("_lazy_upcast", None)
+    if pending is None:
+        return
+    handle, dtype = pending
+    handle.remove()
+
+    # الأوزان الجديدة عادية حتى إن حدث الرفع داخل inference_mode
+    with torch.inference_mode(False), torch.no_grad():
+        for name, param in list(module.named_parameters(recurse=False)):
+            if param.is_floating_point() and param.dtype != dtype:
+                setattr(module, name, torch.nn.Parameter(param.to(dtype), requires_grad=param.requires_grad))
+        for name, buffer in list(module.named_buffers(recurse=False)):
+            if buffer.is_floating_point() and buffer.dtype != dtype:
+                setattr(module, name, buffer.to(dtype))
+
+def _upcast_hook(module, args):
+    _upcast_module(module)
+
+def upcast_lazily(model, dtype):
+    """تأجيل رفع الأوزان إلى dtype حتى أول تمرير عبر كل وحدة
+
+    الوحدات التي لا تُستدعى (مثل رأس المفردات في مسار التصنيف) تبقى بنوعها المحفوظ على صفحات الملف.
+    """
+    for module in model.modules():
+        tensors = list(module.parameters(recurse=False)) + list(module.buffers(recurse=False))
+        if any(tensor.is_floating_point() and tensor.dtype != dtype for tensor in tensors):
+            module._lazy_upcast = (module.register_forward_pre_hook(_upcast_hook), dtype)
+    return model
+
+def materialize_weights(model):
+    """رفع كل الأوزان المؤجلة الآن؛ قبل أي عملية تقرأ الأوزان مباشرة (تكميم، تقليم، تصدير، حفظ، مشاركة ذاكرة)"""
+    for module in model.modules():
+        _upcast_module(module)
+    return model
+
+def _update_digest(digest, value):
+    if isinstance(value, torch.Tensor):
+        tensor = value.detach()
+        if tensor.is_quantized:
+            tensor = tensor.dequantize()
+        # الأوزان المؤجلة (fp16) تعطي نفس البصمة بعد رفعها إلى fp32
+        if tensor.is_floating_point():
+            tensor = tensor.to(torch.float32)
+        digest.update(f"{tuple(tensor.shape)}|".encode("utf-8"))
+        digest.update(tensor.contiguous().cpu().numpy().tobytes())
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            _update_digest(digest, item)
+    else:
+        digest.update(repr(value).encode("utf-8"))
+
+def fingerprint_weights(model):
+    """بصمة قيم الأوزان الحالية (بما فيها المكممة) دون رفع الأوزان المؤجلة"""
+    digest = hashlib.sha256()
+    for name, value in model.state_dict().items():
+        digest.update(f"{name}|".encode("utf-8"))
+        _update_digest(digest, value)
+    return digest.hexdigest()
+
+def save_checkpoint(model, path, tokenizer, half_precision=True):
+    """حفظ الأوزان بصيغة safetensors (بدون pickle) مع ملف JSON مرافق
+
+    الطبقات المكممة تُحفظ كأوزان int8 مع المقياس ونقطة الصفر لتُستعاد كما هي تماماً.
+    """
+    path = Path(path).with_suffix(WEIGHTS_SUFFIX)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    materialize_weights(model)
+    quantized = _quantized_linears(model)
+    tensors = {}
+
+    for name, module in quantized.items():
+        weight, bias = module.weight(), module.bias()
+        tensors[name + INT8_WEIGHT] = weight.int_repr().contiguous()
+        tensors[name + INT8_SCALE] = torch.tensor(weight.q_scale(), dtype=torch.float64)
+        tensors[name + INT8_ZERO_POINT] = torch.tensor(weight.q_zero_point(), dtype=torch.int64)
+        if bias is not None:
+            tensors[name + ".bias"] = bias.detach().contiguous()
+
+    quantized_prefixes = tuple(name + "." for name in quantized)
+    for key, tensor in model.state_dict().items():
+        if key.startswith(quantized_prefixes):
+            continue
+        if half_precision and tensor.is_floating_point():
+            tensor = tensor.half()
+        tensors[key] = tensor.detach().contiguous()
+
+    save_file(tensors, str(path), metadata={"format": "pt"})
+
+    sidecar = {
+        "format_version": FORMAT_VERSION,
+        "config": model.config.to_dict(),
+        "tokenizer": tokenizer,
+        "quantization": "dynamic_int8" if quantized else None
+    }
+    sidecar_path(path).write_text(json.dumps(sidecar, ensure_ascii=False), encoding="utf-8")
+    return path
+
+def load_checkpoint(path, dtype=torch.float32):
+    """تحميل نقطة safetensors بالذاكرة المعيّنة (mmap)
+
+    يُبنى النموذج على الجهاز meta (دون تهيئة عشوائية للأوزان) وتُربط الموترات بصفحات الملف
+    دون نسخ. أوزان fp16 تُرفع إلى dtype كسولاً: كل وحدة عند أول تمرير عبرها (upcast_lazily).
+    dtype=None يُبقي النوع المحفوظ. يُرجع (model, config, tokenizer, quantized).
+    """
+    path = Path(path)
+    sidecar = json.loads(sidecar_path(path).read_text(encoding="utf-8"))
+    if sidecar.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"إصدار نقطة غير مدعوم: {sidecar.get('format_version')}")
+
+    config = PolyglotTutorConfig.from_dict(sidecar["config"])
+    quantized = sidecar.get("quantization") == "dynamic_int8"
+
+    with torch.device("meta"):
+        model = PolyglotTutorModel(config)
+
+    state_dict = {}
+    int8_weights = {}
+    with safe_open(str(path), framework="pt") as f:
+        for key in f.keys():
+            if key.endswith(INT8_WEIGHT):
+                name = key[:-len(INT8_WEIGHT)]
+                int8_weights[name] = (
+                    f.get_tensor(key),
+                    f.get_tensor(name + INT8_SCALE).item(),
+                    f.get_tensor(name + INT8_ZERO_POINT).item()
+                )
+                # وزن fp32 مؤقت لبناء البنية المكممة؛ يُستبدل بالقيم المحفوظة بعد التكميم
+                int8, scale, zero_point = int8_weights[name]
+                state_dict[name + ".weight"] = (int8.float() - zero_point) * scale
+            elif key.endswith((INT8_SCALE, INT8_ZERO_POINT)):
+                continue
+            else:
+                state_dict[key] = f.get_tensor(key)
+
+    model.load_state_dict(state_dict, assign=True)
+    del state_dict
+    model.eval()
+
+    if quantized:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        for name, module in _quantized_linears(model).items():
+            int8, scale, zero_point = int8_weights[name]
+            qweight = torch._make_per_tensor_quantized_tensor(int8, scale, zero_point)
+            module.set_weight_bias(qweight, module.bias())
+
+    if dtype is not None:
+        upcast_lazily(model, dtype)
+
+    return model, config, sidecar["tokenizer"], quantized
+
+def load_legacy_checkpoint(path):
+    """تحميل نقاط torch.save القديمة بأمان (weights_only) دون تنفيذ كائنات pickle
+
+    الإصدارات الأولى حفظت كائن PolyglotTutorConfig نفسه؛ هو الصنف الوحيد المسموح به إضافة للموترات.
+    السماح به يتطلب torch 2.4 أو أحدث؛ الإصدارات الأقدم تقرأ النقاط التي حفظت الإعدادات كقاموس فقط.
+    """
+    serialization = torch.serialization
+    if hasattr(serialization, "safe_globals"):  # torch >= 2.5
+        with serialization.safe_globals([PolyglotTutorConfig]):
+            return _unpack_legacy_checkpoint(torch.load(path, map_location="cpu", weights_only=True))
+    if hasattr(serialization, "add_safe_globals"):  # torch 2.4
+        serialization.add_safe_globals([PolyglotTutorConfig])
+    return _unpack_legacy_checkpoint(torch.load(path, map_location="cpu", weights_only=True))
+
+def _unpack_legacy_checkpoint(checkpoint):
+    config = checkpoint.get("config")
+    if isinstance(config, dict):
+        config = PolyglotTutorConfig.from_dict(config)
+    return (
+        checkpoint["model_state_dict"],
+        config if isinstance(config, PolyglotTutorConfig) else None,
+        checkpoint.get("tokenizer"),
+        checkpoint.get("quantization") == "dynamic_int8"
+    )
+
+def resolve_checkpoint(path):
+    """تحديد ملف النقطة وصيغته: (المسار، هل هو pickle قديم)
+
+    المسار بلاحقة قديمة (.pth) يُحمَّل كـ pickle إن وُجد، وإلا يُبحث عن ملف safetensors بنفس الاسم.
+    """
+    path = Path(path)
+    if path.suffix == WEIGHTS_SUFFIX:
+        return path, False
+    if path.exists():
+        return path, True
+    if path.with_suffix(WEIGHTS_SUFFIX).exists():
+        return path.with_suffix(WEIGHTS_SUFFIX), False
+    raise FileNotFoundError(f"لم يتم العثور على النقطة: {path}")
+
+_LOAD_PROBE = """
+import json, sys, time
+import torch
+from models.polyglot_model import PolyglotTutorConfig, PolyglotTutorModel
+from models.checkpoint_io import load_checkpoint
+
+def memory_mb(field):
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field):
+                return int(line.split()[1]) / 1024
+
+def load():
+    if sys.argv[1] == "legacy":
+        checkpoint = torch.load(sys.argv[2], map_location="cpu")
+        model = PolyglotTutorModel(PolyglotTutorConfig.from_dict(checkpoint["config"]))
+        model.load_state_dict(checkpoint["model_state_dict"])
+        return model
+    return load_checkpoint(sys.argv[2])[0]
+
+# تصفير ذروة RSS (VmHWM) بعد الاستيراد حتى تُقاس ذروة التحميل وحده
+with open("/proc/self/clear_refs", "w") as clear_refs:
+    clear_refs.write("5")
+rss_before, private_before = memory_mb("VmRSS"), memory_mb("RssAnon")
+started = time.perf_counter()
+model = load()
+cold_ms = (time.perf_counter() - started) * 1000
+with torch.no_grad():
+    model.classify(torch.ones(1, 8, dtype=torch.long))  # لمس الأوزان فعلياً
+result = {
+    "cold_ms": cold_ms,
+    "peak_mb": memory_mb("VmHWM") - rss_before,
+    "private_mb": memory_mb("RssAnon") - private_before
+}
+
+started = time.perf_counter()
+load()
+result["warm_ms"] = (time.perf_counter() - started) * 1000
+print(json.dumps(result))
+"""
+
+def benchmark_checkpoint_loading(output_dir="data/checkpoints"):
+    """مقارنة زمن التحميل والذاكرة بين pickle القديم و safetensors (كل تحميل في عملية جديدة)
+
+    private_mb: ذاكرة خاصة بالعملية (RssAnon)؛ صفحات ملف safetensors المعيّنة مشتركة بين العمليات.
+    """
+    import subprocess
+    import sys
+
+    model = PolyglotTutorModel(PolyglotTutorConfig()).eval()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    legacy_path = output_dir / "benchmark.pth"
+    torch.save({
+        "model_state_dict": {k: v.half() for k, v in model.state_dict().items()},
+        "config": model.config.to_dict(),
+        "tokenizer": {}
+    }, legacy_path)
+
+    variants = {
+        "legacy_fp16": ("legacy", legacy_path),
+        "safetensors_fp16": ("safetensors", save_checkpoint(model, output_dir / "benchmark_fp16", {})),
+        "safetensors_fp32": ("safetensors", save_checkpoint(model, output_dir / "benchmark_fp32", {},
+                                                            half_precision=False))
+    }
+
+    project_root = Path(__file__).resolve().parent.parent
+    results = {}
+    for name, (loader, path) in variants.items():
+        output = subprocess.run(
+            [sys.executable, "-c", _LOAD_PROBE, loader, str(path.resolve())],
+            cwd=project_root, capture_output=True, text=True, check=True
+        ).stdout
+        results[name] = json.loads(output.strip().splitlines()[-1])
+        print(f"📊 {name}: تحميل أول {results[name]['cold_ms']:.1f} مللي ث، لاحق {results[name]['warm_ms']:.1f} مللي ث، "
+              f"ذروة {results[name]['peak_mb']:.1f} ميجابايت، ذاكرة خاصة {results[name]['private_mb']:.1f} ميجابايت")
+
+    return results
+
+if __name__ == "__main__":
+    benchmark_checkpoint_loading()
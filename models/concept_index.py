@@ -0,0 +1,133 @@
+# models/concept_index.py
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+from utils.text_normalization import normalize_text
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# كلمات وظيفية لا تدل على مفهوم؛ مجموعة واحدة للغات الثلاث لأن وثيقة كل مفهوم تجمع شروحه الثلاثة
+STOPWORDS = frozenset(normalize_text(" ".join([
+    # العربية
+    "ما هو هي هل في من إلى الى على عن أن ان كيف لماذا ماذا مع هذا هذه ذلك تلك التي الذي بين كل ثم او أو "
+    "عند قد لا لم بها به له لها",
+    # الإنجليزية
+    "the an is are was were be been of to in on for and or with what which who how why does do did "
+    "this that these those it its as by from at can could you me my your between about into tell explain",
+    # الفرنسية
+    "le la les un une des du de est sont que qu qui quoi ce cet cette ces et ou en dans pour par sur "
+    "avec au aux se comment pourquoi quel quelle quels quelles je vous me mon ma mes entre expliquez"
+])).split())
+
+ARABIC_ARTICLE = normalize_text("ال")
+
+def _strip_article(token):
+    """حذف أداة التعريف العربية حتى تتطابق "القواعد" و"قواعد" (للكلمات الأطول من حرفين بعد الحذف)"""
+    return token[2:] if token.startswith(ARABIC_ARTICLE) and len(token) > 4 else token
+
+def tokenize(text):
+    """كلمات النص مطبّعة (بدون الرموز والكلمات ذات الحرف الواحد والكلمات الوظيفية)"""
+    return [
+        _strip_article(token) for token in TOKEN_PATTERN.findall(normalize_text(text))
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+class ConceptIndex:
+    """فهرس معكوس لمفاهيم مادة واحدة: كلمة ← [(المفهوم، وزن TF-IDF)] من شروح اللغات الثلاث
+
+    أوزان كل مفهوم مطبّعة (L2)، فدرجة السؤال هي مجموع أوزان كلماته في قوائم الورود.
+    """
+
+    LANGUAGES = ("ar", "en", "fr")
+
+    def __init__(self, concepts, tokenizer=tokenize):
+        self.tokenizer = tokenizer
+        self.concept_ids = list(concepts)
+
+        documents = []
+        for concept_id, concept_data in concepts.items():
+            tokens = self.tokenizer(" ".join(concept_data.get(language, "") for language in self.LANGUAGES))
+            # اسم المفهوم نفسه (مثل algebra) كلمة إضافية في وثيقته
+            tokens += self.tokenizer(concept_id.replace("_", " "))
+            documents.append(Counter(tokens))
+
+        document_frequency = Counter(token for document in documents for token in document)
+        num_documents = len(documents)
+
+        self.postings = defaultdict(list)
+        for doc_id, document in enumerate(documents):
+            weights = {
+                token: (1 + math.log(count)) * math.log((num_documents + 1) / document_frequency[token])
+                for token, count in document.items()
+            }
+            norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+            for token, weight in weights.items():
+                self.postings[token].append((doc_id, weight / norm))
+        self.postings = dict(self.postings)
+
+    def _document_scores(self, text):
+        accumulated = defaultdict(float)
+        for token in set(self.tokenizer(text)):
+            for doc_id, weight in self.postings.get(token, ()):
+                accumulated[doc_id] += weight
+        return accumulated
+
+    def scores(self, text):
+        """دمج قوائم ورود كلمات السؤال: {المفهوم: الدرجة} للمفاهيم ذات الدرجة الموجبة"""
+        return {self.concept_ids[doc_id]: score for doc_id, score in self._document_scores(text).items() if score > 0}
+
+    def search(self, text, top_k=3):
+        """أعلى المفاهيم درجة (الترتيب الأصلي عند التساوي)"""
+        accumulated = self._document_scores(text)
+        ranked = heapq.nsmallest(
+            top_k,
+            (doc_id for doc_id, score in accumulated.items() if score > 0),
+            key=lambda doc_id: (-accumulated[doc_id], doc_id)
+        )
+        return [self.concept_ids[doc_id] for doc_id in ranked]
+
+def benchmark_concept_lookup(concept_counts=(3, 100, 500), repeats=200):
+    """زمن إيجاد المفاهيم ذات الصلة: تقاطع كلمات كل شرح عربي لكل سؤال مقابل الفهرس المعكوس"""
+    import time
+    from .knowledge_base import EducationalKnowledgeBase
+
+    base = EducationalKnowledgeBase().subjects["math"]["concepts"]
+    questions = ["ما هو الجبر؟", "What is geometry?", "Qu'est-ce que le calcul?", "اشرح التفاضل والتكامل"]
+
+    def word_overlap(question, concepts):
+        relevant = []
+        question_words = set(question.lower().split())
+        for concept_id, concept_data in concepts.items():
+            if question_words & set(concept_data.get("ar", "").lower().split()) or concept_id in question.lower():
+                relevant.append(concept_id)
+        return relevant[:3]
+
+    results = {}
+    for count in concept_counts:
+        concepts = {
+            f"{concept_id}_{n}" if n else concept_id: {lang: f"{text} {n}" for lang, text in data.items()}
+            for n in range(max(1, count // len(base)))
+            for concept_id, data in base.items()
+        }
+        started = time.perf_counter()
+        index = ConceptIndex(concepts)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        timings = {}
+        for name, lookup in (("scan", lambda q: word_overlap(q, concepts)), ("index", index.search)):
+            started = time.perf_counter()
+            for _ in range(repeats):
+                for question in questions:
+                    lookup(question)
+            timings[name] = (time.perf_counter() - started) / (repeats * len(questions)) * 1e6
+
+        results[len(concepts)] = dict(timings, build_ms=build_ms)
+        print(f"📊 {len(concepts)} مفهوم: تقاطع الكلمات {timings['scan']:.1f} ميكروثانية ← فهرس معكوس "
+              f"{timings['index']:.1f} ميكروثانية (بناء {build_ms:.1f} مللي ث)")
+
+    return results
+
+if __name__ == "__main__":
+    benchmark_concept_lookup()
@@ -0,0 +1,73 @@
+# models/fast_tokenizer.py
+import re
+from functools import lru_cache
+
+import numpy as np
+import torch
+
+# كل ما ليس حرفاً أو رقماً أو من الرموز المسموحة (- _ . ? !) أو مسافة يُحذف في تمريرة واحدة
+CLEAN_PATTERN = re.compile(r"[^\w\-.?!\s]")
+
+class CompiledTokenizer:
+    """ترميز سريع فوق قاموس المفردات: تنظيف بتعبير منتظم مُجمَّع، دفعات محشوة، وذاكرة LRU"""
+
+    def __init__(self, vocab, max_length=256, cache_size=4096):
+        self.vocab = vocab
+        self.max_length = max_length
+        self.pad_id = vocab["[PAD]"]
+        self.unk_id = vocab["[UNK]"]
+        self.cls_id = vocab["[CLS]"]
+        self.sep_id = vocab["[SEP]"]
+        self.cache_size = cache_size
+        self._build_cache()
+
+    def _build_cache(self):
+        # ذاكرة LRU للأسئلة المتكررة (اختيارية)
+        self._encode_cached = lru_cache(maxsize=self.cache_size)(self._encode) if self.cache_size else self._encode
+
+    def __getstate__(self):
+        # ذاكرة LRU مغلفة لدالة مرتبطة لا تُنقل بـ pickle (spawn)؛ تُبنى فارغة في العملية الجديدة
+        state = self.__dict__.copy()
+        del state["_encode_cached"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._build_cache()
+
+    def _encode(self, text):
+        words = CLEAN_PATTERN.sub("", text).lower().split()
+
+        get = self.vocab.get
+        unk_id = self.unk_id
+        # [CLS] + الكلمات مقلمة بحيث يبقى مكان لـ [SEP]
+        tokens = [self.cls_id]
+        tokens.extend(get(word, unk_id) for word in words[:self.max_length - 2])
+        tokens.append(self.sep_id)
+        return tuple(tokens)
+
+    def encode(self, text):
+        """ترميز نص واحد إلى tuple من المعرفات بين [CLS] و [SEP]"""
+        return self._encode_cached(text or "")
+
+    def pad(self, token_lists, return_tensors="pt"):
+        """حشو قوائم المعرفات إلى أطولها مع قناع انتباه (1 للرموز، 0 للحشو)"""
+        lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(token_lists))
+        input_ids = np.full((len(token_lists), lengths.max()), self.pad_id, dtype=np.int64)
+
+        for row, tokens in enumerate(token_lists):
+            input_ids[row, :lengths[row]] = tokens
+
+        attention_mask = (np.arange(input_ids.shape[1]) < lengths[:, None]).astype(np.float32)
+
+        if return_tensors == "pt":
+            return torch.from_numpy(input_ids), torch.from_numpy(attention_mask)
+        return input_ids, attention_mask
+
+    def encode_batch(self, texts, return_tensors="pt"):
+        """ترميز مجموعة نصوص وإرجاع مصفوفات محشوة وأقنعة (torch أو numpy)"""
+        return self.pad([self.encode(text) for text in texts], return_tensors)
+
+    def cache_info(self):
+        """إحصائيات ذاكرة LRU"""
+        return self._encode_cached.cache_info() if hasattr(self._encode_cached, "cache_info") else None
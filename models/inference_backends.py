@@ -0,0 +1,201 @@
+# models/inference_backends.py
+import time
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+
+from .checkpoint_io import materialize_weights
+from utils.config import Config
+
+try:
+    import onnxruntime
+except ImportError:
+    print("⚠️ تنبيه: onnxruntime غير مثبت. سيتم تعطيل خلفية ONNX (pip install smarttutor-pro[onnx]).")
+    onnxruntime = None
+
+DEFAULT_EXPORT_DIR = Config.DATA_DIR / "exported"
+
+INPUT_NAMES = ["input_ids", "attention_mask", "language_id"]
+OUTPUT_NAMES = ["language_logits", "subject_logits"]
+DYNAMIC_AXES = {
+    "input_ids": {0: "batch", 1: "sequence"},
+    "attention_mask": {0: "batch", 1: "sequence"},
+    "language_id": {0: "batch"},
+    "language_logits": {0: "batch"},
+    "subject_logits": {0: "batch"}
+}
+
+class ClassificationWrapper(nn.Module):
+    """غلاف تصدير: مسار التصنيف فقط بمدخلات ومخرجات موضعية (tensors)"""
+
+    def __init__(self, model):
+        super().__init__()
+        # التتبع يحتاج الأوزان بنوعها النهائي (بدون خطافات الرفع الكسول)
+        self.model = materialize_weights(model)
+
+    def forward(self, input_ids, attention_mask, language_id):
+        outputs = self.model.classify(input_ids, attention_mask=attention_mask, language_id=language_id)
+        return outputs["language_logits"], outputs["subject_logits"]
+
+def example_inputs(batch_size=2, seq_length=16):
+    """مدخلات نموذجية للتتبع؛ المحاور الديناميكية تسمح بأي دفعة وطول لاحقاً"""
+    input_ids = torch.randint(5, 100, (batch_size, seq_length))
+    attention_mask = torch.ones(batch_size, seq_length)
+    language_id = torch.zeros(batch_size, dtype=torch.long)
+    return input_ids, attention_mask, language_id
+
+def export_torchscript(model, path):
+    """تصدير مسار التصنيف إلى TorchScript بالتتبع"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    wrapper = ClassificationWrapper(model).eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(wrapper, example_inputs())
+    traced.save(str(path))
+    return path
+
+def export_onnx(model, path, opset_version=17):
+    """تصدير مسار التصنيف إلى ONNX بمحوري دفعة وطول ديناميكيين"""
+    from .model_optimizer import ModelOptimizer
+
+    if ModelOptimizer.is_quantized(model):
+        raise ValueError("تصدير ONNX لا يدعم طبقات int8 الديناميكية؛ استخدم نسخة fp32 أو TorchScript")
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    wrapper = ClassificationWrapper(model).eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            example_inputs(),
+            str(path),
+            input_names=INPUT_NAMES,
+            output_names=OUTPUT_NAMES,
+            dynamic_axes=DYNAMIC_AXES,
+            opset_version=opset_version,
+            dynamo=False
+        )
+    return path
+
+class PyTorchBackend:
+    """التشغيل المباشر بنموذج PyTorch"""
+    name = "pytorch"
+
+    def __init__(self, model):
+        self.model = model
+
+    def classify(self, input_ids, attention_mask, language_id):
+        with torch.no_grad():
+            return self.model.classify(input_ids, attention_mask=attention_mask, language_id=language_id)
+
+class TorchScriptBackend:
+    """التشغيل بنموذج TorchScript مُصدَّر (دون الحاجة لشيفرة النموذج)"""
+    name = "torchscript"
+    suffix = ".pt"
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.module = torch.jit.load(str(path), map_location="cpu").eval()
+
+    def classify(self, input_ids, attention_mask, language_id):
+        with torch.no_grad():
+            language_logits, subject_logits = self.module(input_ids, attention_mask, language_id)
+        return {"language_logits": language_logits, "subject_logits": subject_logits}
+
+class OnnxRuntimeBackend:
+    """التشغيل عبر ONNX Runtime على المعالج"""
+    name = "onnx"
+    suffix = ".onnx"
+
+    def __init__(self, path):
+        if onnxruntime is None:
+            raise RuntimeError("onnxruntime غير مثبت")
+        self.path = Path(path)
+        self.session = onnxruntime.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+
+    def classify(self, input_ids, attention_mask, language_id):
+        feeds = {
+            "input_ids": input_ids.numpy(),
+            "attention_mask": attention_mask.float().numpy(),
+            "language_id": language_id.numpy()
+        }
+        language_logits, subject_logits = self.session.run(OUTPUT_NAMES, feeds)
+        return {
+            "language_logits": torch.from_numpy(language_logits),
+            "subject_logits": torch.from_numpy(subject_logits)
+        }
+
+BACKENDS = {
+    "pytorch": PyTorchBackend,
+    "torchscript": TorchScriptBackend,
+    "onnx": OnnxRuntimeBackend
+}
+
+EXPORTERS = {
+    "torchscript": export_torchscript,
+    "onnx": export_onnx
+}
+
+def create_backend(name, model, artifact_path=None, export_dir=DEFAULT_EXPORT_DIR):
+    """إنشاء خلفية تشغيل
+    
+    artifact_path موجود: يُحمَّل كما هو. غير موجود: يُصدَّر النموذج الحالي إليه.
+    None: يُصدَّر النموذج الحالي إلى export_dir (حتى لا تُستخدم نسخة قديمة).
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"خلفية غير معروفة: {name}")
+
+    if name == "pytorch":
+        return PyTorchBackend(model)
+
+    backend_class = BACKENDS[name]
+    if artifact_path is None:
+        artifact_path = Path(export_dir) / f"polyglot_tutor{backend_class.suffix}"
+        EXPORTERS[name](model, artifact_path)
+    elif not Path(artifact_path).exists():
+        EXPORTERS[name](model, artifact_path)
+
+    return backend_class(artifact_path)
+
+def benchmark_backends(batch_sizes=(1, 8, 32), seq_length=32, repeats=20, export_dir=DEFAULT_EXPORT_DIR):
+    """مقارنة زمن بدء التشغيل والاستدلال بين الخلفيات الثلاث"""
+    from .polyglot_model import PolyglotTutorConfig, PolyglotTutorModel
+
+    model = PolyglotTutorModel(PolyglotTutorConfig()).eval()
+    artifacts = {name: EXPORTERS[name](model, Path(export_dir) / f"polyglot_tutor{BACKENDS[name].suffix}")
+                 for name in EXPORTERS}
+    results = {}
+
+    for name in BACKENDS:
+        if name == "onnx" and onnxruntime is None:
+            continue
+
+        started = time.perf_counter()
+        if name == "pytorch":
+            # بدء PyTorch يشمل بناء النموذج وتحميل أوزانه
+            fresh_model = PolyglotTutorModel(model.config).eval()
+            fresh_model.load_state_dict(model.state_dict())
+            backend = PyTorchBackend(fresh_model)
+        else:
+            backend = create_backend(name, model, artifacts[name])
+        startup_ms = (time.perf_counter() - started) * 1000
+        results[name] = {"startup_ms": startup_ms}
+
+        for batch_size in batch_sizes:
+            inputs = example_inputs(batch_size, seq_length)
+            backend.classify(*inputs)  # تسخين
+            started = time.perf_counter()
+            for _ in range(repeats):
+                backend.classify(*inputs)
+            results[name][batch_size] = (time.perf_counter() - started) / repeats * 1000
+
+        latencies = "، ".join(f"دفعة {b}: {results[name][b]:.2f}" for b in batch_sizes)
+        print(f"📊 {name}: بدء {startup_ms:.1f} مللي ث | {latencies} مللي ث")
+
+    return results
+
+if __name__ == "__main__":
+    benchmark_backends()
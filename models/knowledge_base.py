@@ -1,188 +1,112 @@
 # models/knowledge_base.py
 import json
 import re
+import weakref
 from typing import Dict, List, Optional
 
+from .aho_corasick import AhoCorasick
+from .concept_index import ConceptIndex
+from .question_classifier import QuestionClassifier
+from utils.text_normalization import normalize_text
+from .knowledge_store import KnowledgeStore, DEFAULT_SOURCE, DEFAULT_SNAPSHOT
+
 class EducationalKnowledgeBase:
-    def __init__(self):
-        self.subjects = self._load_comprehensive_knowledge()
+    def __init__(self, source_path=DEFAULT_SOURCE, snapshot_path=DEFAULT_SNAPSHOT):
+        # المحتوى في models/content مجمّع إلى لقطة؛ مفاهيم كل مادة تُحمَّل عند أول وصول
+        self.subjects = KnowledgeStore(source_path, snapshot_path)
         self.language_codes = {"ar": 0, "en": 1, "fr": 2}
         self.subject_codes = {subject: idx for idx, subject in enumerate(self.subjects.keys())}
+        self._subject_matchers = {}  # آلة Aho-Corasick لكل لغة، تُبنى عند أول استخدام
+        self._concept_indexes = {}  # فهرس معكوس لمفاهيم كل مادة، يُبنى عند أول سؤال فيها
+        self._question_classifier = None
+        self._change_listeners = []  # مراجع ضعيفة لمن يحفظ نتائج مشتقة من المحتوى
+        self.language_detector = self.subjects.language_detector()
     
-    def _load_comprehensive_knowledge(self):
-        """قاعدة معرفة شاملة للمواد الدراسية"""
-        return {
-            "math": {
-                "name": {"ar": "الرياضيات", "en": "Mathematics", "fr": "Mathématiques"},
-                "concepts": {
-                    "algebra": {
-                        "ar": "الجبر هو فرع من الرياضيات يدرس الرموز والقوانين الرياضية لحل المعادلات",
-                        "en": "Algebra is a branch of mathematics that studies mathematical symbols and rules for solving equations",
-                        "fr": "L'algèbre est une branche des mathématiques qui étudie les symboles et règles mathématiques pour résoudre des équations"
-                    },
-                    "geometry": {
-                        "ar": "الهندسة تدرس الأشكال والفراغ والعلاقات بين النقاط والخطوط والسطوح",
-                        "en": "Geometry studies shapes, space, and relationships between points, lines, and surfaces",
-                        "fr": "La géométrie étudie les formes, l'espace et les relations entre points, lignes et surfaces"
-                    },
-                    "calculus": {
-                        "ar": "التفاضل والتكامل يدرس التغير والتراكم ومعدلات التغير",
-                        "en": "Calculus studies change, accumulation, and rates of change",
-                        "fr": "Le calcul étudie le changement, l'accumulation et les taux de changement"
-                    }
-                },
-                "keywords": {
-                    "ar": ["معادلة", "مجهول", "زاوية", "مساحة", "تكامل", "تفاضل", "دالة", "متغير"],
-                    "en": ["equation", "variable", "angle", "area", "integral", "derivative", "function", "variable"],
-                    "fr": ["équation", "variable", "angle", "surface", "intégrale", "dérivée", "fonction", "variable"]
-                }
-            },
-            "english": {
-                "name": {"ar": "اللغة الإنجليزية", "en": "English Language", "fr": "Anglais"},
-                "concepts": {
-                    "grammar": {
-                        "ar": "قواعد اللغة الإنجليزية تشمل الأزمنة والأفعال المساعدة والجمل الشرطية",
-                        "en": "English grammar includes tenses, auxiliary verbs, and conditional sentences",
-                        "fr": "La grammaire anglaise comprend les temps, les verbes auxiliaires et les phrases conditionnelles"
-                    },
-                    "tenses": {
-                        "ar": "أزمنة اللغة الإنجليزية تشمل الماضي والحاضر والمستقبل بأنواعها",
-                        "en": "English tenses include past, present, and future in various forms",
-                        "fr": "Les temps anglais incluent le passé, le présent et le futur sous diverses formes"
-                    },
-                    "vocabulary": {
-                        "ar": "المفردات الإنجليزية أساسية للتواصل والقراءة والكتابة",
-                        "en": "English vocabulary is essential for communication, reading, and writing",
-                        "fr": "Le vocabulaire anglais est essentiel pour la communication, la lecture et l'écriture"
-                    }
-                },
-                "keywords": {
-                    "ar": ["قواعد", "زمن", "فعل", "جملة", "مفردات", "محادثة", "قراءة", "كتابة"],
-                    "en": ["grammar", "tense", "verb", "sentence", "vocabulary", "conversation", "reading", "writing"],
-                    "fr": ["grammaire", "temps", "verbe", "phrase", "vocabulaire", "conversation", "lecture", "écriture"]
-                }
-            },
-            "french": {
-                "name": {"ar": "اللغة الفرنسية", "en": "French Language", "fr": "Français"},
-                "concepts": {
-                    "grammar": {
-                        "ar": "قواعد الفرنسية تشمل التذكير والتأنيث والأدوات والتركيب",
-                        "en": "French grammar includes gender, articles, and sentence structure",
-                        "fr": "La grammaire française comprend le genre, les articles et la structure des phrases"
-                    },
-                    "conjugation": {
-                        "ar": "تصريف الأفعال الفرنسية حسب الزمن والضمير والمبني للمعلوم والمبني للمجهول",
-                        "en": "French verb conjugation according to tense, pronoun, and voice",
-                        "fr": "La conjugaison des verbes français selon le temps, le pronom et la voix"
-                    },
-                    "pronunciation": {
-                        "ar": "نطق الفرنسية يعتمد على الحروف الصامتة والمتحركة والحركات",
-                        "en": "French pronunciation depends on consonants, vowels, and accents",
-                        "fr": "La prononciation française dépend des consonnes, des voyelles et des accents"
-                    }
-                },
-                "keywords": {
-                    "ar": ["قواعد", "تصريف", "نطق", "ضمير", "حرف", "جنس", "أداة", "تركيب"],
-                    "en": ["grammar", "conjugation", "pronunciation", "pronoun", "article", "gender", "tool", "structure"],
-                    "fr": ["grammaire", "conjugaison", "prononciation", "pronom", "article", "genre", "outil", "structure"]
-                }
-            },
-            "science": {
-                "name": {"ar": "العلوم", "en": "Science", "fr": "Science"},
-                "concepts": {
-                    "physics": {
-                        "ar": "الفيزياء تدرس المادة والطاقة والقوى والحركة والقوانين الطبيعية",
-                        "en": "Physics studies matter, energy, forces, motion, and natural laws",
-                        "fr": "La physique étudie la matière, l'énergie, les forces, le mouvement et les lois naturelles"
-                    },
-                    "chemistry": {
-                        "ar": "الكيمياء تدرس العناصر والمركبات والتفاعلات والروابط الكيميائية",
-                        "en": "Chemistry studies elements, compounds, reactions, and chemical bonds",
-                        "fr": "La chimie étudie les éléments, les composés, les réactions et les liaisons chimiques"
-                    },
-                    "biology": {
-                        "ar": "الأحياء تدرس الكائنات الحية والخلية والوراثة والتطور",
-                        "en": "Biology studies living organisms, cells, genetics, and evolution",
-                        "fr": "La biologie étudie les organismes vivants, les cellules, la génétique et l'évolution"
-                    }
-                },
-                "keywords": {
-                    "ar": ["طاقة", "قوة", "تفاعل", "عنصر", "مركب", "خلية", "وراثة", "تطور"],
-                    "en": ["energy", "force", "reaction", "element", "compound", "cell", "genetics", "evolution"],
-                    "fr": ["énergie", "force", "réaction", "élément", "composé", "cellule", "génétique", "évolution"]
-                }
-            },
-            "arabic": {
-                "name": {"ar": "اللغة العربية", "en": "Arabic Language", "fr": "Arabe"},
-                "concepts": {
-                    "grammar": {
-                        "ar": "النحو يدرس إعراب الكلمات وموقعها الإعرابي في الجملة",
-                        "en": "Grammar studies the parsing of words and their grammatical position in the sentence",
-                        "fr": "La grammaire étudie l'analyse des mots et leur position grammaticale dans la phrase"
-                    },
-                    "morphology": {
-                        "ar": "الصرف يدرس بنية الكلمة وتصريفها وأوزانها",
-                        "en": "Morphology studies word structure, conjugation, and patterns",
-                        "fr": "La morphologie étudie la structure des mots, la conjugaison et les modèles"
-                    },
-                    "rhetoric": {
-                        "ar": "البلاغة تدرس فنون البيان والمعاني والبديع",
-                        "en": "Rhetoric studies the arts of expression, meanings, and embellishment",
-                        "fr": "La rhétorique étudie les arts de l'expression, les significations et l'embellissement"
-                    }
-                },
-                "keywords": {
-                    "ar": ["نحو", "صرف", "بلاغة", "إعراب", "بناء", "فعل", "اسم", "حرف"],
-                    "en": ["grammar", "morphology", "rhetoric", "parsing", "structure", "verb", "noun", "letter"],
-                    "fr": ["grammaire", "morphologie", "rhétorique", "analyse", "structure", "verbe", "nom", "lettre"]
-                }
-            }
-        }
+    def language_scores(self, text):
+        """عدد حروف كل لغة في النص (الحروف اللاتينية موزعة بين fr و en حسب نموذج الحروف)"""
+        return self.language_detector.scores_batch([text])[0]
     
     def detect_language(self, text):
-        """كشف اللغة التلقائي المحسن"""
-        arabic_chars = set('ءآأؤإئابةتثجحخدذرزسشصضطظعغفقكلمنهوي')
-        french_chars = set('éèêëàâçîïôùûüÿœæ')
-        english_chars = set('abcdefghijklmnopqrstuvwxyz')
-        
-        text_chars = set(text.lower())
-        
-        arabic_count = len(text_chars & arabic_chars)
-        french_count = len(text_chars & french_chars)
-        english_count = len(text_chars & english_chars)
-        
-        if arabic_count > max(french_count, english_count, 3):
-            return "ar"
-        elif french_count > max(arabic_count, english_count, 3):
-            return "fr"
-        elif english_count > max(arabic_count, french_count, 3):
-            return "en"
-        else:
-            # إذا كانت النسب متقاربة، نستخدم خوارزمية أكثر تطوراً
-            return self._advanced_language_detection(text)
+        """كشف اللغة التلقائي حسب نطاقات الكتابة ونموذج الحروف"""
+        return self.language_detector.detect_batch([text])[0]
     
-    def _advanced_language_detection(self, text):
-        """كشف اللغة المتقدم باستخدام الكلمات الشائعة"""
-        arabic_common = ['ال', 'في', 'من', 'على', 'إلى', 'أن', 'هو', 'هي']
-        french_common = ['le', 'la', 'et', 'est', 'un', 'une', 'dans', 'pour']
-        english_common = ['the', 'and', 'is', 'in', 'to', 'of', 'a', 'for']
-        
-        text_lower = text.lower()
-        arabic_score = sum(1 for word in arabic_common if word in text_lower)
-        french_score = sum(1 for word in french_common if word in text_lower)
-        english_score = sum(1 for word in english_common if word in text_lower)
-        
-        scores = {
-            "ar": arabic_score,
-            "fr": french_score, 
-            "en": english_score
-        }
+    def detect_language_batch(self, texts):
+        """كشف لغة مجموعة نصوص دفعة واحدة (لتوسيم أجزاء المستندات عند الإدخال)"""
+        return self.language_detector.detect_batch(texts)
+    
+    def language_scores_batch(self, texts):
+        """درجات اللغات لمجموعة نصوص دفعة واحدة"""
+        return self.language_detector.scores_batch(texts)
+    
+    def subject_scores(self, text, language):
+        """درجة كل مادة حسب الكلمات المفتاحية وأسماء المفاهيم وأسماء المواد في النص (مرور واحد)"""
+        scores = dict.fromkeys(self.subjects, 0)
+        seen = set()
+        
+        for _, (entry_id, subject, weight) in self._subject_matcher(language).iter_matches(normalize_text(text)):
+            # كل مدخل يُحتسب مرة واحدة مهما تكرر في السؤال
+            if entry_id not in seen:
+                seen.add(entry_id)
+                scores[subject] += weight
+        
+        return scores
+    
+    def _subject_matcher(self, language):
+        matcher = self._subject_matchers.get(language)
+        if matcher is None:
+            matcher = self._build_subject_matcher(language)
+            self._subject_matchers[language] = matcher
+        return matcher
+    
+    def _build_subject_matcher(self, language):
+        """تجميع كل أنماط المواد (مطبّعة) في آلة واحدة بحمولة (معرّف المدخل، المادة، الوزن)"""
+        matcher = AhoCorasick()
+        entry_id = 0
+        
+        for subject in self.subjects:
+            # الفهرس يكفي: لا حاجة لتحميل نصوص المفاهيم
+            data = self.subjects.summary(subject)
+            patterns = [(keyword, 2) for keyword in data["keywords"].get(language, [])]
+            patterns += [(concept_name, 3) for concept_name in data["concept_ids"]]
+            patterns += [(data["name"][lang], 5) for lang in ["ar", "en", "fr"]]
+            
+            for pattern, weight in patterns:
+                matcher.add(normalize_text(pattern), (entry_id, subject, weight))
+                entry_id += 1
         
-        return max(scores.items(), key=lambda x: x[1])[0] if max(scores.values()) > 0 else "en"
+        return matcher.build()
     
-    def detect_subject(self, text, language):
-        """كشف المادة الدراسية المحسن"""
-        text_lower = text.lower()
+    def concept_index(self, subject):
+        """الفهرس المعكوس لمفاهيم المادة (None إذا لم تكن المادة موجودة)"""
+        index = self._concept_indexes.get(subject)
+        if index is None and subject in self.subjects:
+            index = ConceptIndex(self.subjects[subject].get("concepts", {}))
+            self._concept_indexes[subject] = index
+        return index
+    
+    def add_change_listener(self, callback):
+        """استدعاء دالة (طريقة كائن) بعد كل تعديل للمحتوى؛ المرجع ضعيف فلا يُبقي الكائن حياً"""
+        self._change_listeners.append(weakref.WeakMethod(callback))
+    
+    def invalidate_subject_matchers(self):
+        """إعادة بناء الآلات والفهارس بعد تعديل الكلمات المفتاحية أو المفاهيم أو المواد، وإبلاغ المستمعين"""
+        self._subject_matchers.clear()
+        self._concept_indexes.clear()
+        self._question_classifier = None
+        
+        self._change_listeners = [ref for ref in self._change_listeners if ref() is not None]
+        for ref in self._change_listeners:
+            ref()()
+    
+    def question_classifier(self):
+        """المصنف الموحد (اللغة + المادة + نوع السؤال في مرور واحد)، يُبنى عند أول استخدام"""
+        if self._question_classifier is None:
+            self._question_classifier = QuestionClassifier(self)
+        return self._question_classifier
+    
+    def _scan_subject_scores(self, text, language):
+        """الطريقة المرجعية القديمة (بحث منفصل لكل نمط) للمقارنة والقياس"""
+        text_lower = normalize_text(text)
         scores = {}
         
         for subject, data in self.subjects.items():
@@ -191,239 +115,76 @@ class EducationalKnowledgeBase:
             # البحث في الكلمات المفتاحية للمادة
             keywords = data["keywords"].get(language, [])
             for keyword in keywords:
-                if keyword in text_lower:
+                if normalize_text(keyword) in text_lower:
                     score += 2
             
             # البحث في أسماء المفاهيم
             for concept_name in data["concepts"].keys():
-                if concept_name in text_lower:
+                if normalize_text(concept_name) in text_lower:
                     score += 3
             
             # البحث في أسماء المواد باللغات المختلفة
             for lang in ["ar", "en", "fr"]:
-                subject_name = data["name"][lang].lower()
+                subject_name = normalize_text(data["name"][lang])
                 if subject_name in text_lower:
                     score += 5
             
             scores[subject] = score
         
-        # إرجاع المادة ذات أعلى درجة، أو الرياضيات كافتراضي
-        best_subject = max(scores.items(), key=lambda x: x[1])[0] if scores else "math"
-        return best_subject if scores[best_subject] > 0 else "math"
-# في models/knowledge_base.py - محسن لكشف أي مادة
-def detect_subject(self, text, language):
-    """كشف المادة الدراسية - يعمل مع أي مادة جديدة"""
-    text_lower = text.lower()
-    scores = {}
+        return scores
     
-    # 1. البحث في المواد المعرفة مسبقاً
-    for subject, data in self.subjects.items():
-        score = 0
-        
-        # البحث في الكلمات المفتاحية
-        keywords = data["keywords"].get(language, [])
-        for keyword in keywords:
-            if keyword in text_lower:
-                score += 2
-        
-        # البحث في أسماء المفاهيم
-        for concept_name in data["concepts"].keys():
-            if concept_name in text_lower:
-                score += 3
-        
-        # البحث في أسماء المواد
-        for lang in ["ar", "en", "fr"]:
-            subject_name = data["name"][lang].lower()
-            if subject_name in text_lower:
-                score += 5
-        
-        scores[subject] = score
+    def detect_subject(self, text, language):
+        """كشف المادة الدراسية المحسن"""
+        return self.best_subject(self.subject_scores(text, language))
     
-    # 2. إذا لم توجد نتائج قوية، نستخدم الكشف الذكي للمواد الجديدة
-    if not scores or max(scores.values()) < 2:
-        return self._detect_new_subject(text, language)
+    @staticmethod
+    def best_subject(scores):
+        """المادة ذات أعلى درجة، أو الرياضيات كافتراضي"""
+        best_subject = max(scores.items(), key=lambda x: x[1])[0] if scores else "math"
+        return best_subject if scores.get(best_subject, 0) > 0 else "math"
     
-    best_subject = max(scores.items(), key=lambda x: x[1])[0]
-    return best_subject
+    @staticmethod
+    def score_margin(scores):
+        """الفرق بين أعلى درجتين (مدى حسم الكشف)"""
+        ranked = sorted(scores.values(), reverse=True)
+        if not ranked:
+            return 0
+        return ranked[0] - (ranked[1] if len(ranked) > 1 else 0)
 
-def _detect_new_subject(self, text, language):
-    """كشف المواد الجديدة بناءً على المحتوى"""
-    text_lower = text.lower()
-    
-    # كلمات مفتاحية للمواد الشائعة
-    subject_keywords = {
-        "physics": {
-            "ar": ["طاقة", "قوة", "حركة", "سرعة", "تسارع", "كتلة", "شحنة", "مغناطيس"],
-            "en": ["energy", "force", "motion", "velocity", "acceleration", "mass", "charge", "magnet"],
-            "fr": ["énergie", "force", "mouvement", "vitesse", "accélération", "masse", "charge", "aimant"]
-        },
-        "chemistry": {
-            "ar": ["عنصر", "مركب", "تفاعل", "ذرة", "جزيء", "ph", "حمض", "قلوي"],
-            "en": ["element", "compound", "reaction", "atom", "molecule", "ph", "acid", "base"],
-            "fr": ["élément", "composé", "réaction", "atome", "molécule", "ph", "acide", "base"]
-        },
-        "history": {
-            "ar": ["تاريخ", "حضارة", "امبراطورية", "ملك", "معركة", "ثورة", "قديم", "وسيط"],
-            "en": ["history", "civilization", "empire", "king", "battle", "revolution", "ancient", "medieval"],
-            "fr": ["histoire", "civilisation", "empire", "roi", "bataille", "révolution", "ancien", "médiéval"]
-        },
-        "geography": {
-            "ar": ["خريطة", "قارة", "محيط", "جبل", "نهر", "مناخ", "تضاريس", "دولة"],
-            "en": ["map", "continent", "ocean", "mountain", "river", "climate", "terrain", "country"],
-            "fr": ["carte", "continent", "océan", "montagne", "rivière", "climat", "relief", "pays"]
-        }
-    }
-    
-    scores = {}
-    for subject, keywords in subject_keywords.items():
-        score = 0
-        for keyword in keywords.get(language, []):
-            if keyword in text_lower:
-                score += 2
-        scores[subject] = score
+def benchmark_subject_detection(subject_counts=(0, 50, 200), keywords_per_subject=100, repeats=200):
+    """مقارنة آلة Aho-Corasick مع البحث نمطاً بنمط مع زيادة عدد المواد والكلمات المفتاحية"""
+    import time
     
-    if scores and max(scores.values()) > 0:
-        return max(scores.items(), key=lambda x: x[1])[0]
+    questions = [
+        "What is algebra? Solve the equation for the variable x",
+        "ما هي قواعد اللغة الإنجليزية وكيف أتعلم المفردات؟",
+        "Expliquez la grammaire française et la conjugaison des verbes"
+    ]
+    results = {}
     
-    return "general"  # إذا لم يتم التعرف، نستخدم الوضع العام
-# أضف هذا في models/knowledge_base.py داخل _load_comprehensive_knowledge
-def _load_comprehensive_knowledge(self):
-    return {
-        # ... المواد الحالية
-        
-        # إضافة مواد جديدة
-        "physics": {
-            "name": {"ar": "الفيزياء", "en": "Physics", "fr": "Physique"},
-            "concepts": {
-                "mechanics": {
-                    "ar": "الميكانيكا تدرس الحركة والقوى والطاقة",
-                    "en": "Mechanics studies motion, forces, and energy", 
-                    "fr": "La mécanique étudie le mouvement, les forces et l'énergie"
-                },
-                "optics": {
-                    "ar": "البصريات تدرس الضوء وخصائصه وتفاعله مع المادة",
-                    "en": "Optics studies light, its properties, and interaction with matter",
-                    "fr": "L'optique étudie la lumière, ses propriétés et son interaction avec la matière"
-                }
-            },
-            "keywords": {
-                "ar": ["قوة", "طاقة", "حركة", "ضوء", "صوت", "حرارة", "كهرباء", "مغناطيس"],
-                "en": ["force", "energy", "motion", "light", "sound", "heat", "electricity", "magnet"],
-                "fr": ["force", "énergie", "mouvement", "lumière", "son", "chaleur", "électricité", "aimant"]
-            }
-        },
-        
-        "chemistry": {
-            "name": {"ar": "الكيمياء", "en": "Chemistry", "fr": "Chimie"},
-            "concepts": {
-                "organic": {
-                    "ar": "الكيمياء العضوية تدرس مركبات الكربون وتفاعلاتها",
-                    "en": "Organic chemistry studies carbon compounds and their reactions",
-                    "fr": "La chimie organique étudie les composés carbonés et leurs réactions"
-                },
-                "inorganic": {
-                    "ar": "الكيمياء غير العضوية تدرس العناصر والمركبات غير العضوية",
-                    "en": "Inorganic chemistry studies elements and inorganic compounds",
-                    "fr": "La chimie inorganique étudie les éléments et composés inorganiques"
-                }
-            },
-            "keywords": {
-                "ar": ["عنصر", "مركب", "تفاعل", "ذرة", "جزيء", "حمض", "قلوي", "محلول"],
-                "en": ["element", "compound", "reaction", "atom", "molecule", "acid", "base", "solution"],
-                "fr": ["élément", "composé", "réaction", "atome", "molécule", "acide", "base", "solution"]
-            }
-        },
-        
-        "history": {
-            "name": {"ar": "التاريخ", "en": "History", "fr": "Histoire"},
-            "concepts": {
-                "ancient": {
-                    "ar": "التاريخ القديم يدرس الحضارات الأولى وتطور المجتمعات البشرية",
-                    "en": "Ancient history studies early civilizations and human society development",
-                    "fr": "L'histoire ancienne étudie les premières civilisations et le développement des sociétés humaines"
-                },
-                "modern": {
-                    "ar": "التاريخ الحديث يدرس الفترة من القرن الخامس عشر إلى الوقت الحاضر",
-                    "en": "Modern history studies the period from the 15th century to the present",
-                    "fr": "L'histoire moderne étudie la période du XVe siècle à nos jours"
-                }
-            },
-            "keywords": {
-                "ar": ["تاريخ", "حضارة", "امبراطورية", "ملك", "معركة", "ثورة", "قديم", "حديث"],
-                "en": ["history", "civilization", "empire", "king", "battle", "revolution", "ancient", "modern"],
-                "fr": ["histoire", "civilisation", "empire", "roi", "bataille", "révolution", "ancien", "moderne"]
+    for extra_subjects in subject_counts:
+        kb = EducationalKnowledgeBase()
+        for n in range(extra_subjects):
+            kb.subjects[f"synthetic_{n}"] = {
+                "name": {lang: f"subject{n}{lang}" for lang in ("ar", "en", "fr")},
+                "concepts": {f"concept{n}_{c}": {} for c in range(10)},
+                "keywords": {lang: [f"kw{n}_{k}{lang}" for k in range(keywords_per_subject)] for lang in ("ar", "en", "fr")}
             }
-        }
-        }
-# models/knowledge_base.py - إضافة محتوى غني
-def _load_comprehensive_knowledge(self):
-    return {
-        # ... المواد الحالية
-        
-        # إضافة محتوى غني للرياضيات
-        "math": {
-            "name": {"ar": "الرياضيات", "en": "Mathematics", "fr": "Mathématiques"},
-            "concepts": {
-                "algebra": {
-                    "ar": """الجبر هو فرع الرياضيات الذي يدرس الرموز الرياضية والعلاقات بينها.
-                    
-**المفاهيم الأساسية:**
-- المتغيرات والمعادلات
-- الدوال والرسوم البيانية
-- المعادلات الخطية والتربيعية
-- المصفوفات والمحددات
-
-**التطبيقات العملية:**
-- حل مسائل الحياة اليومية
-- التحليل المالي والاقتصادي
-- البرمجة والذكاء الاصطناعي""",
-                    
-                    "en": """Algebra is the branch of mathematics that studies mathematical symbols and relationships between them.
-
-**Core Concepts:**
-- Variables and equations
-- Functions and graphs
-- Linear and quadratic equations
-- Matrices and determinants
-
-**Practical Applications:**
-- Solving daily life problems
-- Financial and economic analysis
-- Programming and artificial intelligence""",
-                    
-                    "fr": """L'algèbre est la branche des mathématiques qui étudie les symboles mathématiques et les relations entre eux.
-
-**Concepts de Base:**
-- Variables et équations
-- Fonctions et graphiques
-- Équations linéaires et quadratiques
-- Matrices et déterminants
+        kb.invalidate_subject_matchers()
+        kb.subject_scores("", "en")  # بناء الآلة خارج القياس
+        
+        timings = {}
+        for name, scorer in (("scan", kb._scan_subject_scores), ("automaton", kb.subject_scores)):
+            started = time.perf_counter()
+            for _ in range(repeats):
+                for question in questions:
+                    scorer(question, "en")
+            timings[name] = (time.perf_counter() - started) / (repeats * len(questions)) * 1e6
+        
+        results[len(kb.subjects)] = timings
+        print(f"📊 {len(kb.subjects)} مادة: بحث منفصل {timings['scan']:.1f} ميكروثانية ← آلة واحدة {timings['automaton']:.1f} ميكروثانية")
+    
+    return results
 
-**Applications Pratiques:**
-- Résolution de problèmes quotidiens
-- Analyse financière et économique
-- Programmation et intelligence artificielle"""
-                },
-                # ... إضافة 5-10 مفاهيم إضافية لكل مادة
-            },
-            "examples": {
-                "algebra": {
-                    "ar": [
-                        "مثال 1: حل المعادلة 2س + 5 = 11 → س = 3",
-                        "مثال 2: حل النظام س + ص = 5، س - ص = 1 → س=3، ص=2",
-                        "مثال 3: تحليل المقدار س² - 4 → (س-2)(س+2)"
-                    ],
-                    "en": [
-                        "Example 1: Solve 2x + 5 = 11 → x = 3",
-                        "Example 2: Solve system x + y = 5, x - y = 1 → x=3, y=2", 
-                        "Example 3: Factor x² - 4 → (x-2)(x+2)"
-                    ],
-                    "fr": [
-                        "Exemple 1: Résoudre 2x + 5 = 11 → x = 3",
-                        "Exemple 2: Résoudre le système x + y = 5, x - y = 1 → x=3, y=2",
-                        "Exemple 3: Factoriser x² - 4 → (x-2)(x+2)"
-                    ]
-                }
-            }
-        }
-                       }
+if __name__ == "__main__":
+    benchmark_subject_detection()
@@ -0,0 +1,263 @@
+# models/knowledge_store.py
+import hashlib
+import json
+import mmap
+import struct
+from collections.abc import MutableMapping
+from pathlib import Path
+
+from utils.config import Config
+from utils.helpers import atomic_write_bytes
+from .language_detector import LanguageDetector, SEED_CORPUS
+
+CONTENT_DIR = Path(__file__).parent / "content"
+DEFAULT_SOURCE = CONTENT_DIR / "knowledge_base.json"
+DEFAULT_SNAPSHOT = Config.DATA_DIR / "snapshots" / "knowledge.skb"
+
+# رأس اللقطة: توقيع + طول الفهرس، ثم الفهرس (JSON)، ثم مفاهيم كل مادة ككتلة JSON مستقلة
+SNAPSHOT_MAGIC = b"SKB1"
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct("<4sQ")
+
+def subject_hash(subject_data):
+    """بصمة محتوى مادة واحدة (تُحسب بنفس الطريقة وقت التجميع ووقت التشغيل)"""
+    source = json.dumps(subject_data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+def language_corpus(subjects):
+    """نصوص تدريب نموذج الحروف: أسماء المواد وشروح المفاهيم والكلمات المفتاحية بكل لغة لاتينية"""
+    corpus = {language: list(SEED_CORPUS[language]) for language in ("en", "fr")}
+    for data in subjects.values():
+        for language in corpus:
+            corpus[language].append(data["name"][language])
+            corpus[language].extend(data["keywords"].get(language, []))
+            corpus[language].extend(concept[language] for concept in data["concepts"].values() if language in concept)
+    return corpus
+
+def _source_stamp(source_path):
+    stat = Path(source_path).stat()
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+def compile_knowledge(source_path=DEFAULT_SOURCE):
+    """تجميع ملف المحتوى إلى لقطة ثنائية: فهرس صغير (أسماء، كلمات مفتاحية، معرفات المفاهيم) + كتلة لكل مادة"""
+    source = json.loads(Path(source_path).read_text(encoding="utf-8"))
+    if source.get("format_version") != SNAPSHOT_VERSION:
+        raise ValueError(f"إصدار محتوى غير مدعوم: {source.get('format_version')}")
+
+    subjects = source["subjects"]
+    blobs = []
+    offset = 0
+    index_subjects = {}
+
+    for subject, data in subjects.items():
+        # كل ما عدا الاسم والكلمات المفتاحية (المفاهيم أساساً) يُحمَّل كسولاً
+        body = {key: value for key, value in data.items() if key not in ("name", "keywords")}
+        blob = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        index_subjects[subject] = {
+            "name": data["name"],
+            "keywords": data["keywords"],
+            "concept_ids": list(data["concepts"]),
+            "offset": offset,
+            "length": len(blob),
+            "hash": subject_hash(data)
+        }
+        blobs.append(blob)
+        offset += len(blob)
+
+    detector = LanguageDetector.train(language_corpus(subjects))
+    index = {
+        "version": SNAPSHOT_VERSION,
+        "source": _source_stamp(source_path),
+        "subjects": index_subjects,
+        "language_model": {"weights": detector.ngram_weights, "unseen_weight": detector.unseen_weight}
+    }
+    raw_index = json.dumps(index, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    return _HEADER.pack(SNAPSHOT_MAGIC, len(raw_index)) + raw_index + b"".join(blobs)
+
+def build_knowledge_snapshot(source_path=DEFAULT_SOURCE, snapshot_path=DEFAULT_SNAPSHOT):
+    """خطوة البناء: تجميع المحتوى وحفظ اللقطة"""
+    data = compile_knowledge(source_path)
+    Path(snapshot_path).parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_bytes(Path(snapshot_path), data)
+    return data
+
+class KnowledgeStore(MutableMapping):
+    """المواد الدراسية كقاموس كسول فوق اللقطة المجمعة
+
+    عند الإنشاء يُقرأ الفهرس فقط (أسماء المواد والكلمات المفتاحية ومعرفات المفاهيم)؛
+    مفاهيم كل مادة تُقرأ من الملف المعيّن في الذاكرة (mmap) عند أول وصول لها.
+    المواد المضافة أو المعدلة وقت التشغيل تبقى في الذاكرة فقط.
+    """
+
+    def __init__(self, source_path=DEFAULT_SOURCE, snapshot_path=DEFAULT_SNAPSHOT):
+        self.source_path = Path(source_path)
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self._buffer, self.index = self._open_snapshot()
+        self._blob_start = _HEADER.size + self._index_length(self._buffer)
+
+        self._order = dict.fromkeys(self.index["subjects"])  # ترتيب المواد (قاموس للبحث السريع)
+        self._loaded = {}
+
+    @staticmethod
+    def _index_length(buffer):
+        magic, index_length = _HEADER.unpack_from(buffer, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("ملف ليس لقطة قاعدة معرفة")
+        return index_length
+
+    @classmethod
+    def _read_index(cls, buffer):
+        index_length = cls._index_length(buffer)
+        return json.loads(bytes(buffer[_HEADER.size:_HEADER.size + index_length]).decode("utf-8"))
+
+    @staticmethod
+    def _map(path):
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _is_fresh(self, index):
+        if index.get("version") != SNAPSHOT_VERSION:
+            return False
+        # اللقطة وحدها تكفي إذا لم يُشحن ملف المحتوى
+        return not self.source_path.exists() or index.get("source") == _source_stamp(self.source_path)
+
+    def _open_snapshot(self):
+        """فتح اللقطة بـ mmap، أو إعادة تجميعها إذا كانت مفقودة أو أقدم من ملف المحتوى"""
+        if self.snapshot_path:
+            try:
+                buffer = self._map(self.snapshot_path)
+                index = self._read_index(buffer)
+                if self._is_fresh(index):
+                    return buffer, index
+                buffer.close()
+            except (OSError, ValueError, struct.error):
+                pass
+
+        print("🔄 جاري تجميع لقطة قاعدة المعرفة...")
+        if self.snapshot_path:
+            try:
+                build_knowledge_snapshot(self.source_path, self.snapshot_path)
+                buffer = self._map(self.snapshot_path)
+                return buffer, self._read_index(buffer)
+            except OSError as e:
+                print(f"⚠️ تعذر حفظ لقطة قاعدة المعرفة: {e}")
+
+        # بدون ملف: نفس الصيغة من الذاكرة مباشرة
+        buffer = memoryview(compile_knowledge(self.source_path))
+        return buffer, self._read_index(buffer)
+
+    def language_detector(self):
+        """نموذج كشف اللغة المدرب وقت التجميع"""
+        model = self.index["language_model"]
+        return LanguageDetector(model["weights"], model["unseen_weight"])
+
+    def _load_subject(self, subject):
+        meta = self.index["subjects"][subject]
+        start = self._blob_start + meta["offset"]
+        body = json.loads(bytes(self._buffer[start:start + meta["length"]]).decode("utf-8"))
+        return {"name": meta["name"], "keywords": meta["keywords"], **body}
+
+    def __getitem__(self, subject):
+        data = self._loaded.get(subject)
+        if data is None:
+            if subject not in self._order:
+                raise KeyError(subject)
+            data = self._load_subject(subject)
+            self._loaded[subject] = data
+        return data
+
+    def __setitem__(self, subject, data):
+        self._order[subject] = None
+        self._loaded[subject] = data
+
+    def __delitem__(self, subject):
+        if subject not in self._order:
+            raise KeyError(subject)
+        del self._order[subject]
+        self._loaded.pop(subject, None)
+
+    def __iter__(self):
+        return iter(list(self._order))
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, subject):
+        return subject in self._order
+
+    def is_loaded(self, subject):
+        return subject in self._loaded
+
+    def summary(self, subject):
+        """الاسم والكلمات المفتاحية ومعرفات المفاهيم دون تحميل نصوص المفاهيم"""
+        data = self._loaded.get(subject)
+        if data is not None:
+            return {"name": data["name"], "keywords": data["keywords"], "concept_ids": list(data["concepts"])}
+        meta = self.index["subjects"][subject]
+        return {"name": meta["name"], "keywords": meta["keywords"], "concept_ids": meta["concept_ids"]}
+
+    def fingerprint(self):
+        """بصمة المحتوى الحالي: البصمة المجمعة للمواد غير المحملة، وإعادة الحساب للمحملة (قد تكون عُدلت)"""
+        digest = hashlib.sha256()
+        for subject in self._order:
+            data = self._loaded.get(subject)
+            current = subject_hash(data) if data is not None else self.index["subjects"][subject]["hash"]
+            digest.update(f"{subject}:{current}|".encode("utf-8"))
+        return digest.hexdigest()
+
+    def to_dict(self):
+        """نسخة قاموس كاملة (تحمّل كل المواد)"""
+        return {subject: self[subject] for subject in self._order}
+
+def benchmark_knowledge_loading(concept_counts=(3, 100, 500), num_subjects=5, output_dir=Config.DATA_DIR / "benchmarks"):
+    """زمن الإنشاء والذاكرة: تحليل ملف المحتوى كاملاً مقابل اللقطة الكسولة مع نمو عدد المفاهيم"""
+    import time
+    import tracemalloc
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    base = json.loads(DEFAULT_SOURCE.read_text(encoding="utf-8"))["subjects"]
+    results = {}
+
+    for count in concept_counts:
+        subjects = {}
+        for n, (subject, data) in enumerate(list(base.items()) * (num_subjects // len(base) + 1)):
+            if n >= num_subjects:
+                break
+            template = next(iter(data["concepts"].values()))
+            subjects[f"{subject}_{n}"] = {
+                "name": data["name"],
+                "keywords": data["keywords"],
+                "concepts": {f"concept_{c}": {lang: f"{text} ({c})" for lang, text in template.items()}
+                             for c in range(count)}
+            }
+
+        source_path = output_dir / f"knowledge_{count}.json"
+        snapshot_path = output_dir / f"knowledge_{count}.skb"
+        source_path.write_text(json.dumps({"format_version": SNAPSHOT_VERSION, "subjects": subjects},
+                                          ensure_ascii=False), encoding="utf-8")
+        KnowledgeStore(source_path, snapshot_path)  # التجميع خارج القياس
+
+        measured = {}
+        for name, create in (("eager", lambda: json.loads(source_path.read_text(encoding="utf-8"))),
+                             ("lazy", lambda: KnowledgeStore(source_path, snapshot_path))):
+            tracemalloc.start()
+            started = time.perf_counter()
+            store = create()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            memory_kb = tracemalloc.get_traced_memory()[0] / 1024
+            tracemalloc.stop()
+            measured[name] = {"startup_ms": elapsed_ms, "memory_kb": memory_kb}
+            del store
+
+        results[count] = measured
+        print(f"📊 {count} مفهوم لكل مادة: تحليل كامل {measured['eager']['startup_ms']:.1f} مللي ث / "
+              f"{measured['eager']['memory_kb']:.0f} ك.ب ← لقطة كسولة {measured['lazy']['startup_ms']:.1f} مللي ث / "
+              f"{measured['lazy']['memory_kb']:.0f} ك.ب")
+
+    return results
+
+if __name__ == "__main__":
+    build_knowledge_snapshot()
+    benchmark_knowledge_loading()
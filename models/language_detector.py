@@ -0,0 +1,196 @@
+# models/language_detector.py
+import math
+from collections import Counter
+
+import numpy as np
+
+# معرفات الكتابات في مدرج نقاط الترميز
+SCRIPT_OTHER, SCRIPT_ARABIC, SCRIPT_LATIN, SCRIPT_LATIN_ACCENTED = range(4)
+NUM_SCRIPTS = 4
+
+# نطاقات الحروف فقط (بدون الأرقام وعلامات الترقيم والتشكيل): (بداية، نهاية غير شاملة، الكتابة)
+SCRIPT_RANGES = [
+    (0x0041, 0x005B, SCRIPT_LATIN),
+    (0x0061, 0x007B, SCRIPT_LATIN),
+    (0x00C0, 0x0250, SCRIPT_LATIN_ACCENTED),
+    (0x0620, 0x064B, SCRIPT_ARABIC),
+    (0x066E, 0x06D4, SCRIPT_ARABIC),
+    (0x0750, 0x0780, SCRIPT_ARABIC),
+    (0x08A0, 0x08CA, SCRIPT_ARABIC),
+    (0xFB50, 0xFDFE, SCRIPT_ARABIC),
+    (0xFE70, 0xFEFD, SCRIPT_ARABIC)
+]
+
+# جدول بحث لكل نقاط المستوى الأساسي؛ ما بعده يُقص إلى آخر خانة (أخرى)
+_SCRIPT_TABLE = np.zeros(0x10000, dtype=np.int64)
+for _start, _end, _script in SCRIPT_RANGES:
+    _SCRIPT_TABLE[_start:_end] = _script
+_SCRIPT_TABLE[[0xD7, 0xF7]] = SCRIPT_OTHER  # × و ÷ داخل نطاق الحروف اللاتينية الممتدة
+_SCRIPT_TABLE[0x0640] = SCRIPT_OTHER  # التطويل ليس حرفاً
+_SCRIPT_TABLE[0xFFFF] = SCRIPT_OTHER
+
+# عبارات شائعة في الأسئلة تُضاف إلى نصوص قاعدة المعرفة عند تدريب نموذج الحروف
+SEED_CORPUS = {
+    "en": [
+        "what is the", "how do i learn", "can you explain", "what are the rules of",
+        "why does", "which one is", "tell me about", "give me an example of",
+        "the difference between", "and how to use it in a sentence", "help me understand this lesson",
+        "i want to learn", "please show me the steps", "what does this word mean"
+    ],
+    "fr": [
+        "qu'est-ce que", "qu'est-ce que c'est", "comment apprendre", "pouvez-vous expliquer",
+        "quelles sont les règles de", "pourquoi est-ce que", "donnez-moi un exemple de",
+        "la différence entre", "et comment l'utiliser dans une phrase", "aidez-moi à comprendre cette leçon",
+        "je veux apprendre", "montrez-moi les étapes", "que veut dire ce mot", "c'est quoi le"
+    ]
+}
+
+NGRAM_SIZE = 3
+_CODEPOINT_BITS = 21  # تكفي لأي نقطة ترميز؛ ثلاث نقاط تُحزم في مفتاح int64 واحد
+
+def _is_letter(char):
+    return _SCRIPT_TABLE[min(ord(char), 0xFFFF)] != SCRIPT_OTHER
+
+def _codepoints(text):
+    return np.frombuffer(text.encode("utf-32-le"), dtype="<u4").astype(np.int64)
+
+def _pack_ngrams(codepoints):
+    """مفتاح رقمي لكل ثلاثية تبدأ عند كل موضع"""
+    keys = codepoints[:len(codepoints) - NGRAM_SIZE + 1].copy()
+    for offset in range(1, NGRAM_SIZE):
+        keys = (keys << _CODEPOINT_BITS) | codepoints[offset:len(codepoints) - NGRAM_SIZE + 1 + offset]
+    return keys
+
+class LanguageDetector:
+    """كشف اللغة: مدرج كتابات متجهي (NumPy) ثم نموذج ثلاثيات حروف للتمييز بين الفرنسية والإنجليزية
+    
+    كل ما ليس حرفاً يُعامل كمسافة، والثلاثية تُحتسب إذا كان حرفها الأوسط حرفاً،
+    أي ثلاثيات كل كلمة محاطة بمسافتين (" le " ← " le" و "le ").
+    """
+
+    def __init__(self, ngram_weights, unseen_weight):
+        # وزن كل ثلاثية = log P(ثلاثية|فرنسي) - log P(ثلاثية|إنجليزي)
+        self.ngram_weights = ngram_weights
+        self.unseen_weight = unseen_weight
+
+        keys = np.array([_pack_ngrams(_codepoints(gram))[0] for gram in ngram_weights], dtype=np.int64)
+        values = np.array(list(ngram_weights.values()), dtype=np.float64)
+        order = np.argsort(keys)
+        self._keys, self._values = keys[order], values[order]
+
+    @staticmethod
+    def _ngrams(text):
+        padded = " " + "".join(char if _is_letter(char) else " " for char in text.lower()) + " "
+        return [padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1) if padded[i + 1] != " "]
+
+    @classmethod
+    def train(cls, corpus):
+        """تدريب نموذج الحروف من {"en": [نصوص], "fr": [نصوص]} مع تنعيم لابلاس"""
+        counts = {
+            language: Counter(gram for text in corpus[language] for gram in cls._ngrams(text))
+            for language in ("en", "fr")
+        }
+        vocabulary = set(counts["en"]) | set(counts["fr"])
+        denominators = {language: sum(counts[language].values()) + len(vocabulary) + 1 for language in counts}
+
+        def log_prob(language, gram):
+            return math.log((counts[language][gram] + 1) / denominators[language])
+
+        weights = {gram: log_prob("fr", gram) - log_prob("en", gram) for gram in vocabulary}
+        unseen_weight = math.log(denominators["en"] / denominators["fr"])
+        return cls(weights, unseen_weight)
+
+    @staticmethod
+    def script_histograms(texts):
+        """مصفوفة (عدد النصوص × الكتابات) بعدد الحروف من كل كتابة، بمرور NumPy واحد على كل النصوص"""
+        if not texts:
+            return np.zeros((0, NUM_SCRIPTS), dtype=np.int64)
+
+        lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+        scripts = _SCRIPT_TABLE[np.minimum(_codepoints("".join(texts)), 0xFFFF)]
+        rows = np.repeat(np.arange(len(texts)), lengths)
+
+        return np.bincount(rows * NUM_SCRIPTS + scripts, minlength=len(texts) * NUM_SCRIPTS).reshape(-1, NUM_SCRIPTS)
+
+    def french_log_odds_batch(self, texts):
+        """log(P(فرنسي)/P(إنجليزي)) لكل نص حسب ثلاثيات الحروف، لكل النصوص في مرور NumPy واحد"""
+        if not texts:
+            return np.zeros(0)
+
+        # النصوص تُفصل بمسافة؛ ما ليس حرفاً يصبح مسافة
+        lowered = [text.lower() for text in texts]
+        joined = " " + " ".join(lowered) + " "
+        codepoints = _codepoints(joined)
+        is_letter = _SCRIPT_TABLE[np.minimum(codepoints, 0xFFFF)] != SCRIPT_OTHER
+        codepoints = np.where(is_letter, codepoints, ord(" "))
+
+        rows = np.repeat(np.arange(len(texts)), [len(text) + 1 for text in lowered])
+        rows = np.concatenate(([0], rows))
+        keys = _pack_ngrams(codepoints)
+        centered = is_letter[1:len(codepoints) - 1]
+
+        keys, gram_rows = keys[centered], rows[1:len(codepoints) - 1][centered]
+        positions = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        found = self._keys[positions] == keys
+        weights = np.where(found, self._values[positions], self.unseen_weight)
+
+        return np.bincount(gram_rows, weights=weights, minlength=len(texts))
+
+    def french_log_odds(self, text):
+        return float(self.french_log_odds_batch([text])[0])
+
+    def scores_batch(self, texts):
+        """درجات اللغات لكل نص: حروف عربية، وحروف لاتينية موزعة بين fr و en حسب احتمال نموذج الحروف"""
+        texts = [text or "" for text in texts]
+        histograms = self.script_histograms(texts)
+        arabic = histograms[:, SCRIPT_ARABIC]
+        latin = histograms[:, SCRIPT_LATIN] + histograms[:, SCRIPT_LATIN_ACCENTED]
+
+        french_share = np.zeros(len(texts))
+        latin_rows = np.flatnonzero(latin)
+        if len(latin_rows):
+            log_odds = self.french_log_odds_batch([texts[row] for row in latin_rows])
+            french_share[latin_rows] = 1.0 / (1.0 + np.exp(-np.clip(log_odds, -50.0, 50.0)))
+
+        return [
+            {"ar": float(a), "en": float(l * (1 - share)), "fr": float(l * share)}
+            for a, l, share in zip(arabic.tolist(), latin.tolist(), french_share.tolist())
+        ]
+
+    def detect_batch(self, texts):
+        """اللغة الغالبة لكل نص"""
+        return [self.pick_language(scores) for scores in self.scores_batch(texts)]
+
+    @staticmethod
+    def pick_language(scores):
+        """اللغة ذات أعلى درجة؛ النص بلا حروف يُعتبر إنجليزياً"""
+        return max(scores, key=scores.get) if any(scores.values()) else "en"
+
+def benchmark_language_detection(num_texts=20000, repeats=3):
+    """زمن توسيم أجزاء نصية بالجملة مقابل نص واحد في كل استدعاء"""
+    import time
+    from .knowledge_base import EducationalKnowledgeBase
+
+    kb = EducationalKnowledgeBase()
+    samples = [
+        concept[language]
+        for data in kb.subjects.values()
+        for concept in data["concepts"].values()
+        for language in ("ar", "en", "fr")
+    ]
+    texts = [samples[i % len(samples)] for i in range(num_texts)]
+
+    timings = {}
+    for name, detect in (("per_text", lambda: [kb.detect_language(text) for text in texts]),
+                         ("batch", lambda: kb.detect_language_batch(texts))):
+        started = time.perf_counter()
+        for _ in range(repeats):
+            detect()
+        timings[name] = (time.perf_counter() - started) / repeats
+
+    print(f"📊 {num_texts} نص: استدعاء لكل نص {timings['per_text'] * 1000:.0f} مللي ث ← دفعة واحدة "
+          f"{timings['batch'] * 1000:.0f} مللي ث ({num_texts / timings['batch']:.0f} نص/ث)")
+    return timings
+
+if __name__ == "__main__":
+    benchmark_language_detection()
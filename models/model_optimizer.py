@@ -1,8 +1,15 @@
 # models/model_optimizer.py
+import io
+import copy
+import time
+import warnings
+from pathlib import Path
 import torch
 import torch.nn as nn
 from transformers import AutoModel, AutoTokenizer
 
+from .checkpoint_io import materialize_weights
+
 class ModelOptimizer:
     def __init__(self, model_path=None):
         self.model_path = model_path
@@ -10,17 +17,79 @@ class ModelOptimizer:
             "quantization", "pruning", "knowledge_distillation"
         ]
     
-    def apply_quantization(self, model):
-        """تطبيق التكميم لتقليل حجم النموذج"""
+    def apply_quantization(self, model, dtype=torch.qint8):
+        """تكميم ديناميكي int8 لطبقات Linear (الأوزان int8 والتنشيطات تُكمَّم أثناء التشغيل)"""
         try:
-            # تحويل النموذج إلى float16
-            quantized_model = model.half()
-            print("✅ تم تطبيق التكميم (float16)")
+            materialize_weights(model).eval()
+            with warnings.catch_warnings():
+                # واجهة torch.ao.quantization مُعلَّمة كمهملة لكنها ما زالت المسار المدمج للمعالج
+                warnings.simplefilter("ignore")
+                quantized_model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=dtype)
+            print("✅ تم تطبيق التكميم الديناميكي (int8)")
             return quantized_model
         except Exception as e:
             print(f"❌ فشل التكميم: {e}")
             return model
     
+    @staticmethod
+    def is_quantized(model):
+        """هل يحتوي النموذج على طبقات مكممة ديناميكياً"""
+        return any(isinstance(module, torch.ao.nn.quantized.dynamic.Linear) for module in model.modules())
+    
+    @staticmethod
+    def build_calibration_set(knowledge_base):
+        """أسئلة معايرة مع تسمياتها (السؤال، اللغة، المادة) من مفاهيم قاعدة المعرفة"""
+        templates = {"ar": "ما هو {}؟", "en": "What is {}?", "fr": "Qu'est-ce que {}?"}
+        return [
+            (templates[language].format(concept), language, subject_name)
+            for subject_name, subject in knowledge_base.subjects.items()
+            for concept in subject["concepts"]
+            for language in templates
+        ]
+    
+    @classmethod
+    def build_calibration_questions(cls, knowledge_base):
+        """أسئلة معايرة من مفاهيم قاعدة المعرفة بالعربية والإنجليزية والفرنسية"""
+        return [question for question, _, _ in cls.build_calibration_set(knowledge_base)]
+    
+    @staticmethod
+    def _measure(model, batches, repeats):
+        """متوسط زمن الدفعة (مللي ث) وتنبؤات رأسي اللغة والمادة"""
+        model.eval()
+        with torch.inference_mode():
+            outputs = [model.classify(*batch) for batch in batches]  # تسخين وتنبؤات
+            started = time.perf_counter()
+            for _ in range(repeats):
+                for batch in batches:
+                    model.classify(*batch)
+            elapsed = time.perf_counter() - started
+        
+        predictions = {
+            head: torch.cat([output[f"{head}_logits"].argmax(dim=-1) for output in outputs])
+            for head in ("language", "subject")
+        }
+        return elapsed / (repeats * len(batches)) * 1000, predictions
+    
+    def compare_quantization(self, fp32_model, quantized_model, batches, repeats=5):
+        """تقرير الحجم والزمن وتطابق رأسي اللغة والمادة بين fp32 و int8
+        
+        batches: قائمة من (input_ids, attention_mask, language_id)
+        """
+        report = {
+            "fp32_size_mb": self.get_model_size(fp32_model),
+            "int8_size_mb": self.get_model_size(quantized_model)
+        }
+        
+        predictions = {}
+        for name, model in (("fp32", fp32_model), ("int8", quantized_model)):
+            report[f"{name}_latency_ms"], predictions[name] = self._measure(model, batches, repeats)
+        
+        for head in ("language", "subject"):
+            agreement = predictions["fp32"][head] == predictions["int8"][head]
+            report[f"{head}_agreement"] = agreement.float().mean().item()
+        
+        return report
+    
     def apply_pruning(self, model, pruning_percentage=0.2):
         """تقليم النموذج لإزالة الأوزان غير المهمة"""
         try:
@@ -31,6 +100,8 @@ class ModelOptimizer:
             
             for module, param_name in parameters_to_prune:
                 nn.utils.prune.l1_unstructured(module, param_name, pruning_percentage)
+                # تثبيت الأصفار في الوزن وإزالة القناع والنسخة الأصلية
+                nn.utils.prune.remove(module, param_name)
             
             print(f"✅ تم تقليم {pruning_percentage*100}% من الأوزان")
             return model
@@ -38,30 +109,225 @@ class ModelOptimizer:
             print(f"❌ فشل التقليم: {e}")
             return model
     
-    def optimize_for_mobile(self, model):
-        """تحسين النموذج للتشغيل على الهواتف"""
+    def apply_structured_pruning(self, model, head_ratio=0.25, ffn_ratio=0.25, method="magnitude",
+                                 calibration_batches=None):
+        """تقليم هيكلي لرؤوس الانتباه وعصبونات FFN يعيد بناء طبقات Linear أصغر فعلياً
+        
+        method: "magnitude" (معايير الأوزان) أو "activation" (متوسط التنشيط على دفعات المعايرة)
+        يُحذف نفس عدد الرؤوس/العصبونات من كل طبقة حتى يبقى PolyglotTutorConfig موحداً.
+        """
+        if self.is_quantized(model):
+            raise ValueError("يجب التقليم قبل التكميم")
+        materialize_weights(model)
+        
+        config = model.config
+        num_heads = config.num_attention_heads
+        keep_heads = max(1, num_heads - round(num_heads * head_ratio))
+        keep_neurons = max(1, config.intermediate_size - round(config.intermediate_size * ffn_ratio))
+        
+        if method == "activation":
+            if not calibration_batches:
+                raise ValueError("طريقة activation تحتاج دفعات معايرة")
+            scores = self._activation_scores(model, calibration_batches)
+        elif method == "magnitude":
+            scores = [self._magnitude_scores(layer, config) for layer in model.encoder.layer]
+        else:
+            raise ValueError(f"طريقة تقليم غير معروفة: {method}")
+        
+        pruned_model = copy.deepcopy(model).eval()
+        for layer, (head_scores, neuron_scores) in zip(pruned_model.encoder.layer, scores):
+            heads = head_scores.topk(keep_heads).indices.sort().values
+            neurons = neuron_scores.topk(keep_neurons).indices.sort().values
+            self._prune_layer(layer, heads, neurons)
+        
+        pruned_model.config.num_attention_heads = keep_heads
+        pruned_model.config.intermediate_size = keep_neurons
+        
+        print(f"✅ تم التقليم الهيكلي: {num_heads} ← {keep_heads} رؤوس، "
+              f"{config.intermediate_size} ← {keep_neurons} عصبون FFN")
+        return pruned_model
+    
+    @staticmethod
+    def _magnitude_scores(layer, config):
+        """أهمية الرأس = معيار أوزان Q/K/V والإسقاط الخارج الخاصة به؛ والعصبون = معيار وزنَي الدخول والخروج"""
+        attention = layer.attention.self
+        head_size = attention.attention_head_size
+        
+        qkv = attention.qkv.weight.detach().view(3, attention.num_attention_heads, head_size, -1)
+        out = layer.attention.output.dense.weight.detach().view(-1, attention.num_attention_heads, head_size)
+        head_scores = qkv.pow(2).sum(dim=(0, 2, 3)) + out.pow(2).sum(dim=(0, 2))
+        
+        neuron_in = layer.intermediate.dense.weight.detach().norm(dim=1)
+        neuron_out = layer.output.dense.weight.detach().norm(dim=0)
+        return head_scores, neuron_in * neuron_out
+    
+    @staticmethod
+    def _activation_scores(model, batches):
+        """أهمية الرأس/العصبون = متوسط القيمة المطلقة لمخرجه على دفعات المعايرة × معيار وزن الخروج"""
+        sums = {}
+        
+        def record(key):
+            def hook(module, inputs):
+                activations = inputs[0].detach().abs()
+                sums[key] = sums.get(key, 0) + activations.reshape(-1, activations.shape[-1]).mean(dim=0)
+            return hook
+        
+        handles = []
+        for index, layer in enumerate(model.encoder.layer):
+            handles.append(layer.attention.output.dense.register_forward_pre_hook(record(("heads", index))))
+            handles.append(layer.output.dense.register_forward_pre_hook(record(("neurons", index))))
+        
         try:
-            # تحويل للنموذج المحمول
-            model.eval()
-            
-            # مثال للتحويل إلى ONNX (للتطبيقات المحمولة)
-            dummy_input = torch.randn(1, 128)
+            with torch.inference_mode():
+                for batch in batches:
+                    model.classify(*batch)
+        finally:
+            for handle in handles:
+                handle.remove()
+        
+        scores = []
+        for index, layer in enumerate(model.encoder.layer):
+            attention = layer.attention.self
+            head_dims = sums[("heads", index)] * layer.attention.output.dense.weight.detach().norm(dim=0)
+            head_scores = head_dims.view(attention.num_attention_heads, attention.attention_head_size).sum(dim=1)
+            neuron_scores = sums[("neurons", index)] * layer.output.dense.weight.detach().norm(dim=0)
+            scores.append((head_scores, neuron_scores))
+        return scores
+    
+    @staticmethod
+    def _slice_linear(linear, index, dim):
+        """طبقة Linear جديدة تحتوي فقط الصفوف (dim=0) أو الأعمدة (dim=1) المختارة"""
+        weight = linear.weight.detach().index_select(dim, index)
+        bias = linear.bias.detach()
+        if dim == 0:
+            bias = bias.index_select(0, index)
+        
+        new_linear = nn.Linear(weight.shape[1], weight.shape[0])
+        with torch.no_grad():
+            new_linear.weight.copy_(weight)
+            new_linear.bias.copy_(bias)
+        return new_linear
+    
+    def _prune_layer(self, layer, heads, neurons):
+        """إعادة بناء طبقة TinyTransformerLayer بالرؤوس والعصبونات المحتفظ بها فقط"""
+        attention = layer.attention.self
+        head_size = attention.attention_head_size
+        
+        # مواضع أبعاد الرؤوس المحتفظ بها داخل all_head_size
+        head_dims = (heads[:, None] * head_size + torch.arange(head_size)).flatten()
+        # صفوف qkv مرتبة [Q لكل الرؤوس، K لكل الرؤوس، V لكل الرؤوس]
+        qkv_rows = torch.cat([part * attention.all_head_size + head_dims for part in range(3)])
+        
+        attention.qkv = self._slice_linear(attention.qkv, qkv_rows, dim=0)
+        attention.num_attention_heads = len(heads)
+        attention.all_head_size = len(heads) * head_size
+        layer.attention.output.dense = self._slice_linear(layer.attention.output.dense, head_dims, dim=1)
+        
+        layer.intermediate.dense = self._slice_linear(layer.intermediate.dense, neurons, dim=0)
+        layer.output.dense = self._slice_linear(layer.output.dense, neurons, dim=1)
+    
+    def compare_pruning(self, original_model, pruned_model, batches, labels=None, repeats=5):
+        """تقرير عدد المعاملات والزمن ودقة رأسي اللغة والمادة قبل التقليم وبعده
+        
+        labels: قاموس {"language": tensor, "subject": tensor} للتسميات الصحيحة (اختياري)
+        """
+        report = {}
+        predictions = {}
+        for name, model in (("original", original_model), ("pruned", pruned_model)):
+            report[f"{name}_parameters"] = sum(p.numel() for p in model.parameters())
+            report[f"{name}_latency_ms"], predictions[name] = self._measure(model, batches, repeats)
+        
+        for head in ("language", "subject"):
+            agreement = predictions["original"][head] == predictions["pruned"][head]
+            report[f"{head}_agreement"] = agreement.float().mean().item()
             
-            print("✅ تم تحسين النموذج للأجهزة المحمولة")
-            return model
-        except Exception as e:
-            print(f"❌ فشل التحسين: {e}")
-            return model
+            if labels is not None:
+                original_accuracy = (predictions["original"][head] == labels[head]).float().mean().item()
+                pruned_accuracy = (predictions["pruned"][head] == labels[head]).float().mean().item()
+                report[f"{head}_accuracy_delta"] = pruned_accuracy - original_accuracy
+        
+        return report
     
-    def get_model_size(self, model):
-        """حساب حجم النموذج"""
-        param_size = 0
-        for param in model.parameters():
-            param_size += param.nelement() * param.element_size()
+    def optimize_for_mobile(self, model, output_dir="data/exported"):
+        """تصدير مسار التصنيف إلى TorchScript و ONNX بمحاور دفعة وطول ديناميكية"""
+        from .inference_backends import export_torchscript, export_onnx
         
-        buffer_size = 0
-        for buffer in model.buffers():
-            buffer_size += buffer.nelement() * buffer.element_size()
+        model.eval()
+        artifacts = {}
+        for name, exporter, suffix in (("torchscript", export_torchscript, ".pt"), ("onnx", export_onnx, ".onnx")):
+            try:
+                artifacts[name] = exporter(model, Path(output_dir) / f"polyglot_tutor{suffix}")
+            except Exception as e:
+                print(f"❌ فشل التصدير إلى {name}: {e}")
         
-        size_all_mb = (param_size + buffer_size) / 1024**2
+        if artifacts:
+            print(f"✅ تم تصدير النموذج: {', '.join(str(path) for path in artifacts.values())}")
+        return artifacts
+    
+    def get_model_size(self, model):
+        """حساب حجم النموذج (حجم state_dict المُسلسل، ليشمل الأوزان المكممة المضغوطة)"""
+        buffer = io.BytesIO()
+        torch.save(model.state_dict(), buffer)
+        size_all_mb = buffer.tell() / 1024**2
         return size_all_mb
+
+def _calibration_batches(ai, batch_size=16):
+    """دفعات المعايرة (input_ids, attention_mask, language_id) مع التسميات الصحيحة"""
+    calibration_set = ModelOptimizer.build_calibration_set(ai.knowledge_base)
+    
+    batches = []
+    for start in range(0, len(calibration_set), batch_size):
+        chunk = [question for question, _, _ in calibration_set[start:start + batch_size]]
+        input_ids, attention_mask = ai.token_encoder.encode_batch(chunk)
+        language_id = torch.tensor([
+            ai.knowledge_base.language_codes.get(language, 0) for language in ai.knowledge_base.detect_language_batch(chunk)
+        ])
+        batches.append((input_ids, attention_mask, language_id))
+    
+    labels = {
+        "language": torch.tensor([ai.knowledge_base.language_codes[language] for _, language, _ in calibration_set]),
+        "subject": torch.tensor([ai.knowledge_base.subject_codes[subject] for _, _, subject in calibration_set])
+    }
+    return batches, labels
+
+def benchmark_quantization(batch_size=16):
+    """مقارنة نموذج PolyglotTutorModel بدقة fp32 مع نسخته المكممة int8 على أسئلة المعايرة"""
+    from .polyglot_tutor import PolyglotEducationalAI
+    
+    ai = PolyglotEducationalAI()
+    optimizer = ModelOptimizer()
+    batches, _ = _calibration_batches(ai, batch_size)
+    
+    quantized_model = optimizer.apply_quantization(ai.model)
+    report = optimizer.compare_quantization(ai.model, quantized_model, batches)
+    
+    print(f"📊 الحجم: {report['fp32_size_mb']:.1f} ← {report['int8_size_mb']:.1f} ميجابايت")
+    print(f"📊 الزمن لكل دفعة: {report['fp32_latency_ms']:.2f} ← {report['int8_latency_ms']:.2f} مللي ث")
+    print(f"📊 تطابق اللغة: {report['language_agreement']:.1%}، تطابق المادة: {report['subject_agreement']:.1%}")
+    return report
+
+def benchmark_pruning(head_ratio=0.5, ffn_ratio=0.5, batch_size=16):
+    """مقارنة النموذج الكامل مع نسختيه المقلمتين هيكلياً (بالأوزان وبالتنشيط)"""
+    from .polyglot_tutor import PolyglotEducationalAI
+    
+    ai = PolyglotEducationalAI()
+    optimizer = ModelOptimizer()
+    batches, labels = _calibration_batches(ai, batch_size)
+    
+    reports = {}
+    for method in ("magnitude", "activation"):
+        pruned_model = optimizer.apply_structured_pruning(
+            ai.model, head_ratio, ffn_ratio, method=method, calibration_batches=batches
+        )
+        report = optimizer.compare_pruning(ai.model, pruned_model, batches, labels)
+        reports[method] = report
+        
+        print(f"📊 {method}: المعاملات {report['original_parameters']:,} ← {report['pruned_parameters']:,}")
+        print(f"📊 {method}: الزمن لكل دفعة {report['original_latency_ms']:.2f} ← {report['pruned_latency_ms']:.2f} مللي ث")
+        print(f"📊 {method}: تطابق اللغة {report['language_agreement']:.1%}، تطابق المادة {report['subject_agreement']:.1%}، "
+              f"فرق الدقة {report['language_accuracy_delta']:+.1%} / {report['subject_accuracy_delta']:+.1%}")
+    return reports
+
+if __name__ == "__main__":
+    benchmark_quantization()
+    benchmark_pruning()
@@ -17,12 +17,15 @@ class PolyglotTutorConfig(PretrainedConfig):
         max_position_embeddings=256,
         num_languages=3,
         num_subjects=8,
+        attention_head_size=None,
         **kwargs
     ):
         self.vocab_size = vocab_size
         self.hidden_size = hidden_size
         self.num_hidden_layers = num_hidden_layers
         self.num_attention_heads = num_attention_heads
+        # حجم الرأس ثابت حتى بعد تقليم الرؤوس (قد لا يساوي hidden_size / num_attention_heads)
+        self.attention_head_size = attention_head_size or hidden_size // num_attention_heads
         self.intermediate_size = intermediate_size
         self.max_position_embeddings = max_position_embeddings
         self.num_languages = num_languages
@@ -34,45 +37,71 @@ class TinySelfAttention(nn.Module):
         super().__init__()
         self.num_attention_heads = config.num_attention_heads
         self.hidden_size = config.hidden_size
-        self.attention_head_size = self.hidden_size // self.num_attention_heads
+        self.attention_head_size = config.attention_head_size
         self.all_head_size = self.num_attention_heads * self.attention_head_size
 
-        self.query = nn.Linear(config.hidden_size, self.all_head_size)
-        self.key = nn.Linear(config.hidden_size, self.all_head_size)
-        self.value = nn.Linear(config.hidden_size, self.all_head_size)
-        self.dropout = nn.Dropout(0.1)
+        # إسقاط واحد لـ Q و K و V بدلاً من ثلاث طبقات منفصلة
+        self.qkv = nn.Linear(config.hidden_size, 3 * self.all_head_size)
+        self.dropout_prob = 0.1
 
-    def transpose_for_scores(self, x):
-        new_x_shape = x.size()[:-1] + (self.num_attention_heads, self.attention_head_size)
-        x = x.view(new_x_shape)
-        return x.permute(0, 2, 1, 3)
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        # تحويل النقاط المحفوظة بالإسقاطات المنفصلة القديمة (query/key/value) إلى qkv
+        if prefix + 'query.weight' in state_dict:
+            for param_name in ('weight', 'bias'):
+                state_dict[prefix + 'qkv.' + param_name] = torch.cat([
+                    state_dict.pop(prefix + f'{projection}.{param_name}')
+                    for projection in ('query', 'key', 'value')
+                ])
+        super()._load_from_state_dict(state_dict, prefix, *args, **kwargs)
 
     def forward(self, hidden_states, attention_mask=None):
-        query_layer = self.transpose_for_scores(self.query(hidden_states))
-        key_layer = self.transpose_for_scores(self.key(hidden_states))
-        value_layer = self.transpose_for_scores(self.value(hidden_states))
+        """attention_mask: قناع منطقي (B, 1, 1, S) قيمته True للمواضع المسموح الانتباه إليها"""
+        batch_size, seq_length, _ = hidden_states.shape
 
-        attention_scores = torch.matmul(query_layer, key_layer.transpose(-1, -2))
-        attention_scores = attention_scores / (self.attention_head_size ** 0.5)
-        
-        if attention_mask is not None:
-            attention_mask = attention_mask.unsqueeze(1).unsqueeze(2)
-            attention_scores = attention_scores + attention_mask
+        # (B, S, 3, H, D) ← (3, B, H, S, D)
+        qkv = self.qkv(hidden_states).view(
+            batch_size, seq_length, 3, self.num_attention_heads, self.attention_head_size
+        )
+        query_layer, key_layer, value_layer = qkv.permute(2, 0, 3, 1, 4).unbind(0)
 
-        attention_probs = nn.functional.softmax(attention_scores, dim=-1)
-        attention_probs = self.dropout(attention_probs)
+        context_layer = nn.functional.scaled_dot_product_attention(
+            query_layer, key_layer, value_layer,
+            attn_mask=attention_mask,
+            dropout_p=self.dropout_prob if self.training else 0.0
+        )
 
-        context_layer = torch.matmul(attention_probs, value_layer)
-        context_layer = context_layer.permute(0, 2, 1, 3).contiguous()
-        new_context_layer_shape = context_layer.size()[:-2] + (self.all_head_size,)
-        context_layer = context_layer.view(new_context_layer_shape)
-        
-        return context_layer
+        return context_layer.transpose(1, 2).reshape(batch_size, seq_length, self.all_head_size)
+
+def _eager_attention(attention, hidden_states, attention_mask=None):
+    """المسار القديم (ثلاثة إسقاطات، matmul و softmax صريحان) للمقارنة العددية والقياس"""
+    query_weight, key_weight, value_weight = attention.qkv.weight.chunk(3)
+    query_bias, key_bias, value_bias = attention.qkv.bias.chunk(3)
+
+    def transpose_for_scores(x):
+        new_x_shape = x.size()[:-1] + (attention.num_attention_heads, attention.attention_head_size)
+        return x.view(new_x_shape).permute(0, 2, 1, 3)
+
+    query_layer = transpose_for_scores(nn.functional.linear(hidden_states, query_weight, query_bias))
+    key_layer = transpose_for_scores(nn.functional.linear(hidden_states, key_weight, key_bias))
+    value_layer = transpose_for_scores(nn.functional.linear(hidden_states, value_weight, value_bias))
+
+    attention_scores = torch.matmul(query_layer, key_layer.transpose(-1, -2))
+    attention_scores = attention_scores / (attention.attention_head_size ** 0.5)
+
+    if attention_mask is not None:
+        attention_scores = attention_scores.masked_fill(~attention_mask, torch.finfo(attention_scores.dtype).min)
+
+    attention_probs = nn.functional.softmax(attention_scores, dim=-1)
+
+    context_layer = torch.matmul(attention_probs, value_layer)
+    context_layer = context_layer.permute(0, 2, 1, 3).contiguous()
+    new_context_layer_shape = context_layer.size()[:-2] + (attention.all_head_size,)
+    return context_layer.view(new_context_layer_shape)
 
 class TinySelfOutput(nn.Module):
     def __init__(self, config):
         super().__init__()
-        self.dense = nn.Linear(config.hidden_size, config.hidden_size)
+        self.dense = nn.Linear(config.num_attention_heads * config.attention_head_size, config.hidden_size)
         self.LayerNorm = nn.LayerNorm(config.hidden_size, eps=1e-12)
         self.dropout = nn.Dropout(0.1)
 
@@ -136,6 +165,10 @@ class EfficientTransformer(nn.Module):
         self.layer = nn.ModuleList([TinyTransformerLayer(config) for _ in range(config.num_hidden_layers)])
 
     def forward(self, hidden_states, attention_mask=None):
+        if attention_mask is not None:
+            # تحويل قناع 0/1 إلى قناع حشو منطقي (B, 1, 1, S) يُطبق على المفاتيح
+            attention_mask = attention_mask.bool()[:, None, None, :]
+        
         for layer_module in self.layer:
             hidden_states = layer_module(hidden_states, attention_mask)
         return hidden_states
@@ -168,6 +201,10 @@ class MultilingualEmbeddings(nn.Module):
 class PolyglotTutorModel(PreTrainedModel):
     config_class = PolyglotTutorConfig
     
+    # الرؤوس المتاحة؛ رأس الإجابة يعمل على كل المواضع وبحجم المفردات كاملة
+    ALL_HEADS = ("language", "subject", "answer")
+    CLASSIFICATION_HEADS = ("language", "subject")
+    
     def __init__(self, config):
         super().__init__(config)
         self.embeddings = MultilingualEmbeddings(config)
@@ -176,16 +213,100 @@ class PolyglotTutorModel(PreTrainedModel):
         self.subject_head = nn.Linear(config.hidden_size, config.num_subjects)
         self.answer_head = nn.Linear(config.hidden_size, config.vocab_size)
         
-    def forward(self, input_ids, attention_mask=None, language_id=None):
+    def forward(self, input_ids, attention_mask=None, language_id=None, heads=None):
+        heads = self.ALL_HEADS if heads is None else heads
+        
         embeddings = self.embeddings(input_ids, language_id)
         encoded = self.encoder(embeddings, attention_mask)
+        cls_vector = encoded[:, 0]
         
-        language_logits = self.language_head(encoded[:, 0])
-        subject_logits = self.subject_head(encoded[:, 0])
-        answer_logits = self.answer_head(encoded)
+        outputs = {}
+        if "language" in heads:
+            outputs['language_logits'] = self.language_head(cls_vector)
+        if "subject" in heads:
+            outputs['subject_logits'] = self.subject_head(cls_vector)
+        if "answer" in heads:
+            outputs['answer_logits'] = self.answer_head(encoded)
         
-        return {
-            'language_logits': language_logits,
-            'subject_logits': subject_logits,
-            'answer_logits': answer_logits
+        return outputs
+    
+    def classify(self, input_ids, attention_mask=None, language_id=None):
+        """مسار الاستدلال للتصنيف فقط: رأسا اللغة والمادة على متجه CLS دون رأس المفردات"""
+        return self.forward(input_ids, attention_mask, language_id, heads=self.CLASSIFICATION_HEADS)
+
+def _outputs_nbytes(outputs):
+    return sum(tensor.numel() * tensor.element_size() for tensor in outputs.values())
+
+def benchmark_forward_modes(seq_length=256, batch_sizes=(1, 8), repeats=20):
+    """مقارنة زمن وذاكرة المخرجات بين التمرير الكامل ومسار التصنيف فقط"""
+    import time
+    
+    config = PolyglotTutorConfig()
+    model = PolyglotTutorModel(config).eval()
+    results = []
+    
+    for batch_size in batch_sizes:
+        input_ids = torch.randint(5, config.vocab_size, (batch_size, seq_length))
+        attention_mask = torch.ones(batch_size, seq_length)
+        
+        row = {"batch_size": batch_size, "seq_length": seq_length}
+        for mode, heads in (("full", None), ("classify", PolyglotTutorModel.CLASSIFICATION_HEADS)):
+            with torch.inference_mode():
+                outputs = model(input_ids, attention_mask, heads=heads)  # تسخين
+                started = time.perf_counter()
+                for _ in range(repeats):
+                    model(input_ids, attention_mask, heads=heads)
+                elapsed = (time.perf_counter() - started) / repeats
+            
+            row[f"{mode}_ms"] = round(elapsed * 1000, 2)
+            row[f"{mode}_output_mb"] = round(_outputs_nbytes(outputs) / 1024 ** 2, 3)
+        
+        results.append(row)
+        print(f"📊 دفعة {batch_size}×{seq_length}: كامل {row['full_ms']} مللي ث ({row['full_output_mb']} ميجا) ← "
+              f"تصنيف {row['classify_ms']} مللي ث ({row['classify_output_mb']} ميجا)")
+    
+    return results
+
+def benchmark_attention(batch_sizes=(1, 8, 32, 64), seq_length=64, repeats=20):
+    """مقارنة الانتباه المدمج مع المسار القديم على المعالج: الفرق العددي والزمن"""
+    import time
+    
+    config = PolyglotTutorConfig()
+    attention = TinySelfAttention(config).eval()
+    results = []
+    
+    for batch_size in batch_sizes:
+        hidden_states = torch.randn(batch_size, seq_length, config.hidden_size)
+        # نصف الدفعة محشوة في الربع الأخير
+        attention_mask = torch.ones(batch_size, seq_length, dtype=torch.bool)
+        attention_mask[batch_size // 2:, 3 * seq_length // 4:] = False
+        attention_mask = attention_mask[:, None, None, :]
+        
+        timings = {}
+        with torch.inference_mode():
+            fused = attention(hidden_states, attention_mask)
+            eager = _eager_attention(attention, hidden_states, attention_mask)
+            
+            for name, run in (("eager", lambda: _eager_attention(attention, hidden_states, attention_mask)),
+                              ("fused", lambda: attention(hidden_states, attention_mask))):
+                run()  # تسخين
+                started = time.perf_counter()
+                for _ in range(repeats):
+                    run()
+                timings[name] = (time.perf_counter() - started) / repeats * 1000
+        
+        row = {
+            "batch_size": batch_size,
+            "max_abs_diff": (fused - eager).abs().max().item(),
+            "eager_ms": round(timings["eager"], 3),
+            "fused_ms": round(timings["fused"], 3)
         }
+        results.append(row)
+        print(f"📊 دفعة {batch_size}: قديم {row['eager_ms']} مللي ث ← مدمج {row['fused_ms']} مللي ث "
+              f"(أقصى فرق {row['max_abs_diff']:.2e})")
+    
+    return results
+
+if __name__ == "__main__":
+    benchmark_forward_modes()
+    benchmark_attention()
@@ -4,27 +4,83 @@ import torch.nn as nn
 from transformers import PreTrainedModel, PretrainedConfig
 import json
 import re
+import time
 from typing import Dict, List, Optional
 import numpy as np
 
 from .polyglot_model import PolyglotTutorConfig, PolyglotTutorModel
 from .knowledge_base import EducationalKnowledgeBase
 from .answer_generator import SmartAnswerGenerator
+from .model_optimizer import ModelOptimizer
+from .inference_backends import create_backend
+from .fast_tokenizer import CompiledTokenizer
+from .checkpoint_io import save_checkpoint, load_checkpoint, load_legacy_checkpoint, resolve_checkpoint
 
 class PolyglotEducationalAI:
-    def __init__(self, model_path=None):
+    # حدود الحسم للمسار السريع: فرق الحروف المميزة للغة، وفرق درجات الكلمات المفتاحية للمادة
+    EARLY_EXIT_LANGUAGE_MARGIN = 4
+    EARLY_EXIT_SUBJECT_MARGIN = 3
+    
+    def __init__(self, model_path=None, quantize=False, backend="pytorch", backend_path=None, early_exit=True):
         # التهيئة الأساسية
         self.config = PolyglotTutorConfig()
         self.model = PolyglotTutorModel(self.config)
         self.knowledge_base = EducationalKnowledgeBase()
         self.answer_generator = SmartAnswerGenerator(self.knowledge_base)
         self.tokenizer = self.create_optimized_tokenizer()
+        self.token_encoder = CompiledTokenizer(self.tokenizer, self.config.max_position_embeddings)
         
         # وضع التقييم للنموذج
         self.model.eval()
+        self.quantized = False
+        
+        # المسار السريع: تخطي النموذج عندما يكون الكشف بالقواعد حاسماً
+        self.early_exit = early_exit
+        self.reset_path_stats()
         
         if model_path:
             self.load_model(model_path)
+        
+        if quantize and not self.quantized:
+            self.quantize_model()
+        
+        # خلفية التشغيل: pytorch أو torchscript أو onnx
+        self.set_backend(backend, backend_path)
+    
+    def set_backend(self, name, artifact_path=None):
+        """اختيار خلفية التشغيل؛ يُصدَّر النموذج الحالي إذا لم يُعطَ ملف جاهز"""
+        self.backend_name = name
+        try:
+            self.backend = create_backend(name, self.model, artifact_path)
+        except Exception as e:
+            print(f"⚠️ تعذر تشغيل الخلفية {name}، سيتم استخدام PyTorch: {e}")
+            self.backend = create_backend("pytorch", self.model)
+        return self.backend.name
+    
+    def quantize_model(self):
+        """تحويل النموذج إلى int8 (تكميم ديناميكي لطبقات Linear)"""
+        self._apply_quantization()
+        self._refresh_backend()
+        return self.quantized
+    
+    def prune_model(self, head_ratio=0.25, ffn_ratio=0.25, method="magnitude", calibration_batches=None):
+        """تقليم هيكلي لرؤوس الانتباه وعصبونات FFN (قبل التكميم)"""
+        self.model = ModelOptimizer().apply_structured_pruning(
+            self.model, head_ratio, ffn_ratio, method, calibration_batches
+        )
+        self.config = self.model.config
+        self._refresh_backend()
+        return self.config
+    
+    def _apply_quantization(self):
+        optimizer = ModelOptimizer()
+        self.model = optimizer.apply_quantization(self.model)
+        self.quantized = optimizer.is_quantized(self.model)
+    
+    def _refresh_backend(self):
+        """إعادة ربط الخلفية المطلوبة بعد تغيير النموذج (تحميل أو تكميم)"""
+        if hasattr(self, 'backend'):
+            self.set_backend(self.backend_name)
     
     def create_optimized_tokenizer(self):
         """إنشاء tokenizer مبسط وفعال"""
@@ -89,123 +145,206 @@ class PolyglotEducationalAI:
     
     def preprocess_text(self, text):
         """معالجة النص بشكل فعال"""
-        if not text or not text.strip():
-            return [self.tokenizer["[CLS]"], self.tokenizer["[SEP]"]]
-        
-        words = text.split()
-        tokens = [self.tokenizer["[CLS]"]]
-        
-        for word in words:
-            # تنظيف الكلمة وإزالة الرموز غير المرغوبة
-            clean_word = ''.join(c for c in word if c.isalnum() or c in [' ', '-', '_', '.', '?', '!']).strip()
-            if clean_word:
-                # تحويل إلى حروف صغيرة للتقليل من حجم المفردات
-                clean_word_lower = clean_word.lower()
-                token = self.tokenizer.get(clean_word_lower, self.tokenizer["[UNK]"])
-                tokens.append(token)
-        
-        # تقليم النص إذا كان أطول من الطول المسموح
-        max_length = self.config.max_position_embeddings - 1  # احتياطي لـ [SEP]
-        if len(tokens) > max_length:
-            tokens = tokens[:max_length]
-        
-        tokens.append(self.tokenizer["[SEP]"])
-        return tokens
+        return list(self.token_encoder.encode(text))
     
     def ask_question(self, question, target_language="ar"):
         """الوظيفة الرئيسية لطرح الأسئلة"""
-        if not question or not question.strip():
-            return {
-                "answer": "يرجى كتابة سؤال واضح.",
-                "detected_language": "unknown",
-                "detected_subject": "general",
-                "target_language": target_language,
-                "confidence": 0.0
-            }
+        return self.ask_questions([question], target_language)[0]
+    
+    def ask_questions(self, questions, target_language="ar", batch_size=32):
+        """طرح مجموعة أسئلة: ترميز جماعي، تمرير واحد للنموذج لكل دفعة، وثقة محسوبة متجهياً
         
-        try:
-            # كشف اللغة والمادة
-            source_language = self.knowledge_base.detect_language(question)
-            subject = self.knowledge_base.detect_subject(question, source_language)
-            
-            # معالجة السؤال
-            tokens = self.preprocess_text(question)
-            input_ids = torch.tensor([tokens])
-            
-            # إنشاء قناع الانتباه
-            attention_mask = (input_ids != self.tokenizer["[PAD]"]).float()
-            
-            # تحديد لغة الإدخال
-            lang_id = torch.tensor([self.knowledge_base.language_codes.get(source_language, 0)])
-            
-            # الحصول على تنبؤات النموذج
-            with torch.no_grad():
-                outputs = self.model(input_ids, attention_mask=attention_mask, language_id=lang_id)
-            
-            # توليد الإجابة باستخدام النظام الذكي
-            answer = self.answer_generator.generate_response(
-                question, subject, source_language, target_language
-            )
-            
-            return {
-                "answer": answer,
-                "detected_language": source_language,
-                "detected_subject": subject,
-                "target_language": target_language,
-                "confidence": self._calculate_confidence(outputs, question)
-            }
-            
-        except Exception as e:
-            print(f"❌ خطأ في معالجة السؤال: {e}")
-            return {
-                "answer": "عذراً، حدث خطأ في معالجة سؤالك. يرجى المحاولة مرة أخرى.",
-                "detected_language": "unknown",
-                "detected_subject": "general",
-                "target_language": target_language,
-                "confidence": 0.0
-            }
-    
-    def _calculate_confidence(self, outputs, question):
-        """حساب ثقة النموذج في الإجابة"""
-        try:
-            # حساب الثقة من تنبؤات اللغة والمادة
-            lang_probs = torch.softmax(outputs['language_logits'], dim=-1)
-            subject_probs = torch.softmax(outputs['subject_logits'], dim=-1)
-            
-            lang_confidence = torch.max(lang_probs).item()
-            subject_confidence = torch.max(subject_probs).item()
+        الأسئلة التي يحسمها كشف القواعد تُجاب مباشرة دون النموذج (إذا كان early_exit مفعلاً).
+        """
+        results = [None] * len(questions)
+        prepared = []
+        
+        # اللغة والمادة ونوع السؤال لكل الأسئلة من المصنف الموحد (تطبيع ومرور واحد لكل سؤال)؛
+        # فشل التصنيف يعطي نتيجة الخطأ لأسئلة دفعته فقط، مثل فشل تمرير النموذج
+        started = time.perf_counter()
+        valid = [index for index, question in enumerate(questions) if question and question.strip()]
+        classifications = {}
+        for start in range(0, len(valid), batch_size):
+            batch = valid[start:start + batch_size]
+            try:
+                classified = self.knowledge_base.question_classifier().classify_batch([questions[i] for i in batch])
+            except Exception as e:
+                print(f"❌ خطأ في معالجة السؤال: {e}")
+                for index in batch:
+                    results[index] = self._error_result(target_language)
+                continue
+            classifications.update(zip(batch, classified))
+        classify_seconds = (time.perf_counter() - started) / max(1, len(valid))
+        
+        for index, question in enumerate(questions):
+            if results[index] is not None:
+                continue
+            if index not in classifications:
+                results[index] = self._build_result("يرجى كتابة سؤال واضح.", "unknown", "general", target_language, 0.0)
+                continue
             
-            # متوسط مرجح للثقة
-            confidence = (lang_confidence * 0.4) + (subject_confidence * 0.6)
+            started = time.perf_counter() - classify_seconds
+            try:
+                classification = classifications[index]
+                source_language = classification["language"]
+                subject = classification["subject"]
+                question_type = classification["question_type"]
+                decisive, subject_margin = self._is_decisive_classification(classification)
+                
+                if self.early_exit and decisive:
+                    answer = self.answer_generator.generate_response(
+                        question, subject, source_language, target_language, question_type
+                    )
+                    results[index] = self._build_result(
+                        answer, source_language, subject, target_language, self._rule_confidence(subject_margin)
+                    )
+                    self._record_path("fast", time.perf_counter() - started)
+                    continue
+                
+                prepared.append((index, question, source_language, subject, question_type,
+                                 self.token_encoder.encode(question), time.perf_counter() - started))
+            except Exception as e:
+                print(f"❌ خطأ في معالجة السؤال: {e}")
+                results[index] = self._error_result(target_language)
+        
+        # ترتيب حسب الطول حتى تتقارب أطوال كل دفعة ويقل الحشو
+        prepared.sort(key=lambda item: len(item[5]))
+        
+        for start in range(0, len(prepared), batch_size):
+            batch = prepared[start:start + batch_size]
+            batch_started = time.perf_counter()
             
-            # ضبط الثقة بناءً على طول السؤال وتعقيده
-            question_complexity = min(len(question.split()) / 20, 1.0)  # تعقيد بناءً على عدد الكلمات
-            adjusted_confidence = confidence * (0.7 + 0.3 * question_complexity)
+            try:
+                input_ids, attention_mask = self._pad_batch([item[5] for item in batch])
+                
+                # تحديد لغة الإدخال
+                lang_ids = torch.tensor([
+                    self.knowledge_base.language_codes.get(item[2], 0) for item in batch
+                ])
+                
+                # الحصول على تنبؤات النموذج (رأسا اللغة والمادة فقط؛ الثقة لا تحتاج رأس المفردات)
+                outputs = self.backend.classify(input_ids, attention_mask, lang_ids)
+                
+                confidences = self._calculate_confidence_batch(outputs, [item[1] for item in batch])
+            except Exception as e:
+                print(f"❌ خطأ في معالجة السؤال: {e}")
+                for item in batch:
+                    results[item[0]] = self._error_result(target_language)
+                continue
             
-            return min(0.95, adjusted_confidence)
+            # حصة كل سؤال من زمن تمرير الدفعة
+            forward_share = (time.perf_counter() - batch_started) / len(batch)
             
-        except Exception:
-            return 0.7  # ثقة افتراضية في حالة الخطأ
+            for (index, question, source_language, subject, question_type, _, detect_seconds), confidence in zip(batch, confidences):
+                started = time.perf_counter()
+                try:
+                    # توليد الإجابة باستخدام النظام الذكي
+                    answer = self.answer_generator.generate_response(
+                        question, subject, source_language, target_language, question_type
+                    )
+                    results[index] = self._build_result(answer, source_language, subject, target_language, confidence)
+                except Exception as e:
+                    print(f"❌ خطأ في معالجة السؤال: {e}")
+                    results[index] = self._error_result(target_language)
+                self._record_path("neural", detect_seconds + forward_share + time.perf_counter() - started)
+        
+        return results
+    
+    def _is_decisive_classification(self, classification):
+        """هل كشف القواعد حاسم؟ (فارق واضح في اللغة والمادة معاً) من نتيجة المصنف الموحد"""
+        subject_margin = classification["subject_margin"]
+        decisive = self._margins_decisive(classification["language"], classification["language_scores"], subject_margin)
+        return decisive, subject_margin
+    
+    def _margins_decisive(self, language, language_scores, subject_margin):
+        return (
+            max(language_scores, key=language_scores.get) == language and
+            self.knowledge_base.score_margin(language_scores) >= self.EARLY_EXIT_LANGUAGE_MARGIN and
+            subject_margin >= self.EARLY_EXIT_SUBJECT_MARGIN
+        )
+    
+    def _rule_confidence(self, subject_margin):
+        """ثقة المسار السريع: تزداد مع فارق درجات المادة"""
+        return min(0.95, 0.6 + 0.05 * subject_margin)
+    
+    def reset_path_stats(self):
+        self.path_stats = {path: {"count": 0, "seconds": 0.0} for path in ("fast", "neural")}
+    
+    def _record_path(self, path, seconds):
+        self.path_stats[path]["count"] += 1
+        self.path_stats[path]["seconds"] += seconds
+    
+    def get_path_stats(self):
+        """نسبة الأسئلة في كل مسار ومتوسط زمنه والزمن الموفَّر تقديرياً"""
+        total = sum(stats["count"] for stats in self.path_stats.values())
+        report = {"total": total}
+        
+        for path, stats in self.path_stats.items():
+            report[f"{path}_ratio"] = stats["count"] / total if total else 0.0
+            report[f"{path}_avg_ms"] = stats["seconds"] / stats["count"] * 1000 if stats["count"] else 0.0
+        
+        # لو مرت أسئلة المسار السريع بالنموذج لاستغرقت متوسط المسار العصبي
+        if self.path_stats["neural"]["count"]:
+            report["saved_ms"] = self.path_stats["fast"]["count"] * (report["neural_avg_ms"] - report["fast_avg_ms"])
+        else:
+            report["saved_ms"] = 0.0
+        
+        return report
+    
+    def _pad_batch(self, token_lists):
+        """حشو الأسئلة إلى أطول سؤال في الدفعة مع قناع انتباه (1 للرموز، 0 للحشو)"""
+        return self.token_encoder.pad(token_lists)
+    
+    def _build_result(self, answer, source_language, subject, target_language, confidence):
+        return {
+            "answer": answer,
+            "detected_language": source_language,
+            "detected_subject": subject,
+            "target_language": target_language,
+            "confidence": confidence
+        }
+    
+    def _error_result(self, target_language):
+        return self._build_result(
+            "عذراً، حدث خطأ في معالجة سؤالك. يرجى المحاولة مرة أخرى.",
+            "unknown", "general", target_language, 0.0
+        )
     
-    def save_model(self, path):
-        """حفظ النموذج مع التكميم لتقليل الحجم"""
+    def _calculate_confidence_batch(self, outputs, questions):
+        """حساب الثقة لكل سؤال في الدفعة دفعة واحدة"""
+        # حساب الثقة من تنبؤات اللغة والمادة
+        lang_confidence = torch.softmax(outputs['language_logits'], dim=-1).max(dim=-1).values
+        subject_confidence = torch.softmax(outputs['subject_logits'], dim=-1).max(dim=-1).values
+        
+        # متوسط مرجح للثقة
+        confidence = (lang_confidence * 0.4) + (subject_confidence * 0.6)
+        
+        # ضبط الثقة بناءً على طول السؤال وتعقيده (عدد الكلمات)
+        question_complexity = torch.tensor(
+            [min(len(question.split()) / 20, 1.0) for question in questions],
+            dtype=confidence.dtype
+        )
+        adjusted_confidence = confidence * (0.7 + 0.3 * question_complexity)
+        
+        return adjusted_confidence.clamp(max=0.95).tolist()
+    
+    def save_model(self, path, half_precision=True):
+        """حفظ النموذج بصيغة safetensors مع ملف JSON للإعدادات والمفردات
+        
+        half_precision=True: ملف fp16 أصغر يُرفع إلى fp32 كسولاً (كل وحدة عند أول استخدام).
+        half_precision=False: ملف fp32 يُحمَّل دون نسخ (mmap) ويتشارك صفحاته بين العمليات.
+        النماذج المكممة تُحفظ بأوزان int8 وبقية الموترات fp32.
+        """
         try:
-            # استخدام float16 لتقليل حجم الملف
-            state_dict_fp16 = {k: v.half() for k, v in self.model.state_dict().items()}
-            
-            torch.save({
-                'model_state_dict': state_dict_fp16,
-                'config': self.config,
-                'tokenizer': self.tokenizer
-            }, path)
-            
-            # حساب وحجم النموذج
-            model_size = sum(p.numel() for p in self.model.parameters())
-            file_size_mb = model_size * 2 / 1024 / 1024  # float16 = 2 bytes per parameter
+            weights_path = save_checkpoint(
+                self.model, path, self.tokenizer, half_precision=half_precision and not self.quantized
+            )
             
             print(f"✅ تم حفظ النموذج بنجاح!")
-            print(f"📊 حجم المعلمات: {model_size:,} معلمة")
-            print(f"💾 الحجم التقريبي للملف: {file_size_mb:.1f} ميجابايت")
+            if not self.quantized:
+                model_size = sum(p.numel() for p in self.model.parameters())
+                print(f"📊 حجم المعلمات: {model_size:,} معلمة")
+            print(f"💾 حجم الملف: {weights_path.stat().st_size / 1024 / 1024:.1f} ميجابايت ({weights_path.name})")
             
             return True
             
@@ -214,13 +353,47 @@ class PolyglotEducationalAI:
             return False
     
     def load_model(self, path):
-        """تحميل النموذج"""
+        """تحميل النموذج (بدقة fp16/fp32 أو مكمماً int8 حسب ما حُفظ)"""
         try:
-            checkpoint = torch.load(path, map_location='cpu')
-            self.model.load_state_dict(checkpoint['model_state_dict'])
+            was_quantized = self.quantized
+            path, legacy = resolve_checkpoint(path)
+            
+            if legacy:
+                self._load_legacy_checkpoint(path)
+            else:
+                self.model, self.config, tokenizer, self.quantized = load_checkpoint(path)
+                self.tokenizer = tokenizer
+                self.token_encoder = CompiledTokenizer(self.tokenizer, self.config.max_position_embeddings)
+            
+            if was_quantized and not self.quantized:
+                # أوزان عادية في نموذج كان مكمماً: إعادة التكميم
+                self._apply_quantization()
+            
+            self._refresh_backend()
             print("✅ تم تحميل النموذج بنجاح!")
+            return True
         except Exception as e:
             print(f"❌ فشل في تحميل النموذج: {e}")
+            return False
+    
+    def _load_legacy_checkpoint(self, path):
+        """نقاط torch.save القديمة (.pth): تُقرأ بـ weights_only ثم تُنسخ في النموذج"""
+        state_dict, config, _, checkpoint_quantized = load_legacy_checkpoint(path)
+        
+        if config is not None and config.to_diff_dict() != self.config.to_diff_dict():
+            # إعادة بناء البنية إذا اختلفت الأبعاد المحفوظة (مثلاً بعد التقليم الهيكلي)
+            self.config = config
+            self.model = PolyglotTutorModel(self.config).eval()
+            self.quantized = False
+        elif self.quantized and not checkpoint_quantized:
+            self.model = PolyglotTutorModel(self.config).eval()
+            self.quantized = False
+        
+        if checkpoint_quantized and not self.quantized:
+            # بناء بنية int8 أولاً ثم تحميل الأوزان المكممة مباشرة
+            self._apply_quantization()
+        
+        self.model.load_state_dict(state_dict)
 
 # دالة مساعدة للاختبار السريع
 def test_polyglot_ai():
@@ -250,7 +423,101 @@ def test_polyglot_ai():
         print(f"💡 الإجابة:\n{result['answer']}")
     
     # حفظ النموذج
-    ai.save_model("mini_polyglot_tutor.pth")
+    ai.save_model("mini_polyglot_tutor.safetensors")
+
+def benchmark_batch_throughput(num_questions=256, batch_sizes=(1, 8, 32, 64)):
+    """مقارنة الإنتاجية بين الأسئلة الفردية والدفعات"""
+    ai = PolyglotEducationalAI()
+    templates = {"ar": "ما هو {}؟", "en": "What is {}?", "fr": "Qu'est-ce que {}?"}
+    concepts = [
+        (language, concept)
+        for subject in ai.knowledge_base.subjects.values()
+        for concept in subject["concepts"]
+        for language in templates
+    ]
+    questions = [
+        templates[language].format(concept)
+        for language, concept in (concepts[i % len(concepts)] for i in range(num_questions))
+    ]
+    
+    started = time.perf_counter()
+    for question in questions:
+        ai.ask_question(question)
+    baseline = num_questions / (time.perf_counter() - started)
+    print(f"📊 سؤال بسؤال: {baseline:.1f} سؤال/ث")
+    
+    results = {"single": baseline}
+    for batch_size in batch_sizes:
+        started = time.perf_counter()
+        ai.ask_questions(questions, batch_size=batch_size)
+        throughput = num_questions / (time.perf_counter() - started)
+        results[batch_size] = throughput
+        print(f"📊 دفعات بحجم {batch_size}: {throughput:.1f} سؤال/ث")
+    
+    return results
+
+def benchmark_early_exit(num_questions=512):
+    """نسبة الأسئلة في كل مسار والزمن الموفَّر بالمسار السريع مقارنة بتمرير كل الأسئلة بالنموذج"""
+    ai = PolyglotEducationalAI()
+    calibration = ModelOptimizer.build_calibration_questions(ai.knowledge_base)
+    ambiguous = ["ما الفرق بين الجبر والهندسة؟", "كيف أتعلم بسرعة؟", "hello", "Bonjour, aide-moi"]
+    mix = calibration + ambiguous
+    questions = [mix[i % len(mix)] for i in range(num_questions)]
+    
+    results = {}
+    for early_exit in (False, True):
+        ai.early_exit = early_exit
+        ai.reset_path_stats()
+        started = time.perf_counter()
+        for question in questions:
+            ai.ask_question(question)
+        elapsed = time.perf_counter() - started
+        
+        stats = ai.get_path_stats()
+        results[early_exit] = dict(stats, throughput=num_questions / elapsed)
+        print(f"📊 early_exit={early_exit}: {num_questions / elapsed:.1f} سؤال/ث | "
+              f"سريع {stats['fast_ratio']:.0%} ({stats['fast_avg_ms']:.2f} مللي ث) | "
+              f"عصبي {stats['neural_ratio']:.0%} ({stats['neural_avg_ms']:.2f} مللي ث)")
+    
+    return results
+
+def benchmark_tokenization(num_questions=2048, batch_size=32):
+    """مقارنة كلفة الترميز القديم (حرفاً بحرف) مع المُجمَّع ومع تمرير النموذج"""
+    ai = PolyglotEducationalAI()
+    questions = [
+        f"{question} ({i % 97})"
+        for i, question in enumerate(ModelOptimizer.build_calibration_questions(ai.knowledge_base) * 64)
+    ][:num_questions]
+    
+    def legacy_preprocess(text):
+        tokens = [ai.tokenizer["[CLS]"]]
+        for word in text.split():
+            clean_word = ''.join(c for c in word if c.isalnum() or c in [' ', '-', '_', '.', '?', '!']).strip()
+            if clean_word:
+                tokens.append(ai.tokenizer.get(clean_word.lower(), ai.tokenizer["[UNK]"]))
+        tokens.append(ai.tokenizer["[SEP]"])
+        return torch.tensor(tokens, dtype=torch.long)
+    
+    timings = {}
+    started = time.perf_counter()
+    for question in questions:
+        legacy_preprocess(question)
+    timings["legacy"] = time.perf_counter() - started
+    
+    encoder = CompiledTokenizer(ai.tokenizer, ai.config.max_position_embeddings, cache_size=0)
+    started = time.perf_counter()
+    batches = [encoder.encode_batch(questions[start:start + batch_size])
+               for start in range(0, num_questions, batch_size)]
+    timings["compiled"] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    for input_ids, attention_mask in batches:
+        ai.backend.classify(input_ids, attention_mask, torch.zeros(len(input_ids), dtype=torch.long))
+    timings["forward"] = time.perf_counter() - started
+    
+    for name, seconds in timings.items():
+        print(f"📊 {name}: {seconds / num_questions * 1e6:.1f} ميكروثانية/سؤال")
+    return timings
 
 if __name__ == "__main__":
     test_polyglot_ai()
@@ -0,0 +1,159 @@
+# models/question_classifier.py
+from utils.text_normalization import normalize_text
+from .aho_corasick import AhoCorasick
+
+LANGUAGES = ("ar", "en", "fr")
+
+# كلمات أنواع الأسئلة بترتيب الأولوية
+_QUESTION_TYPE_PHRASES = {
+    "explanation": {
+        "ar": ["ما هو", "ما هي", "اشرح", "عرف", "مفهوم", "شرح", "ماذا يعني"],
+        "en": ["what is", "explain", "define", "concept of", "describe", "meaning of"],
+        "fr": ["qu'est-ce que", "expliquez", "définir", "concept de", "décrivez", "signification de"]
+    },
+    "comparison": {
+        "ar": ["قارن", "الفرق بين", "ما الفرق", "المقارنة", "اختلاف", "مقارنة"],
+        "en": ["compare", "difference between", "what is the difference", "comparison", "different"],
+        "fr": ["comparez", "différence entre", "quelle est la différence", "comparaison", "différent"]
+    },
+    "step_by_step": {
+        "ar": ["كيف", "طريقة", "خطوات", "حل", "طريقة حل", "كيفية"],
+        "en": ["how", "method", "steps", "solve", "solution", "way to"],
+        "fr": ["comment", "méthode", "étapes", "résoudre", "solution", "façon de"]
+    }
+}
+# مطبّعة مرة واحدة مثل الأسئلة
+QUESTION_TYPE_WORDS = {
+    question_type: {language: [normalize_text(word) for word in words] for language, words in by_language.items()}
+    for question_type, by_language in _QUESTION_TYPE_PHRASES.items()
+}
+QUESTION_TYPE_PRIORITY = {question_type: rank for rank, question_type in enumerate(QUESTION_TYPE_WORDS)}
+
+_SUBJECT, _TYPE = 0, 1
+
+class QuestionClassifier:
+    """مصنف موحد: تطبيع واحد ومرور واحد على السؤال يعطي اللغة ودرجات المواد ونوع السؤال معاً
+
+    كل أنماط المواد (لكل لغة) وعبارات أنواع الأسئلة في آلة Aho-Corasick واحدة؛
+    بعد المرور تُصفّى التطابقات حسب اللغة المكتشفة. النتائج مطابقة لـ detect_language
+    و subject_scores و detect_question_type كل على حدة.
+    """
+
+    def __init__(self, knowledge_base):
+        self.kb = knowledge_base
+        self.subjects = list(knowledge_base.subjects)
+        self.matcher = self._build_matcher()
+
+    def _build_matcher(self):
+        matcher = AhoCorasick()
+        entry_id = 0
+
+        for subject in self.subjects:
+            data = self.kb.subjects.summary(subject)
+            for language in LANGUAGES:
+                patterns = [(keyword, 2) for keyword in data["keywords"].get(language, [])]
+                patterns += [(concept_name, 3) for concept_name in data["concept_ids"]]
+                patterns += [(data["name"][lang], 5) for lang in LANGUAGES]
+
+                for pattern, weight in patterns:
+                    matcher.add(normalize_text(pattern), (_SUBJECT, language, entry_id, subject, weight))
+                    entry_id += 1
+
+        for question_type, by_language in QUESTION_TYPE_WORDS.items():
+            for language, words in by_language.items():
+                for word in words:
+                    matcher.add(word, (_TYPE, language, question_type))
+
+        return matcher.build()
+
+    def _classify_normalized(self, normalized, language_scores):
+        language = self.kb.language_detector.pick_language(language_scores)
+        subject_scores = dict.fromkeys(self.subjects, 0)
+        seen = set()
+        question_type, type_rank = "general", len(QUESTION_TYPE_PRIORITY)
+
+        for _, payload in self.matcher.iter_matches(normalized):
+            if payload[1] != language:
+                continue
+            if payload[0] == _SUBJECT:
+                entry_id, subject, weight = payload[2:]
+                # كل مدخل يُحتسب مرة واحدة مهما تكرر في السؤال
+                if entry_id not in seen:
+                    seen.add(entry_id)
+                    subject_scores[subject] += weight
+            elif QUESTION_TYPE_PRIORITY[payload[2]] < type_rank:
+                question_type, type_rank = payload[2], QUESTION_TYPE_PRIORITY[payload[2]]
+
+        return {
+            "language": language,
+            "language_scores": language_scores,
+            "subject": self.kb.best_subject(subject_scores),
+            "subject_scores": subject_scores,
+            "subject_margin": self.kb.score_margin(subject_scores),
+            "question_type": question_type
+        }
+
+    def classify_batch(self, questions):
+        """تصنيف مجموعة أسئلة: درجات اللغة متجهياً للدفعة كلها، ثم مرور واحد لكل سؤال"""
+        normalized = [normalize_text(question) for question in questions]
+        language_scores = self.kb.language_detector.scores_batch(normalized)
+        return [self._classify_normalized(text, scores) for text, scores in zip(normalized, language_scores)]
+
+    def classify(self, question):
+        """اللغة ودرجاتها، المادة ودرجاتها وفارقها، ونوع السؤال"""
+        return self.classify_batch([question])[0]
+
+def benchmark_question_classifier(num_questions=200000):
+    """تصنيف أسئلة اصطناعية: ثلاثة كواشف منفصلة لكل سؤال مقابل المصنف الموحد بالدفعات"""
+    import random
+    import time
+    from .knowledge_base import EducationalKnowledgeBase
+    from .answer_generator import SmartAnswerGenerator
+
+    kb = EducationalKnowledgeBase()
+    generator = SmartAnswerGenerator(kb, snapshot_path=None)
+    classifier = kb.question_classifier()
+
+    rng = random.Random(0)
+    phrases = {
+        language: [phrase for by_language in _QUESTION_TYPE_PHRASES.values() for phrase in by_language[language]]
+        for language in LANGUAGES
+    }
+    vocabulary = {
+        language: [word for subject in kb.subjects for word in kb.subjects.summary(subject)["keywords"][language]]
+        for language in LANGUAGES
+    }
+    questions = []
+    for _ in range(num_questions):
+        language = rng.choice(LANGUAGES)
+        words = rng.sample(vocabulary[language], 3)
+        questions.append(f"{rng.choice(phrases[language])} {' '.join(words)}؟" if language == "ar"
+                         else f"{rng.choice(phrases[language]).capitalize()} {' '.join(words)}?")
+
+    def separate(batch):
+        results = []
+        for question in batch:
+            language = kb.detect_language(question)
+            scores = kb.subject_scores(question, language)
+            results.append((language, kb.best_subject(scores), generator.detect_question_type(question, language)))
+        return results
+
+    def combined(batch):
+        return [(result["language"], result["subject"], result["question_type"])
+                for start in range(0, len(batch), 1024)
+                for result in classifier.classify_batch(batch[start:start + 1024])]
+
+    timings = {}
+    outputs = {}
+    for name, run in (("separate", separate), ("combined", combined)):
+        started = time.perf_counter()
+        outputs[name] = run(questions)
+        timings[name] = time.perf_counter() - started
+
+    agreement = sum(a == b for a, b in zip(outputs["separate"], outputs["combined"])) / num_questions
+    print(f"📊 {num_questions} سؤال: كواشف منفصلة {timings['separate']:.1f} ث ({num_questions / timings['separate']:.0f} سؤال/ث) "
+          f"← مصنف موحد {timings['combined']:.1f} ث ({num_questions / timings['combined']:.0f} سؤال/ث)، تطابق {agreement:.2%}")
+    return timings
+
+if __name__ == "__main__":
+    benchmark_question_classifier()
@@ -31,8 +31,9 @@ def main():
         print("1. الوضع التفاعلي (أوامر)")
         print("2. الواجهة الرسومية")
         print("3. اختبار سريع")
+        print("4. خادم API محلي (HTTP)")
         
-        choice = input("\nاختر (1/2/3): ").strip()
+        choice = input("\nاختر (1/2/3/4): ").strip()
         
         if choice == "1":
             run_interactive_mode(ai)
@@ -40,6 +41,8 @@ def main():
             run_gui_mode()
         elif choice == "3":
             run_quick_test(ai)
+        elif choice == "4":
+            run_server_mode(ai)
         else:
             print("❌ اختيار غير صحيح")
             
@@ -82,6 +85,17 @@ def run_gui_mode():
     except Exception as e:
         print(f"❌ خطأ في تحميل الواجهة: {e}")
 
+def run_server_mode(ai):
+    """تشغيل خادم HTTP محلي لخدمة فصل كامل من جهاز واحد"""
+    from core.api_server import run_api_server, enable_offline_mode, DEFAULT_HOST, DEFAULT_PORT
+    enable_offline_mode()
+    from main import SmartTutorPro
+    
+    print(f"🌐 المسارات: /ask /ask/stream /documents /quiz /quiz/evaluate /essay /health /metrics")
+    print(f"🔒 الخادم يستمع على {DEFAULT_HOST}:{DEFAULT_PORT} فقط")
+    with SmartTutorPro(ai_model=ai) as tutor:
+        run_api_server(tutor=tutor)
+
 def run_quick_test(ai):
     """اختبار سريع للنظام"""
     print("\n🧪 اختبار سريع للنظام...")
@@ -18,7 +18,8 @@ setup(
     packages=find_packages(),
     python_requires=">=3.8, <4",
     install_requires=[
-        "torch>=2.0.0",
+        "torch>=2.1.0",
+        "safetensors>=0.4.0",
         "transformers>=4.30.0",
         "sentence-transformers>=2.2.0",
         "numpy>=1.24.0",
@@ -33,6 +34,7 @@ setup(
     ],
     extras_require={
         "dev": ["pytest", "pytest-cov", "black", "flake8"],
+        "onnx": ["onnx>=1.14.0", "onnxruntime>=1.16.0"],
     },
     entry_points={
         "console_scripts": [
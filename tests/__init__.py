@@ -2,3 +2,13 @@
 """
 اختبارات SmartTutor Pro
 """
+
+import os
+import atexit
+import shutil
+import tempfile
+
+# اللقطات والملفات المولدة أثناء الاختبارات تُكتب في مجلد مؤقت لا في مجلد البيانات
+_data_dir = tempfile.mkdtemp(prefix="smarttutor-tests-")
+os.environ.setdefault("SMARTTUTOR_DATA_DIR", _data_dir)
+atexit.register(shutil.rmtree, _data_dir, ignore_errors=True)
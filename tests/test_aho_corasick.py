@@ -0,0 +1,40 @@
+import unittest
+import sys
+from pathlib import Path
+
+# إضافة المسار الرئيسي
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.aho_corasick import AhoCorasick
+from models.knowledge_base import EducationalKnowledgeBase
+
+class TestAhoCorasick(unittest.TestCase):
+
+    def test_finds_overlapping_patterns(self):
+        """اختبار إيجاد الأنماط المتداخلة والمتضمنة في مرور واحد"""
+        matcher = AhoCorasick()
+        for pattern in ["he", "she", "his", "hers", "جبر", "الجبر"]:
+            matcher.add(pattern, pattern)
+
+        matches = sorted(payload for _, payload in matcher.iter_matches("ushers والجبر"))
+        self.assertEqual(matches, ["he", "hers", "she", "الجبر", "جبر"])
+
+    def test_subject_scores_match_substring_scan(self):
+        """اختبار تطابق درجات المواد مع البحث القديم نمطاً بنمط"""
+        kb = EducationalKnowledgeBase()
+        questions = [
+            "What is algebra? Solve the equation for the variable",
+            "ما هي قواعد اللغة الإنجليزية؟",
+            "Expliquez la grammaire française et la conjugaison",
+            "كيف أحل معادلة رياضية؟",
+            "Mathematics and geometry: angle, area, angle",
+            "",
+        ]
+        for question in questions:
+            for language in ("ar", "en", "fr"):
+                with self.subTest(question=question, language=language):
+                    self.assertEqual(kb.subject_scores(question, language),
+                                     kb._scan_subject_scores(question, language))
+
+if __name__ == '__main__':
+    unittest.main()
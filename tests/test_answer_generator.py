@@ -0,0 +1,73 @@
+# tests/test_answer_generator.py
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.knowledge_base import EducationalKnowledgeBase
+from models.answer_generator import SmartAnswerGenerator, compile_templates
+
+class TestAnswerGenerator(unittest.TestCase):
+    """اختبارات القوالب المجمّعة وذاكرة الإجابات"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.kb = EducationalKnowledgeBase()
+    
+    def setUp(self):
+        self.generator = SmartAnswerGenerator(self.kb, snapshot_path=None)
+    
+    def test_compiled_templates_use_own_language_fields(self):
+        """القالب المجمّع يطابق format بحقول اللغة الأصلية"""
+        templates = {"general": {"ar": "{subject_ar}: {answer_ar}", "en": "{subject_en} / {answer_en}"}}
+        compiled = compile_templates(templates)
+        self.assertEqual(compiled["general"]["ar"]({"subject": "م", "answer": "ج"}),
+                         templates["general"]["ar"].format(subject_ar="م", answer_ar="ج"))
+        self.assertEqual(compiled["general"]["en"]({"subject": "S", "answer": "A"}), "S / A")
+    
+    def test_comparison_and_step_by_step(self):
+        """أسئلة المقارنة والخطوات تُولَّد بلغة الهدف"""
+        comparison = self.generator.generate_response("Compare algebra and geometry", "math", "en", "fr")
+        self.assertIn("Comparaison entre", comparison)
+        self.assertIn("algebra", comparison)
+        self.assertIn("geometry", comparison)
+        
+        steps = self.generator.generate_response("How to solve an algebra equation?", "math", "en", "ar")
+        self.assertIn("خطوات الحل", steps)
+        self.assertIn(self.generator.examples["algebra"]["ar"]["steps"], steps)
+    
+    def test_split_sections(self):
+        """أقسام الإجابة بترتيب القالب، ودمجها يعيد الإجابة كما هي"""
+        answer = self.generator.generate_explanation("algebra", "math", "ar")
+        sections = self.generator.split_sections(answer, "ar")
+        self.assertEqual([name for name, _ in sections], ["header", "explanation", "example", "application"])
+        self.assertEqual("\n\n".join(text for _, text in sections), answer)
+        self.assertEqual(sections[1][1], self.kb.subjects["math"]["concepts"]["algebra"]["ar"])
+        
+        self.assertEqual(self.generator.split_sections("نص حر", "ar"), [("answer", "نص حر")])
+    
+    def test_render_memo(self):
+        """الإجابة نفسها تُرجع من الذاكرة بدل إعادة التوليد"""
+        first = self.generator.generate_explanation("algebra", "math", "en")
+        second = self.generator.generate_explanation("algebra", "math", "en")
+        self.assertIs(first, second)
+        self.assertEqual(self.generator.render_cache_info().hits, 1)
+        
+        self.generator.clear_render_cache()
+        self.assertEqual(self.generator.render_cache_info().currsize, 0)
+    
+    def test_edited_concept_renders_new_text(self):
+        """تعديل مفهوم في قاعدة المعرفة يمسح الذاكرة فتظهر الإجابة الجديدة"""
+        kb = EducationalKnowledgeBase()
+        generator = SmartAnswerGenerator(kb, snapshot_path=None)
+        self.assertNotIn("Algebra, revised.", generator.generate_explanation("algebra", "math", "en"))
+        
+        kb.subjects["math"]["concepts"]["algebra"]["en"] = "Algebra, revised."
+        kb.invalidate_subject_matchers()
+        
+        self.assertIn("Algebra, revised.", generator.generate_explanation("algebra", "math", "en"))
+        self.assertEqual(generator.render_cache_info().currsize, 1)
+
+if __name__ == "__main__":
+    unittest.main()
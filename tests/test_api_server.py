@@ -0,0 +1,240 @@
+# tests/test_api_server.py
+import sys
+import json
+import time
+import asyncio
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.api_server import TutorAPIServer
+from core.single_flight import SingleFlight
+
+class SlowTutor:
+    """معلم بسيط للاختبار: إجابة ثابتة بعد تأخير قابل للتحكم"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.smart_mode = True
+        self.inflight = SingleFlight()
+        self.release = threading.Event()
+        self.release.set()
+
+    def process_question(self, question, subject=None, use_smart_ai=True, target_language="ar"):
+        self.release.wait()
+        time.sleep(self.delay)
+        return {"type": "smart_ai", "answer": f"إجابة: {question}", "subject": subject or "math",
+                "confidence": 0.9, "source": "polyglot_ai"}
+
+    def stream_question(self, question, subject=None, use_smart_ai=True, target_language="ar"):
+        yield "header", "📚 **شرح الجبر**"
+        yield "explanation", "الجبر فرع من الرياضيات"
+        yield "result", self.process_question(question, subject)
+
+class StreamingTutor(SlowTutor):
+    """بث أقسام كثيرة ببطء؛ يسجل إغلاق المولد"""
+
+    def __init__(self, sections=None, delay=0.05):
+        super().__init__()
+        self.sections = sections
+        self.section_delay = delay
+        self.closed = threading.Event()
+        self.events = []
+
+    def process_question(self, question, subject=None, use_smart_ai=True, target_language="ar"):
+        self.events.append("ask")
+        return super().process_question(question, subject)
+
+    def stream_question(self, question, subject=None, use_smart_ai=True, target_language="ar"):
+        try:
+            count = 0
+            while self.sections is None or count < self.sections:
+                time.sleep(self.section_delay)
+                count += 1
+                self.events.append("section")
+                yield "explanation", f"قسم {count}"
+            yield "result", {"answer": f"إجابة: {question}"}
+        finally:
+            self.closed.set()
+
+async def http_request(port, method, path, payload=None):
+    """طلب HTTP واحد: (الحالة، الرؤوس، الجسم)"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+
+    raw = await reader.read()
+    writer.close()
+    head, _, body = raw.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:])
+    return int(lines[0].split()[1]), headers, body
+
+def decode_chunked(body):
+    lines = []
+    while True:
+        size_line, _, body = body.partition(b"\r\n")
+        size = int(size_line, 16)
+        if size == 0:
+            return lines
+        lines.append(json.loads(body[:size]))
+        body = body[size + 2:]
+
+class TestAPIServer(unittest.IsolatedAsyncioTestCase):
+    """اختبارات خادم HTTP المحلي"""
+
+    async def start_server(self, tutor, **kwargs):
+        server = TutorAPIServer(tutor, port=0, **kwargs)
+        await server.start()
+        self.addAsyncCleanup(server.close)
+        return server
+
+    async def test_ask_health_and_metrics(self):
+        """السؤال يُجاب، و /health و /metrics متاحان"""
+        server = await self.start_server(SlowTutor())
+
+        status, headers, body = await http_request(server.port, "POST", "/ask", {"question": "ما هو الجبر؟"})
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["answer"], "إجابة: ما هو الجبر؟")
+
+        status, _, body = await http_request(server.port, "GET", "/health")
+        self.assertEqual((status, json.loads(body)["status"]), (200, "ok"))
+
+        status, _, body = await http_request(server.port, "GET", "/metrics")
+        metrics = json.loads(body)
+        self.assertEqual(metrics["requests"]["/ask"], 1)
+        self.assertIn("inflight", metrics)
+
+    async def test_errors(self):
+        """مسار غير موجود، طريقة خاطئة، JSON غير صالح، حقل مفقود"""
+        server = await self.start_server(SlowTutor())
+        self.assertEqual((await http_request(server.port, "GET", "/nothing"))[0], 404)
+        self.assertEqual((await http_request(server.port, "GET", "/ask"))[0], 405)
+        self.assertEqual((await http_request(server.port, "POST", "/ask", {}))[0], 400)
+        self.assertEqual((await http_request(server.port, "POST", "/ask", ["ما هو الجبر؟"]))[0], 400)
+
+    async def test_stream_sections(self):
+        """/ask/stream يرسل كل قسم كسطر JSON"""
+        server = await self.start_server(SlowTutor())
+        status, headers, body = await http_request(server.port, "POST", "/ask/stream", {"question": "ما هو الجبر؟"})
+
+        self.assertEqual(headers["Transfer-Encoding"], "chunked")
+        sections = decode_chunked(body)
+        self.assertEqual([item["section"] for item in sections], ["header", "explanation", "result"])
+        self.assertEqual(sections[-1]["content"]["answer"], "إجابة: ما هو الجبر؟")
+
+    async def test_backpressure(self):
+        """عند امتلاء التزامن والطابور تُرفض الطلبات الزائدة بـ 503"""
+        tutor = SlowTutor()
+        tutor.release.clear()
+        server = await self.start_server(tutor, max_concurrency=2, max_queue=2)
+
+        pending = [asyncio.create_task(http_request(server.port, "POST", "/ask", {"question": f"س{i}"}))
+                   for i in range(4)]
+        while server.active + server.waiting < 4:
+            await asyncio.sleep(0.01)
+
+        status, headers, _ = await http_request(server.port, "POST", "/ask", {"question": "زائد"})
+        self.assertEqual(status, 503)
+        self.assertEqual(headers["Retry-After"], "1")
+
+        tutor.release.set()
+        self.assertEqual([response[0] for response in await asyncio.gather(*pending)], [200] * 4)
+        self.assertEqual(server.rejected, 1)
+
+    async def test_stream_holds_one_slot(self):
+        """البث يحجز مكاناً واحداً حتى نهايته: الطلب المنتظر لا يتداخل معه ولا يُقطع البث بـ 503"""
+        tutor = StreamingTutor(sections=6)
+        server = await self.start_server(tutor, max_concurrency=1, max_queue=1)
+
+        stream = asyncio.create_task(http_request(server.port, "POST", "/ask/stream", {"question": "ما هو الجبر؟"}))
+        while not server.active:
+            await asyncio.sleep(0.005)
+        ask = asyncio.create_task(http_request(server.port, "POST", "/ask", {"question": "س"}))
+        while not server.waiting:
+            await asyncio.sleep(0.005)
+
+        # المكان محجوز والطابور ممتلئ
+        self.assertEqual((await http_request(server.port, "POST", "/ask", {"question": "زائد"}))[0], 503)
+
+        sections = decode_chunked((await stream)[2])
+        self.assertEqual([item["section"] for item in sections], ["explanation"] * 6 + ["result"])
+        self.assertEqual((await ask)[0], 200)
+        self.assertEqual(tutor.events, ["section"] * 6 + ["ask"])
+        self.assertTrue(tutor.closed.is_set())
+        self.assertEqual(server.active, 0)
+
+    async def test_stream_closed_on_disconnect(self):
+        """انقطاع العميل يغلق مولد الأقسام ويحرر مكانه"""
+        tutor = StreamingTutor(delay=0.01)
+        server = await self.start_server(tutor)
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        body = json.dumps({"question": "ما هو الجبر؟"}).encode("utf-8")
+        writer.write(f"POST /ask/stream HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+        await reader.readuntil("قسم 1".encode("utf-8"))
+        writer.close()
+
+        self.assertTrue(await asyncio.get_running_loop().run_in_executor(None, tutor.closed.wait, 5))
+        while server.active:
+            await asyncio.sleep(0.01)
+
+    async def test_oversized_header_line(self):
+        """سطر رأس أطول من 64 كيلوبايت يُرفض بـ 431"""
+        server = await self.start_server(SlowTutor())
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(b"GET /health HTTP/1.1\r\nX-Large: " + b"a" * 70000 + b"\r\n\r\n")
+        await writer.drain()
+
+        status_line = await reader.readline()
+        writer.close()
+        self.assertEqual(int(status_line.split()[1]), 431)
+
+    async def test_invalid_content_length(self):
+        """Content-Length سالب أو غير رقمي يُرفض بـ 400"""
+        server = await self.start_server(SlowTutor())
+        for length in ("-5", "abc"):
+            with self.subTest(length=length):
+                reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+                writer.write(f"POST /ask HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode("latin-1"))
+                await writer.drain()
+
+                status_line = await reader.readline()
+                writer.close()
+                self.assertEqual(int(status_line.split()[1]), 400)
+
+    async def test_quiz(self):
+        """توليد اختبار وتقييمه"""
+        from core.quiz_system import QuizSystem
+
+        class RecordingQuizSystem(QuizSystem):
+            threads = []
+
+            def generate_quiz(self, *args):
+                self.threads.append(threading.current_thread().name)
+                return super().generate_quiz(*args)
+
+        server = await self.start_server(SlowTutor(), quiz_system=RecordingQuizSystem(None))
+
+        status, _, body = await http_request(server.port, "POST", "/quiz", {"subject": "science"})
+        quiz = json.loads(body)
+        self.assertEqual(status, 200)
+
+        answers = [question["correct"] for question in quiz["questions"]]
+        status, _, body = await http_request(server.port, "POST", "/quiz/evaluate", {"quiz": quiz, "answers": answers})
+        self.assertEqual(json.loads(body)["quiz"]["percentage"], 100)
+        # التوليد في مجمع الخيوط لا في حلقة الأحداث
+        self.assertTrue(RecordingQuizSystem.threads[0].startswith("tutor-api"))
+
+        self.assertEqual((await http_request(server.port, "POST", "/quiz", {"subject": "music"}))[0], 404)
+        for num_questions in ("abc", None, 0):
+            with self.subTest(num_questions=num_questions):
+                payload = {"subject": "science", "num_questions": num_questions}
+                self.assertEqual((await http_request(server.port, "POST", "/quiz", payload))[0], 400)
+
+if __name__ == "__main__":
+    unittest.main()
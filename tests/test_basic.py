@@ -56,6 +56,51 @@ class TestBasicFunctionality(unittest.TestCase):
                 self.assertIn('confidence', result)
                 self.assertGreater(len(result['answer']), 10)
 
+    def test_batch_matches_single_questions(self):
+        """اختبار تطابق الدفعات مع الأسئلة الفردية رغم الحشو"""
+        questions = [
+            "ما هو الجبر؟",
+            "What is algebra and why do we solve equations with variables?",
+            "",
+            "Expliquez les maths"
+        ]
+        
+        batch_results = self.ai.ask_questions(questions, batch_size=4)
+        
+        self.assertEqual(len(batch_results), len(questions))
+        for question, batch_result in zip(questions, batch_results):
+            with self.subTest(question=question):
+                single_result = self.ai.ask_question(question)
+                self.assertEqual(batch_result['answer'], single_result['answer'])
+                self.assertEqual(batch_result['detected_subject'], single_result['detected_subject'])
+                self.assertAlmostEqual(batch_result['confidence'], single_result['confidence'], places=5)
+
+    def test_classifier_failure_returns_error_result(self):
+        """اختبار أن فشل المصنف يعطي نتيجة الخطأ لأسئلة دفعته فقط بدل رفع الاستثناء"""
+        from unittest import mock
+        
+        classifier = self.ai.knowledge_base.question_classifier()
+        classify = classifier.classify_batch
+        calls = []
+        
+        def classify_batch(questions):
+            calls.append(questions)
+            if len(calls) == 1:
+                raise RuntimeError("تعطل المصنف")
+            return classify(questions)
+        
+        with mock.patch.object(classifier, "classify_batch", side_effect=classify_batch), \
+             mock.patch.object(self.ai.knowledge_base, "question_classifier", return_value=classifier):
+            results = self.ai.ask_questions(["ما هو الجبر؟", "What is algebra?", "", "Expliquez les maths"],
+                                            batch_size=2)
+            single = self.ai.ask_question("ما هو الجبر؟")
+        
+        self.assertEqual([r['detected_language'] for r in results], ["unknown", "unknown", "unknown", "fr"])
+        self.assertEqual([r['confidence'] for r in results[:2]], [0.0, 0.0])
+        self.assertIn("خطأ", results[0]['answer'])
+        self.assertEqual(results[2]['answer'], "يرجى كتابة سؤال واضح.")
+        self.assertEqual(single['detected_language'], "ar")
+
 class TestDocumentProcessor(unittest.TestCase):
     
     def setUp(self):
@@ -75,5 +120,53 @@ class TestDocumentProcessor(unittest.TestCase):
             self.assertIsInstance(chunk, str)
             self.assertGreater(len(chunk), 0)
 
+class TestAnswerSnapshot(unittest.TestCase):
+    
+    def setUp(self):
+        import tempfile
+        from models.knowledge_base import EducationalKnowledgeBase
+        from models.answer_generator import SmartAnswerGenerator
+        
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.snapshot_path = Path(self.temp_dir.name) / "answers.json.z"
+        self.kb = EducationalKnowledgeBase()
+        self.generator = SmartAnswerGenerator(self.kb, snapshot_path=self.snapshot_path)
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_snapshot_matches_template_rendering(self):
+        """اختبار تطابق اللقطة مع التوليد المباشر"""
+        for language in ["ar", "en", "fr"]:
+            with self.subTest(language=language):
+                self.assertEqual(
+                    self.generator.generate_explanation("algebra", "math", language),
+                    self.generator.render_explanation("algebra", "math", language)
+                )
+                self.assertEqual(
+                    self.generator.generate_general_answer("سؤال", "science", language),
+                    self.generator.render_general_answer("science", language)
+                )
+        self.assertTrue(self.snapshot_path.exists())
+    
+    def test_snapshot_regenerates_when_knowledge_changes(self):
+        """اختبار إعادة توليد اللقطة عند تغير قاعدة المعرفة"""
+        self.generator.snapshot.load()
+        self.kb.subjects["math"]["concepts"]["algebra"]["en"] = "Algebra, revised."
+        
+        from models.answer_generator import SmartAnswerGenerator
+        fresh = SmartAnswerGenerator(self.kb, snapshot_path=self.snapshot_path)
+        self.assertIn("Algebra, revised.", fresh.generate_explanation("algebra", "math", "en"))
+    
+    def test_snapshot_rechecked_after_knowledge_edit(self):
+        """اختبار إعادة التحقق من بصمة اللقطة في نفس المولد بعد تعديل قاعدة المعرفة"""
+        self.assertNotIn("Algebra, revised.", self.generator.generate_explanation("algebra", "math", "en"))
+        
+        self.kb.subjects["math"]["concepts"]["algebra"]["en"] = "Algebra, revised."
+        self.kb.invalidate_subject_matchers()
+        
+        self.assertIn("Algebra, revised.", self.generator.generate_explanation("algebra", "math", "en"))
+        self.assertEqual(self.generator.snapshot.load(), self.generator.snapshot.build())
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,191 @@
+import unittest
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+import multiprocessing
+from pathlib import Path
+
+# إضافة المسار الرئيسي
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.cache_system import SmartCache
+
+def _fill_cache(cache_dir, prefix, count):
+    """كتابة مدخلات من عملية منفصلة"""
+    cache = SmartCache(cache_dir=cache_dir)
+    for i in range(count):
+        cache.set(f"{prefix}-{i}", {"answer": f"إجابة {i}"})
+
+class TestSmartCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.temp_dir.name) / "cache"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip_uses_sharded_compressed_json(self):
+        """اختبار الحفظ والاسترجاع وتنسيق الملفات"""
+        cache = SmartCache(cache_dir=self.cache_dir)
+        answer = {"answer": "الجبر فرع من الرياضيات", "confidence": 0.9}
+
+        self.assertTrue(cache.set("ما هو الجبر؟", answer, "math"))
+        self.assertEqual(cache.get("ما هو الجبر؟", "math"), answer)
+        self.assertIsNone(cache.get("ما هو الجبر؟", "science"))
+
+        key = cache.get_cache_key("ما هو الجبر؟", "math")
+        entry = self.cache_dir / key[:2] / f"{key}{SmartCache.ENTRY_SUFFIX}"
+        self.assertTrue(entry.exists())
+        self.assertEqual(list(self.cache_dir.glob("*.pkl")), [])
+        self.assertEqual(cache.get_stats()["hit_rate"], 0.5)
+
+    def test_expired_entries_are_removed(self):
+        """اختبار انتهاء الصلاحية"""
+        cache = SmartCache(cache_dir=self.cache_dir, ttl_hours=1)
+        cache.set("سؤال", {"answer": "قديم"})
+
+        # تقديم وقت الإنشاء في الفهرس والمدخل
+        key = cache.get_cache_key("سؤال")
+        entry = cache._entry_path(key)
+        data = cache._decode(entry.read_bytes())
+        data["created"] -= 2 * 3600
+        entry.write_bytes(cache._encode(data))
+
+        self.assertIsNone(cache.get("سؤال"))
+        self.assertFalse(entry.exists())
+
+    def test_expired_removal_holds_manifest_lock(self):
+        """اختبار أن حذف المدخل المنتهي ينتظر القفل ولا يحذف بديلاً صالحاً كتبته عملية أخرى"""
+        writer = SmartCache(cache_dir=self.cache_dir, ttl_hours=1)
+        reader = SmartCache(cache_dir=self.cache_dir, ttl_hours=1)
+        writer.set("سؤال", {"answer": "قديم"})
+
+        key = writer.get_cache_key("سؤال")
+        entry = writer._entry_path(key)
+        data = writer._decode(entry.read_bytes())
+        data["created"] -= 2 * 3600
+        entry.write_bytes(writer._encode(data))
+
+        results = []
+        with writer._manifest_lock():
+            thread = threading.Thread(target=lambda: results.append(reader.get("سؤال")))
+            thread.start()
+            thread.join(0.3)
+            self.assertTrue(thread.is_alive())
+
+            # عملية أخرى تكتب إجابة جديدة قبل أن يحصل القارئ على القفل
+            data.update(created=time.time(), answer={"answer": "جديد"})
+            entry.write_bytes(writer._encode(data))
+        thread.join()
+
+        self.assertEqual(results, [None])
+        self.assertEqual(reader.get("سؤال"), {"answer": "جديد"})
+        self.assertEqual(reader.get_stats()["total_files"], 1)
+
+    def test_size_limit_evicts_entries(self):
+        """اختبار التحكم في الحجم"""
+        cache = SmartCache(cache_dir=self.cache_dir, max_size_mb=0.001, size_check_interval=1)
+        for i in range(20):
+            cache.set(f"سؤال {i}", {"answer": "نص " * 50 + str(i)})
+            time.sleep(0.001)
+
+        stats = cache.get_stats()
+        self.assertGreater(cache.evictions, 0)
+        self.assertEqual(stats["total_files"] + cache.evictions, 20)
+        self.assertLessEqual(stats["total_size_mb"] * 1024 * 1024, cache.max_size + 1024)
+        # أحدث مدخل يبقى
+        self.assertIsNotNone(cache.get("سؤال 19"))
+
+    def test_gdsf_evicts_in_priority_order(self):
+        """اختبار أن GDSF يحذف الأقل أولوية أولاً (تكلفة × تكرار / حجم) ويتوقف عند حد الأمان"""
+        cache = SmartCache(cache_dir=self.cache_dir, size_check_interval=1000)
+        entries = {
+            # الاسم: (التكلفة، حجم النص، عدد الإصابات)
+            "كبير رخيص": (0.002, 4000, 0),
+            "صغير رخيص": (0.002, 2000, 0),
+            "متوسط": (0.1, 2000, 0),
+            "مكلف متكرر": (0.5, 2000, 2),
+        }
+        for question, (cost, size, hits) in entries.items():
+            cache.set(question, {"answer": os.urandom(size // 2).hex()}, cost=cost)
+            for _ in range(hits):
+                cache.get(question)
+        cache._flush_hits()
+
+        with cache._manifest_lock():
+            manifest = cache._read_manifest()
+        sizes = {question: manifest[cache.get_cache_key(question)]["size"] for question in entries}
+
+        # حد يتطلب حذف المدخلين الأرخصين فقط
+        total = sum(sizes.values())
+        cache.max_size = (total - sizes["كبير رخيص"] - sizes["صغير رخيص"] + 1) / cache.low_water_ratio
+
+        evicted = cache.manage_cache_size()
+
+        self.assertEqual(evicted, [cache.get_cache_key("كبير رخيص"), cache.get_cache_key("صغير رخيص")])
+        self.assertIsNone(cache.get("كبير رخيص"))
+        self.assertIsNone(cache.get("صغير رخيص"))
+        self.assertIsNotNone(cache.get("متوسط"))
+        self.assertIsNotNone(cache.get("مكلف متكرر"))
+        # الساعة ارتفعت إلى أولوية آخر مدخل محذوف
+        self.assertAlmostEqual(cache._clock, cache._priority(manifest[evicted[-1]]))
+
+    def test_gdsf_keeps_expensive_frequent_entries(self):
+        """اختبار أن GDSF يبقي الإجابات المكلفة المتكررة ويحذف الرخيصة الكبيرة"""
+        cache = SmartCache(cache_dir=self.cache_dir, max_size_mb=0.01, size_check_interval=1000)
+        cache.set("مكلف", {"answer": "إجابة النموذج"}, cost=0.8)
+        cache.get("مكلف")
+        for i in range(10):
+            # نص غير قابل للضغط حتى يكبر الحجم فعلاً
+            cache.set(f"رخيص {i}", {"answer": os.urandom(1500).hex()}, cost=0.002)
+
+        cache.manage_cache_size()
+
+        self.assertIsNotNone(cache.get("مكلف"))
+        stats = cache.get_stats()
+        self.assertGreater(stats["evictions"], 0)
+        self.assertAlmostEqual(stats["saved_compute_seconds"], 1.6)
+
+    def test_pending_hits_survive_close_and_compaction(self):
+        """اختبار أن الإصابات الأقل من دفعة التسجيل لا تضيع عند الإغلاق أو ضغط الفهرس"""
+        def recorded_hits(question):
+            with cache._manifest_lock():
+                return cache._read_manifest()[cache.get_cache_key(question)]["hits"]
+
+        with SmartCache(cache_dir=self.cache_dir) as cache:
+            cache.set("سؤال", {"answer": "إجابة"})
+            cache.get("سؤال")
+            cache.get("سؤال")
+            self.assertEqual(recorded_hits("سؤال"), 0)
+        self.assertEqual(recorded_hits("سؤال"), 2)
+
+        cache.get("سؤال")
+        cache.clean_expired()
+        self.assertEqual(recorded_hits("سؤال"), 3)
+
+    def test_concurrent_processes_share_manifest(self):
+        """اختبار الكتابة المتزامنة من عدة عمليات"""
+        processes = [
+            multiprocessing.Process(target=_fill_cache, args=(self.cache_dir, f"p{n}", 25))
+            for n in range(3)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        cache = SmartCache(cache_dir=self.cache_dir)
+        self.assertEqual(cache.get_stats()["total_files"], 75)
+        for n in range(3):
+            self.assertEqual(cache.get(f"p{n}-24"), {"answer": "إجابة 24"})
+
+        # كل سطر في الفهرس JSON صالح
+        for line in cache.manifest_path.read_text(encoding='utf-8').splitlines():
+            json.loads(line)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+# tests/test_concept_index.py
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.knowledge_base import EducationalKnowledgeBase
+from models.answer_generator import SmartAnswerGenerator
+from models.concept_index import ConceptIndex
+
+class TestConceptIndex(unittest.TestCase):
+    """اختبارات الفهرس المعكوس للمفاهيم"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.kb = EducationalKnowledgeBase()
+        cls.generator = SmartAnswerGenerator(cls.kb, snapshot_path=None)
+    
+    def test_matches_in_every_language(self):
+        """المفهوم الأعلى درجة صحيح بأي لغة"""
+        cases = [
+            ("ما هو الجبر؟", "math", "algebra"),
+            ("What is geometry?", "math", "geometry"),
+            ("Qu'est-ce que le calcul?", "math", "calculus"),
+            ("Explain French conjugation", "french", "conjugation")
+        ]
+        for question, subject, expected in cases:
+            with self.subTest(question=question):
+                self.assertEqual(self.generator.find_relevant_concepts(question, subject, "ar")[0], expected)
+    
+    def test_named_concept_ranks_first(self):
+        """المفهوم المذكور في السؤال يأتي أولاً بالعربية والإنجليزية والفرنسية رغم الكلمات الوظيفية"""
+        names = {
+            ("english", "grammar"): ("القواعد", "grammar", "la grammaire"),
+            ("english", "tenses"): ("الأزمنة", "tenses", "les temps"),
+            ("english", "vocabulary"): ("المفردات", "vocabulary", "le vocabulaire"),
+            ("math", "algebra"): ("الجبر", "algebra", "l'algèbre"),
+            ("math", "geometry"): ("الهندسة", "geometry", "la géométrie"),
+            ("science", "physics"): ("الفيزياء", "physics", "la physique"),
+            ("science", "chemistry"): ("الكيمياء", "chemistry", "la chimie"),
+            ("french", "conjugation"): ("التصريف", "conjugation", "la conjugaison")
+        }
+        templates = ("ما هي {}؟", "What is the {}?", "Qu'est-ce que {}?")
+        
+        for (subject, concept_id), by_language in names.items():
+            for template, name in zip(templates, by_language):
+                question = template.format(name)
+                with self.subTest(question=question, subject=subject):
+                    self.assertEqual(self.kb.concept_index(subject).search(question)[0], concept_id)
+    
+    def test_ranking_and_limits(self):
+        """ترتيب تنازلي حسب الدرجة، 3 مفاهيم كحد أقصى، ولا شيء لسؤال بلا كلمات مشتركة"""
+        index = ConceptIndex({
+            "a": {"en": "shared alpha alpha"},
+            "b": {"en": "shared beta"},
+            "c": {"en": "shared gamma"},
+            "d": {"en": "shared delta"}
+        })
+        self.assertEqual(index.search("alpha shared")[0], "a")
+        self.assertEqual(len(index.search("shared")), 3)
+        self.assertEqual(index.search("unrelated"), [])
+        self.assertEqual(self.generator.find_relevant_concepts("سؤال", "unknown_subject", "ar"), [])
+    
+    def test_invalidation_after_content_change(self):
+        """الفهرس يُعاد بناؤه بعد تعديل المفاهيم"""
+        kb = EducationalKnowledgeBase()
+        kb.subjects["science"]["concepts"]["astronomy"] = {"en": "Astronomy studies planets and stars"}
+        kb.invalidate_subject_matchers()
+        self.assertEqual(kb.concept_index("science").search("planets")[0], "astronomy")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import sys
+import pickle
+from pathlib import Path
+
+import numpy as np
+
+# إضافة المسار الرئيسي
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.fast_tokenizer import CompiledTokenizer
+
+VOCAB = {"[PAD]": 0, "[UNK]": 1, "[CLS]": 2, "[SEP]": 3, "[MASK]": 4,
+         "ما": 5, "هو": 6, "what": 7, "is": 8, "algebra?": 9, "x-y": 10}
+
+def legacy_preprocess(text, vocab, max_length):
+    """التنفيذ القديم حرفاً بحرف للمقارنة"""
+    if not text or not text.strip():
+        return [vocab["[CLS]"], vocab["[SEP]"]]
+    tokens = [vocab["[CLS]"]]
+    for word in text.split():
+        clean_word = ''.join(c for c in word if c.isalnum() or c in [' ', '-', '_', '.', '?', '!']).strip()
+        if clean_word:
+            tokens.append(vocab.get(clean_word.lower(), vocab["[UNK]"]))
+    tokens = tokens[:max_length - 1]
+    tokens.append(vocab["[SEP]"])
+    return tokens
+
+class TestCompiledTokenizer(unittest.TestCase):
+
+    def setUp(self):
+        self.tokenizer = CompiledTokenizer(VOCAB, max_length=8)
+
+    def test_matches_legacy_preprocessing(self):
+        """اختبار تطابق الترميز مع التنفيذ القديم"""
+        texts = ["What IS Algebra?", "ما هو «الجبر»؟", "x-y, (x-y)!", "", "   ", "،،، ؟؟",
+                 " ".join(["what"] * 20)]
+        for text in texts:
+            with self.subTest(text=text):
+                self.assertEqual(list(self.tokenizer.encode(text)), legacy_preprocess(text, VOCAB, 8))
+
+    def test_encode_batch_pads_and_masks(self):
+        """اختبار الحشو والقناع في الترميز الجماعي وذاكرة LRU"""
+        input_ids, attention_mask = self.tokenizer.encode_batch(["what is", "ما", "what is"], return_tensors="np")
+
+        self.assertEqual(input_ids.shape, (3, 4))
+        np.testing.assert_array_equal(input_ids[1], [2, 5, 3, 0])
+        np.testing.assert_array_equal(attention_mask.sum(axis=1), [4, 3, 4])
+        self.assertEqual(self.tokenizer.cache_info().hits, 1)
+
+    def test_pickle_rebuilds_empty_cache(self):
+        """اختبار نقل المرمِّز بـ pickle (عمال spawn) مع ذاكرة LRU جديدة فارغة"""
+        self.tokenizer.encode("what is")
+        restored = pickle.loads(pickle.dumps(self.tokenizer))
+
+        self.assertEqual(restored.encode("what is"), self.tokenizer.encode("what is"))
+        self.assertEqual(restored.cache_info().misses, 1)
+        self.assertEqual(restored.cache_info().maxsize, 4096)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import os
+import sys
+import time
+import signal
+from pathlib import Path
+
+import torch
+
+# إضافة المسار الرئيسي
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.inference_pool import InferencePool
+from models.polyglot_tutor import PolyglotEducationalAI
+
+class SlowAI:
+    """بديل بسيط للنموذج في العمال: "بطيء" يستغرق وقتاً، وغيره يُجاب فوراً"""
+
+    def __init__(self):
+        self.model = torch.nn.Linear(1, 1)
+
+    def ask_questions(self, questions, target_language="ar"):
+        if "بطيء" in questions:
+            time.sleep(1)
+        return [{"answer": question} for question in questions]
+
+class TestInferencePool(unittest.TestCase):
+
+    def test_pool_matches_single_process(self):
+        """اختبار أن العمال يعطون نفس إجابات العملية الواحدة وبنفس الترتيب"""
+        ai = PolyglotEducationalAI(early_exit=False)
+        questions = ["What is algebra?", "ما هو الجبر؟", "Expliquez la grammaire", "hello"] * 4
+        expected = ai.ask_questions(questions)
+
+        with InferencePool(num_workers=2, ai=ai, dispatch="round_robin") as pool:
+            results = pool.ask_questions(questions, chunk_size=3)
+            single = pool.ask_question("What is algebra?")
+            stats = pool.get_stats()
+
+        self.assertEqual([r['answer'] for r in results], [r['answer'] for r in expected])
+        for result, reference in zip(results, expected):
+            self.assertAlmostEqual(result['confidence'], reference['confidence'], places=5)
+        self.assertEqual(single['answer'], expected[0]['answer'])
+        self.assertEqual(stats["dispatched"], [4, 3])
+        self.assertEqual(stats["in_flight"], 0)
+
+    def test_spawn_workers_rebuild_the_model(self):
+        """اختبار بدء العمال بـ spawn: الأوزان المشتركة تعطي نفس إجابات العملية الواحدة"""
+        ai = PolyglotEducationalAI(early_exit=False)
+        questions = ["What is algebra?", "ما هو الجبر؟", "Expliquez la grammaire"]
+        expected = ai.ask_questions(questions)
+
+        with InferencePool(num_workers=2, ai=ai, start_method="spawn") as pool:
+            results = pool.ask_questions(questions, chunk_size=2)
+
+        self.assertEqual([r['answer'] for r in results], [r['answer'] for r in expected])
+        for result, reference in zip(results, expected):
+            self.assertAlmostEqual(result['confidence'], reference['confidence'], places=5)
+
+    def test_dead_worker_fails_its_requests(self):
+        """اختبار أن توقف العامل يُفشل طلباته الجارية وتُرسل الطلبات التالية للعمال الأحياء"""
+        with InferencePool(num_workers=2, ai=SlowAI(), dispatch="round_robin") as pool:
+            future = pool.submit(["بطيء"])
+            os.kill(pool.worker_pids()[0], signal.SIGKILL)
+
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=10)
+            self.assertEqual(pool.ask_question("سريع"), {"answer": "سريع"})
+            self.assertEqual(pool.ask_questions(["أ", "ب", "ج"], chunk_size=1), [{"answer": q} for q in "أبج"])
+
+            stats = pool.get_stats()
+            self.assertEqual(stats["alive"], [False, True])
+            self.assertEqual(stats["in_flight"], 0)
+
+    def test_result_timeout(self):
+        """اختبار أن انتظار النتيجة محدود بمهلة"""
+        with InferencePool(num_workers=1, ai=SlowAI(), result_timeout=0.2) as pool:
+            with self.assertRaises(TimeoutError):
+                pool.ask_question("بطيء")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# tests/test_knowledge_store.py
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.knowledge_base import EducationalKnowledgeBase
+from models.knowledge_store import KnowledgeStore, DEFAULT_SOURCE
+
+class TestKnowledgeStore(unittest.TestCase):
+    """اختبارات لقطة قاعدة المعرفة المجمعة والتحميل الكسول"""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.source_path = Path(self.temp_dir.name) / "knowledge.json"
+        self.snapshot_path = Path(self.temp_dir.name) / "knowledge.skb"
+        self.source_path.write_text(DEFAULT_SOURCE.read_text(encoding="utf-8"), encoding="utf-8")
+        self.source = json.loads(self.source_path.read_text(encoding="utf-8"))["subjects"]
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_lazy_loading_matches_source(self):
+        """المحتوى مطابق لملف المصدر، ولا تُحمَّل المفاهيم إلا عند الوصول"""
+        kb = EducationalKnowledgeBase(self.source_path, self.snapshot_path)
+        self.assertTrue(self.snapshot_path.exists())
+        
+        self.assertEqual(kb.detect_subject("What is algebra?", "en"), "math")
+        self.assertFalse(any(kb.subjects.is_loaded(subject) for subject in kb.subjects))
+        
+        self.assertEqual(kb.subjects["math"], self.source["math"])
+        self.assertTrue(kb.subjects.is_loaded("math"))
+        self.assertEqual(kb.subjects.to_dict(), self.source)
+    
+    def test_fingerprint_tracks_changes(self):
+        """البصمة لا تتغير بمجرد التحميل، وتتغير عند تعديل المحتوى"""
+        store = KnowledgeStore(self.source_path, self.snapshot_path)
+        original = store.fingerprint()
+        
+        store["science"]
+        self.assertEqual(store.fingerprint(), original)
+        
+        store["science"]["concepts"]["physics"]["en"] = "Physics, revised."
+        self.assertNotEqual(store.fingerprint(), original)
+    
+    def test_snapshot_recompiled_when_source_changes(self):
+        """تعديل ملف المصدر يعيد تجميع اللقطة"""
+        KnowledgeStore(self.source_path, self.snapshot_path)
+        
+        content = json.loads(self.source_path.read_text(encoding="utf-8"))
+        content["subjects"]["math"]["concepts"]["algebra"]["en"] = "Algebra, revised."
+        self.source_path.write_text(json.dumps(content, ensure_ascii=False), encoding="utf-8")
+        os.utime(self.source_path, ns=(0, 0))
+        
+        store = KnowledgeStore(self.source_path, self.snapshot_path)
+        self.assertEqual(store["math"]["concepts"]["algebra"]["en"], "Algebra, revised.")
+    
+    def test_in_memory_without_snapshot_file(self):
+        """بدون مسار لقطة يُجمَّع المحتوى في الذاكرة"""
+        store = KnowledgeStore(self.source_path, snapshot_path=None)
+        self.assertEqual(list(store), list(self.source))
+        self.assertEqual(store["arabic"], self.source["arabic"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+# tests/test_language_detector.py
+import unittest
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.knowledge_base import EducationalKnowledgeBase
+from models.language_detector import LanguageDetector, SCRIPT_ARABIC, SCRIPT_LATIN, SCRIPT_LATIN_ACCENTED
+
+class TestLanguageDetector(unittest.TestCase):
+    """اختبارات كشف اللغة بنطاقات الكتابة ونموذج الحروف"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.kb = EducationalKnowledgeBase()
+        cls.detector = cls.kb.language_detector
+    
+    def test_script_histograms(self):
+        """عدّ الحروف حسب الكتابة دون الأرقام وعلامات الترقيم"""
+        histograms = LanguageDetector.script_histograms(["ما هو 2؟", "Élève x", ""])
+        self.assertEqual(histograms[0, SCRIPT_ARABIC], 4)
+        self.assertEqual(histograms[1, SCRIPT_LATIN], 4)
+        self.assertEqual(histograms[1, SCRIPT_LATIN_ACCENTED], 2)
+        self.assertEqual(histograms[2].sum(), 0)
+    
+    def test_detection(self):
+        """تمييز العربية والإنجليزية والفرنسية بما فيها الفرنسية دون حروف منبرة"""
+        cases = [
+            ("ما هو الجبر؟", "ar"),
+            ("What is algebra?", "en"),
+            ("Qu'est-ce que l'algèbre?", "fr"),
+            ("Comment apprendre la conjugaison", "fr"),
+            ("How do I learn French grammar", "en"),
+            ("123 ?", "en")
+        ]
+        for text, expected in cases:
+            with self.subTest(text=text):
+                self.assertEqual(self.kb.detect_language(text), expected)
+    
+    def test_batch_matches_single(self):
+        """نتائج الدفعة مطابقة لنموذج الحروف نصاً بنص"""
+        texts = ["La photosynthèse", "", "ما هو Python؟", "Explain the rules of grammar", "l'eau"]
+        self.assertEqual(self.kb.detect_language_batch(texts), [self.kb.detect_language(text) for text in texts])
+        
+        for text, log_odds in zip(texts, self.detector.french_log_odds_batch(texts)):
+            expected = sum(self.detector.ngram_weights.get(gram, self.detector.unseen_weight)
+                           for gram in self.detector._ngrams(text))
+            self.assertAlmostEqual(log_odds, expected, places=6)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,291 @@
+import unittest
+import sys
+from pathlib import Path
+
+import tempfile
+
+import torch
+
+# إضافة المسار الرئيسي
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.model_optimizer import ModelOptimizer
+from models.polyglot_model import PolyglotTutorConfig, PolyglotTutorModel, TinySelfAttention, _eager_attention
+
+class TestPolyglotTutorModel(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.config = PolyglotTutorConfig()
+        self.model = PolyglotTutorModel(self.config).eval()
+        self.input_ids = torch.randint(5, 200, (2, 12))
+        self.attention_mask = torch.ones(2, 12)
+
+    def test_classify_matches_full_forward(self):
+        """اختبار أن مسار التصنيف يعطي نفس رؤوس اللغة والمادة دون رأس الإجابة"""
+        with torch.no_grad():
+            full = self.model(self.input_ids, self.attention_mask)
+            classified = self.model.classify(self.input_ids, self.attention_mask)
+
+        self.assertNotIn('answer_logits', classified)
+        self.assertEqual(full['answer_logits'].shape, (2, 12, self.config.vocab_size))
+        for key in ('language_logits', 'subject_logits'):
+            torch.testing.assert_close(classified[key], full[key])
+
+    def test_fused_attention_matches_eager_path(self):
+        """اختبار تطابق الانتباه المدمج مع المسار القديم مع قناع الحشو"""
+        attention = TinySelfAttention(self.config).eval()
+        hidden_states = torch.randn(3, 10, self.config.hidden_size)
+        attention_mask = torch.ones(3, 10, dtype=torch.bool)
+        attention_mask[1, 6:] = False
+        attention_mask = attention_mask[:, None, None, :]
+
+        with torch.no_grad():
+            torch.testing.assert_close(
+                attention(hidden_states, attention_mask),
+                _eager_attention(attention, hidden_states, attention_mask),
+                atol=1e-5, rtol=1e-5
+            )
+
+    def test_legacy_qkv_checkpoint_loads(self):
+        """اختبار تحميل نقطة محفوظة بالإسقاطات المنفصلة القديمة"""
+        attention = TinySelfAttention(self.config)
+        weight, bias = attention.qkv.weight.detach(), attention.qkv.bias.detach()
+        legacy_state = {}
+        for name, w, b in zip(('query', 'key', 'value'), weight.chunk(3), bias.chunk(3)):
+            legacy_state[f'{name}.weight'] = w.clone()
+            legacy_state[f'{name}.bias'] = b.clone()
+
+        restored = TinySelfAttention(self.config)
+        restored.load_state_dict(legacy_state)
+        torch.testing.assert_close(restored.qkv.weight, weight)
+        torch.testing.assert_close(restored.qkv.bias, bias)
+
+class TestQuantization(unittest.TestCase):
+
+    def test_int8_model_agrees_and_round_trips(self):
+        """اختبار أن التكميم int8 يحافظ على رأسي اللغة والمادة ويُحفظ ويُحمَّل مباشرة"""
+        from models.polyglot_tutor import PolyglotEducationalAI
+
+        torch.manual_seed(0)
+        ai = PolyglotEducationalAI()
+        optimizer = ModelOptimizer()
+        questions = optimizer.build_calibration_questions(ai.knowledge_base)[:32]
+        input_ids, attention_mask = ai._pad_batch([ai.preprocess_text(q) for q in questions])
+
+        quantized_model = optimizer.apply_quantization(ai.model)
+        self.assertTrue(optimizer.is_quantized(quantized_model))
+        self.assertFalse(optimizer.is_quantized(ai.model))
+
+        report = optimizer.compare_quantization(ai.model, quantized_model, [(input_ids, attention_mask)], repeats=1)
+        self.assertLess(report["int8_size_mb"], report["fp32_size_mb"])
+        self.assertGreaterEqual(report["subject_agreement"], 0.9)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "model_int8.pth"
+            ai.quantize_model()
+            self.assertTrue(ai.save_model(path))
+
+            loaded = PolyglotEducationalAI(model_path=path)
+            self.assertTrue(loaded.quantized)
+            with torch.no_grad():
+                torch.testing.assert_close(
+                    loaded.model.classify(input_ids, attention_mask)['subject_logits'],
+                    ai.model.classify(input_ids, attention_mask)['subject_logits']
+                )
+
+class TestCheckpointFormat(unittest.TestCase):
+
+    def test_safetensors_and_legacy_checkpoints_load(self):
+        """اختبار الحفظ بصيغة safetensors مع ملف JSON وتحميل نقاط pickle القديمة"""
+        from models.polyglot_tutor import PolyglotEducationalAI
+
+        torch.manual_seed(0)
+        ai = PolyglotEducationalAI()
+        input_ids, attention_mask = ai.token_encoder.encode_batch(["ما هو الجبر؟", "What is grammar?"])
+        with torch.no_grad():
+            expected = ai.model.classify(input_ids, attention_mask)['subject_logits']
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.assertTrue(ai.save_model(Path(temp_dir) / "model.safetensors"))
+            self.assertTrue((Path(temp_dir) / "model.json").exists())
+
+            # نفس ما كان يكتبه save_model الأصلي: كائن الإعدادات نفسه داخل pickle
+            legacy_path = Path(temp_dir) / "legacy.pth"
+            torch.save({
+                'model_state_dict': {k: v.half() for k, v in ai.model.state_dict().items()},
+                'config': ai.config,
+                'tokenizer': ai.tokenizer
+            }, legacy_path)
+
+            for path in (Path(temp_dir) / "model.safetensors", legacy_path):
+                with self.subTest(path=path.name):
+                    loaded = PolyglotEducationalAI()
+                    self.assertTrue(loaded.load_model(path))
+                    with torch.no_grad():
+                        torch.testing.assert_close(
+                            loaded.model.classify(input_ids, attention_mask)['subject_logits'],
+                            expected, atol=1e-2, rtol=1e-2
+                        )
+                    self.assertEqual(loaded.model.subject_head.weight.dtype, torch.float32)
+
+    def test_legacy_loader_without_safe_globals(self):
+        """اختبار تحميل نقطة pickle قديمة على torch 2.4 (add_safe_globals دون safe_globals)"""
+        from unittest import mock
+        from models.checkpoint_io import load_legacy_checkpoint
+
+        config = PolyglotTutorConfig()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            legacy_path = Path(temp_dir) / "legacy.pth"
+            torch.save({'model_state_dict': {'w': torch.ones(2)}, 'config': config, 'tokenizer': {}}, legacy_path)
+
+            with mock.patch.object(torch.serialization, "safe_globals", create=True) as safe_globals:
+                del torch.serialization.safe_globals
+                state_dict, loaded_config, _, quantized = load_legacy_checkpoint(legacy_path)
+
+        self.assertFalse(safe_globals.called)
+        self.assertEqual(loaded_config.to_dict(), config.to_dict())
+        torch.testing.assert_close(state_dict['w'], torch.ones(2))
+        self.assertFalse(quantized)
+
+    def test_fp16_weights_upcast_lazily(self):
+        """اختبار أن أوزان fp16 تُرفع إلى fp32 عند أول استخدام لكل وحدة فقط"""
+        from models.checkpoint_io import save_checkpoint, load_checkpoint, materialize_weights
+
+        torch.manual_seed(0)
+        model = PolyglotTutorModel(PolyglotTutorConfig()).eval()
+        input_ids = torch.randint(5, 200, (2, 12))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = save_checkpoint(model, Path(temp_dir) / "model", {})
+
+            loaded = load_checkpoint(path)[0]
+            self.assertEqual(loaded.subject_head.weight.dtype, torch.float16)
+
+            with torch.inference_mode():
+                loaded.classify(input_ids)
+            self.assertEqual(loaded.subject_head.weight.dtype, torch.float32)
+            self.assertEqual(loaded.embeddings.word_embeddings.weight.dtype, torch.float32)
+            # رأس المفردات لا يُستخدم في التصنيف فيبقى كما حُفظ
+            self.assertEqual(loaded.answer_head.weight.dtype, torch.float16)
+
+            materialize_weights(loaded)
+            self.assertEqual({param.dtype for param in loaded.parameters()}, {torch.float32})
+
+            kept = load_checkpoint(path, dtype=None)[0]
+            with torch.no_grad():
+                kept.classify(input_ids)
+            self.assertEqual(kept.subject_head.weight.dtype, torch.float16)
+
+class TestStructuredPruning(unittest.TestCase):
+
+    def test_pruning_shrinks_layers_and_round_trips(self):
+        """اختبار أن التقليم الهيكلي يصغّر الطبقات ويحدّث الإعدادات ويُحفظ ويُحمَّل"""
+        from models.polyglot_tutor import PolyglotEducationalAI
+
+        torch.manual_seed(0)
+        ai = PolyglotEducationalAI()
+        optimizer = ModelOptimizer()
+        input_ids, attention_mask = ai.token_encoder.encode_batch(["ما هو الجبر؟", "What is grammar?"])
+
+        # بدون حذف شيء يبقى الناتج مطابقاً
+        unchanged = optimizer.apply_structured_pruning(ai.model, head_ratio=0, ffn_ratio=0)
+        with torch.no_grad():
+            torch.testing.assert_close(unchanged.classify(input_ids, attention_mask),
+                                       ai.model.classify(input_ids, attention_mask))
+
+        ai.prune_model(head_ratio=0.5, ffn_ratio=0.5)
+        layer = ai.model.encoder.layer[0]
+        self.assertEqual(ai.config.num_attention_heads, 2)
+        self.assertEqual(ai.config.intermediate_size, 192)
+        self.assertEqual(layer.attention.self.qkv.weight.shape, (3 * 2 * 32, 128))
+        self.assertEqual(layer.attention.output.dense.weight.shape, (128, 64))
+        self.assertEqual(layer.output.dense.weight.shape, (128, 192))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "pruned.pth"
+            self.assertTrue(ai.save_model(path))
+            loaded = PolyglotEducationalAI(model_path=path)
+            self.assertEqual(loaded.config.num_attention_heads, 2)
+            with torch.no_grad():
+                torch.testing.assert_close(
+                    loaded.model.classify(input_ids, attention_mask)['subject_logits'],
+                    ai.model.classify(input_ids, attention_mask)['subject_logits'],
+                    atol=1e-2, rtol=1e-2
+                )
+
+class TestEarlyExit(unittest.TestCase):
+
+    def test_decisive_questions_skip_the_model(self):
+        """اختبار أن الأسئلة المحسومة بالقواعد لا تمر بالنموذج وأن الإحصائيات تسجل المسارين"""
+        from models.polyglot_tutor import PolyglotEducationalAI
+
+        class CountingBackend:
+            name = "pytorch"
+
+            def __init__(self, backend):
+                self.backend = backend
+                self.rows = 0
+
+            def classify(self, input_ids, attention_mask, language_id):
+                self.rows += len(input_ids)
+                return self.backend.classify(input_ids, attention_mask, language_id)
+
+        ai = PolyglotEducationalAI()
+        ai.backend = CountingBackend(ai.backend)
+        decisive, ambiguous = "What is algebra?", "hello"
+
+        classifier = ai.knowledge_base.question_classifier()
+        self.assertTrue(ai._is_decisive_classification(classifier.classify(decisive))[0])
+        self.assertFalse(ai._is_decisive_classification(classifier.classify(ambiguous))[0])
+
+        results = ai.ask_questions([decisive, ambiguous])
+        self.assertEqual(ai.backend.rows, 1)
+        self.assertEqual(results[0]['detected_subject'], "math")
+        self.assertGreater(results[0]['confidence'], 0.6)
+
+        stats = ai.get_path_stats()
+        self.assertEqual(stats["total"], 2)
+        self.assertEqual(stats["fast_ratio"], 0.5)
+
+        # بدون المسار السريع: نفس الإجابة لكن عبر النموذج
+        ai.early_exit = False
+        self.assertEqual(ai.ask_question(decisive)['answer'], results[0]['answer'])
+        self.assertEqual(ai.backend.rows, 2)
+
+class TestInferenceBackends(unittest.TestCase):
+
+    def test_exported_backends_match_pytorch(self):
+        """اختبار تطابق TorchScript و ONNX Runtime مع PyTorch عبر نفس واجهة ask_questions"""
+        from models.inference_backends import onnxruntime
+        from models.polyglot_tutor import PolyglotEducationalAI
+
+        torch.manual_seed(0)
+        questions = ["ما هو الجبر؟", "What is grammar in English and how do I learn it?", "Expliquez la loi"]
+
+        reference_ai = PolyglotEducationalAI(early_exit=False)
+        reference = reference_ai.ask_questions(questions)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            backends = ["torchscript"] + (["onnx"] if onnxruntime is not None else [])
+            for backend in backends:
+                with self.subTest(backend=backend):
+                    ai = PolyglotEducationalAI(early_exit=False)
+                    ai.model = reference_ai.model
+                    self.assertEqual(ai.set_backend(backend, Path(temp_dir) / f"model.{backend}"), backend)
+
+                    for expected, result in zip(reference, ai.ask_questions(questions)):
+                        self.assertEqual(result['answer'], expected['answer'])
+                        self.assertAlmostEqual(result['confidence'], expected['confidence'], places=4)
+
+    def test_default_export_dir_under_data_dir(self):
+        """اختبار أن التصدير دون مسار يذهب إلى مجلد البيانات لا إلى مجلد التشغيل الحالي"""
+        from utils.config import Config
+        from models.inference_backends import create_backend
+
+        backend = create_backend("torchscript", PolyglotTutorModel(PolyglotTutorConfig()).eval())
+        self.assertEqual(backend.path.parent, Config.DATA_DIR / "exported")
+        self.assertTrue(backend.path.exists())
+
+if __name__ == '__main__':
+    unittest.main()
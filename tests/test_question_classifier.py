@@ -0,0 +1,54 @@
+# tests/test_question_classifier.py
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.knowledge_base import EducationalKnowledgeBase
+from models.answer_generator import SmartAnswerGenerator
+
+class TestQuestionClassifier(unittest.TestCase):
+    """اختبارات المصنف الموحد (اللغة + المادة + نوع السؤال)"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.kb = EducationalKnowledgeBase()
+        cls.generator = SmartAnswerGenerator(cls.kb, snapshot_path=None)
+        cls.classifier = cls.kb.question_classifier()
+    
+    def test_matches_separate_detectors(self):
+        """النتيجة مطابقة لـ detect_language و subject_scores و detect_question_type"""
+        questions = [
+            "ما هو الجبر؟",
+            "قارن بين الفيزياء والكيمياء",
+            "كيف أحل معادلة من الدرجة الأولى؟",
+            "What is the difference between algebra and geometry?",
+            "How do I improve my English vocabulary?",
+            "Qu'est-ce que la conjugaison française?",
+            "Comparez la physique et la chimie",
+            "Tell me something"
+        ]
+        for question, result in zip(questions, self.classifier.classify_batch(questions)):
+            with self.subTest(question=question):
+                language = self.kb.detect_language(question)
+                scores = self.kb.subject_scores(question, language)
+                self.assertEqual(result["language"], language)
+                self.assertEqual(result["subject_scores"], scores)
+                self.assertEqual(result["subject"], self.kb.detect_subject(question, language))
+                self.assertEqual(result["subject_margin"], self.kb.score_margin(scores))
+                self.assertEqual(result["question_type"], self.generator.detect_question_type(question, language))
+    
+    def test_rebuilt_after_invalidation(self):
+        """المصنف يُعاد بناؤه بعد تعديل المواد"""
+        kb = EducationalKnowledgeBase()
+        kb.subjects["music"] = {
+            "name": {"ar": "الموسيقى", "en": "Music", "fr": "Musique"},
+            "concepts": {},
+            "keywords": {"ar": ["لحن"], "en": ["melody"], "fr": ["mélodie"]}
+        }
+        kb.invalidate_subject_matchers()
+        self.assertEqual(kb.question_classifier().classify("Explain this melody")["subject"], "music")
+
+if __name__ == "__main__":
+    unittest.main()
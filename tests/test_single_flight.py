@@ -0,0 +1,57 @@
+import unittest
+import sys
+import time
+import threading
+from pathlib import Path
+
+# إضافة المسار الرئيسي
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.single_flight import SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_duplicates_compute_once(self):
+        """اختبار أن 30 طلباً متطابقاً ينفذ حساباً واحداً"""
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        def slow_answer():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return {"answer": "الجبر"}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do("ما هو الجبر؟", slow_answer)))
+            for _ in range(30)
+        ]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 30)
+        self.assertTrue(all(result == {"answer": "الجبر"} for result in results))
+        self.assertEqual(flight.get_stats()["coalesced"], 29)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_errors_propagate_and_key_is_released(self):
+        """اختبار انتشار الخطأ وإعادة الحساب بعده"""
+        flight = SingleFlight()
+
+        def failing():
+            raise ValueError("فشل")
+
+        with self.assertRaises(ValueError):
+            flight.do("مفتاح", failing)
+
+        self.assertEqual(flight.do("مفتاح", lambda: 42), 42)
+
+if __name__ == '__main__':
+    unittest.main()
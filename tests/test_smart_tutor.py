@@ -0,0 +1,271 @@
+# tests/test_smart_tutor.py
+import sys
+import time
+import zlib
+import shutil
+import threading
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from main import SmartTutorPro
+from core.cache_system import SmartCache
+from core.document_processor import DocumentProcessor
+from models.polyglot_tutor import PolyglotEducationalAI
+
+class HashingEncoder:
+    """تضمينات كيس الكلمات بدل نموذج sentence-transformers (غير متاح دون اتصال)"""
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    def encode(self, texts, show_progress_bar=False, convert_to_numpy=True):
+        embeddings = np.zeros((len(texts), 64), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.split():
+                embeddings[row, zlib.crc32(word.encode("utf-8")) % 64] += 1
+        return embeddings
+
+class TutorTestCase(unittest.TestCase):
+    """معلم كامل بمستندات وتخزين مؤقت في مجلد مؤقت"""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+        patcher = mock.patch("core.document_processor.SentenceTransformer", HashingEncoder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_ai(self, seed=0):
+        torch.manual_seed(seed)
+        return PolyglotEducationalAI()
+
+    def make_tutor(self, ai_model):
+        """معلم بمستندات وتخزين مؤقت في المجلد المؤقت؛ كل استدعاء يشبه تشغيل عملية جديدة"""
+        return SmartTutorPro(
+            ai_model=ai_model,
+            doc_processor=DocumentProcessor(base_dir=self.temp_dir / "docs"),
+            cache=SmartCache(cache_dir=self.temp_dir / "cache")
+        )
+
+class TestSourcesVersion(TutorTestCase):
+    """إصدار مصادر الإجابة يُحسب من الحالة الفعلية ويُبطل التخزين المؤقت عند تغيرها"""
+
+    def assert_cached(self, tutor, question, answer):
+        params = tutor._cache_params(True, "ar")
+        tutor.cache.set(question, {"type": "cached", "answer": answer}, **params)
+        self.assertEqual(tutor.process_question(question)["answer"], answer)
+
+    def test_version_follows_startup_state(self):
+        """نفس الأوزان والمستندات تعطي نفس الإصدار في كل عملية، وأوزان مختلفة تعطي إصداراً آخر"""
+        ai = self.make_ai(seed=0)
+        first, restarted = self.make_tutor(ai), self.make_tutor(ai)
+        self.assertEqual(first.sources_version, restarted.sources_version)
+
+        other = self.make_tutor(self.make_ai(seed=1))
+        self.assertNotEqual(first.sources_version, other.sources_version)
+
+    def test_add_document_invalidates_cached_answers(self):
+        """بعد إضافة مستند لا تُعاد الإجابة المخزنة قبله"""
+        tutor = self.make_tutor(self.make_ai())
+        tutor.smart_mode = False
+        question = "ما هي عملية البناء الضوئي في النبات؟"
+        self.assert_cached(tutor, question, "إجابة قديمة")
+        initial_version = tutor.sources_version
+
+        document = self.temp_dir / "biology.txt"
+        document.write_text("البناء الضوئي عملية يصنع فيها النبات غذاءه من الضوء والماء", encoding="utf-8")
+        success, _ = tutor.add_document(str(document), "science")
+
+        self.assertTrue(success)
+        self.assertNotEqual(tutor.sources_version, initial_version)
+        result = tutor.process_question(question)
+        self.assertEqual(result["type"], "document_search")
+        self.assertIn("البناء الضوئي", result["answer"])
+
+        # عملية جديدة لم تحمّل المستند تعود لإصدار البداية ولا ترى إجابة المستند
+        restarted = self.make_tutor(tutor.ai_model)
+        self.assertEqual(restarted.sources_version, initial_version)
+
+    def test_load_model_invalidates_cached_answers(self):
+        """بعد تحميل أوزان جديدة لا تُعاد الإجابة المخزنة قبلها"""
+        tutor = self.make_tutor(self.make_ai(seed=0))
+        question = "ما هو الجبر؟"
+        self.assert_cached(tutor, question, "إجابة قديمة")
+        initial_version = tutor.sources_version
+
+        checkpoint = self.temp_dir / "other.safetensors"
+        self.make_ai(seed=1).save_model(str(checkpoint))
+
+        self.assertTrue(tutor.load_model(str(checkpoint)))
+        self.assertNotEqual(tutor.sources_version, initial_version)
+        self.assertNotEqual(tutor.process_question(question)["answer"], "إجابة قديمة")
+
+        # عملية جديدة تبدأ من نفس النقطة تشارك الإصدار (والتخزين المؤقت)
+        fresh = PolyglotEducationalAI()
+        self.assertTrue(fresh.load_model(str(checkpoint)))
+        self.assertEqual(self.make_tutor(fresh).sources_version, tutor.sources_version)
+
+SMART_RESULT = {"type": "smart_ai", "answer": "📚 **شرح الجبر**\nالجبر فرع من الرياضيات", "confidence": 0.9,
+                "subject": "math", "language": "ar", "source": "polyglot_ai"}
+DOC_RESULTS = [{"content": "الجبر يستخدم الرموز", "score": 0.8, "subject": "math"}]
+
+def slow(delay, result=None, error=None, calls=None):
+    """مسار بطيء بديل: ينتظر ثم يعيد النتيجة أو يرفع الخطأ"""
+    def path(*args):
+        if calls is not None:
+            calls.append(args)
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+    return path
+
+class TestHedgedExecution(TutorTestCase):
+    """النموذج الذكي والبحث في المستندات يعملان معاً، وإجابة النموذج الواثقة لها الأولوية"""
+
+    def make_hedged_tutor(self, smart, search):
+        tutor = self.make_tutor(self.make_ai())
+        tutor.hedged = True
+        self.addCleanup(tutor.close)
+        patches = (mock.patch.object(tutor, "_smart_answer", side_effect=smart),
+                   mock.patch.object(tutor.doc_processor, "search_documents", side_effect=search))
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return tutor
+
+    def timed_answer(self, tutor):
+        started = time.perf_counter()
+        result = tutor._answer_question("ما هو الجبر؟")
+        return result, time.perf_counter() - started
+
+    def test_confident_smart_answer_wins_without_waiting_for_search(self):
+        """إجابة النموذج الواثقة تُعاد دون انتظار البحث الأبطأ، ونتيجة البحث تُهمل"""
+        tutor = self.make_hedged_tutor(slow(0.1, SMART_RESULT), slow(0.8, DOC_RESULTS))
+        result, elapsed = self.timed_answer(tutor)
+
+        self.assertEqual(result["type"], "smart_ai")
+        self.assertLess(elapsed, 0.6)
+
+    def test_paths_run_concurrently(self):
+        """النموذج غير الواثق: نتيجة البحث، والزمن أطول المسارين لا مجموعهما"""
+        calls = []
+        tutor = self.make_hedged_tutor(slow(0.3, None), slow(0.3, DOC_RESULTS, calls=calls))
+        result, elapsed = self.timed_answer(tutor)
+
+        self.assertEqual(result["type"], "document_search")
+        self.assertEqual(result["answer"], DOC_RESULTS[0]["content"])
+        self.assertEqual(len(calls), 1)
+        self.assertLess(elapsed, 0.5)
+
+    def test_queued_search_is_cancelled(self):
+        """البحث الذي لم يبدأ بعد يُلغى عند وصول إجابة النموذج الواثقة"""
+        calls = []
+        tutor = self.make_hedged_tutor(slow(0, SMART_RESULT), slow(0, DOC_RESULTS, calls=calls))
+
+        # خيط واحد مشغول، فيبقى البحث في الطابور
+        tutor._executor = ThreadPoolExecutor(max_workers=1)
+        release = threading.Event()
+        tutor._executor.submit(release.wait)
+
+        self.assertEqual(self.timed_answer(tutor)[0]["type"], "smart_ai")
+        release.set()
+        tutor._executor.shutdown(wait=True)
+        self.assertEqual(calls, [])
+
+    def test_failure_in_one_path_falls_back_to_the_other(self):
+        """فشل النموذج يعطي نتيجة البحث، وفشل البحث يعطي إجابة النموذج أو الإجابة الافتراضية"""
+        tutor = self.make_hedged_tutor(slow(0, SMART_RESULT), slow(0.1, DOC_RESULTS))
+        with mock.patch.object(tutor, "_smart_answer", wraps=SmartTutorPro._smart_answer.__get__(tutor)), \
+             mock.patch.object(tutor.ai_model, "ask_question", side_effect=RuntimeError("تعطل النموذج")):
+            self.assertEqual(self.timed_answer(tutor)[0]["type"], "document_search")
+
+        with mock.patch.object(tutor.doc_processor, "search_documents", side_effect=slow(0.1, error=OSError("تعطل الفهرس"))):
+            self.assertEqual(self.timed_answer(tutor)[0]["type"], "smart_ai")
+            with mock.patch.object(tutor, "_smart_answer", return_value=None):
+                self.assertEqual(self.timed_answer(tutor)[0]["type"], "fallback")
+
+    def test_stream_runs_both_paths_together(self):
+        """البث في الوضع المتوازي يشغل المسارين معاً ويعرض المقتطفات بعد أقسام الإجابة"""
+        tutor = self.make_hedged_tutor(slow(0.3, SMART_RESULT), slow(0.3, DOC_RESULTS))
+        started = time.perf_counter()
+        sections = list(tutor.stream_question("ما هو الجبر؟"))
+
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(sections[-2], ("document", DOC_RESULTS[0]["content"]))
+        self.assertEqual(sections[-1][1]["type"], "smart_ai")
+        self.assertNotEqual(sections[0][0], "document")
+
+    def test_close_stops_the_executor(self):
+        """الخروج من with يوقف خيوط البحث"""
+        with self.make_tutor(self.make_ai()) as tutor:
+            tutor._executor.submit(time.sleep, 0).result()
+        with self.assertRaises(RuntimeError):
+            tutor._executor.submit(time.sleep, 0)
+
+    def test_close_cancels_queued_searches(self):
+        """close يلغي البحث الذي لم يبدأ بعد"""
+        calls = []
+        tutor = self.make_hedged_tutor(slow(0, SMART_RESULT), slow(0, DOC_RESULTS, calls=calls))
+        tutor._executor = ThreadPoolExecutor(max_workers=1)
+        release = threading.Event()
+        tutor._executor.submit(release.wait)
+
+        search = tutor._submit_search("ما هو الجبر؟")
+        tutor.close()
+        release.set()
+
+        self.assertTrue(search.cancelled())
+        self.assertEqual(calls, [])
+        self.assertEqual(tutor._searches, set())
+
+class TestStreaming(TutorTestCase):
+    """البث يقرأ التخزين المؤقت مباشرة ويمر عبر inflight عند عدم وجود الإجابة"""
+
+    def make_streaming_tutor(self, smart_calls, search_calls):
+        tutor = self.make_tutor(self.make_ai())
+        self.addCleanup(tutor.close)
+        patches = (mock.patch.object(tutor, "_smart_answer", side_effect=slow(0.3, SMART_RESULT, calls=smart_calls)),
+                   mock.patch.object(tutor.doc_processor, "search_documents",
+                                     side_effect=slow(0, DOC_RESULTS, calls=search_calls)))
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return tutor
+
+    def test_cache_hit_streams_without_search(self):
+        """الإجابة المخزنة تُبث بنفس أقسامها دون تشغيل النموذج أو البحث"""
+        smart_calls, search_calls = [], []
+        tutor = self.make_streaming_tutor(smart_calls, search_calls)
+
+        first = list(tutor.stream_question("ما هو الجبر؟"))
+        self.assertEqual(first[-2], ("document", DOC_RESULTS[0]["content"]))
+        self.assertEqual((len(smart_calls), len(search_calls)), (1, 1))
+
+        second = list(tutor.stream_question("ما هو الجبر؟"))
+        self.assertEqual((len(smart_calls), len(search_calls)), (1, 1))
+        self.assertEqual(second[:-1], [item for item in first[:-1] if item[0] != "document"])
+        self.assertEqual(second[-1][1]["answer"], SMART_RESULT["answer"])
+
+    def test_concurrent_streams_share_one_model_pass(self):
+        """بثان متزامنان لنفس السؤال يتشاركان تمريرة النموذج عبر inflight"""
+        smart_calls, search_calls = [], []
+        tutor = self.make_streaming_tutor(smart_calls, search_calls)
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            streams = list(pool.map(lambda _: list(tutor.stream_question("ما هو الجبر؟")), range(2)))
+
+        self.assertEqual(len(smart_calls), 1)
+        self.assertEqual(tutor.inflight.coalesced, 1)
+        self.assertEqual(streams[0], streams[1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+# tests/test_text_normalization.py
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.text_normalization import normalize_text
+from models.knowledge_base import EducationalKnowledgeBase
+from models.answer_generator import SmartAnswerGenerator
+from core.cache_system import SmartCache
+
+class TestTextNormalization(unittest.TestCase):
+    """اختبارات التطبيع الموحد للنصوص العربية"""
+    
+    def test_normalize_text(self):
+        """الهمزات والألف المقصورة والتاء المربوطة والتشكيل والتطويل والمسافات"""
+        cases = [
+            ("أَحْمَدُ", "احمد"),
+            ("إعراب آية", "اعراب ايه"),
+            ("على مدرسة", "علي مدرسه"),
+            ("الـــجبر", "الجبر"),
+            ("  What   IS  ", "what is"),
+            ("١٢٣", "123"),
+            ("", "")
+        ]
+        for text, expected in cases:
+            with self.subTest(text=text):
+                self.assertEqual(normalize_text(text), expected)
+        self.assertEqual(normalize_text(normalize_text("إِعْرابٌ")), normalize_text("إِعْرابٌ"))
+    
+    def test_variants_match_at_query_time(self):
+        """الصيغ المختلفة لنفس الكلمة تعطي نفس المادة والمفهوم ونوع السؤال"""
+        kb = EducationalKnowledgeBase()
+        generator = SmartAnswerGenerator(kb, snapshot_path=None)
+        
+        self.assertEqual(kb.subject_scores("حَلُّ المُعَادَلَةِ", "ar"), kb.subject_scores("حل المعادلة", "ar"))
+        self.assertEqual(kb.detect_subject("ما هو الإِعْـــرَاب؟", "ar"), "arabic")
+        self.assertEqual(generator.find_relevant_concepts("ما هو الجَبْر", "math", "ar"), ["algebra"])
+        self.assertEqual(generator.detect_question_type("مقارنه بين الجبر والهندسة", "ar"), "comparison")
+    
+    def test_cache_key_ignores_variants(self):
+        """مفتاح التخزين المؤقت واحد لصيغ السؤال المختلفة"""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = SmartCache(cache_dir=cache_dir)
+            self.assertEqual(cache.get_cache_key("ما هي المعادلة؟", "math"),
+                             cache.get_cache_key("ما هى المُعادلـة؟ ", "math"))
+
+class RecordingEncoder:
+    """بديل نموذج التضمين يسجل النصوص التي تصله"""
+    
+    def __init__(self, model_name):
+        self.texts = []
+    
+    def encode(self, texts, show_progress_bar=False, convert_to_numpy=True):
+        self.texts.extend(texts)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+class TestDocumentNormalization(unittest.TestCase):
+    """التطبيع لمفاتيح المفاهيم فقط؛ نموذج التضمين يرى النص الأصلي"""
+    
+    def test_embeddings_use_raw_text(self):
+        """الأجزاء والأسئلة والمفاهيم تُضمَّن بنصها الأصلي، والصيغ المختلفة لنفس الجملة مفهوم واحد"""
+        with tempfile.TemporaryDirectory() as temp_dir, \
+             mock.patch("core.document_processor.SentenceTransformer", RecordingEncoder):
+            from core.document_processor import DocumentProcessor
+            processor = DocumentProcessor(base_dir=Path(temp_dir) / "docs")
+            
+            document = Path(temp_dir) / "arabic.txt"
+            document.write_text("إعراب الجملة الاسمية مهم جدا.\nإِعْرابُ الجملة الاسمية مهم جداً.", encoding="utf-8")
+            self.assertTrue(processor.add_document(str(document), "arabic")[0])
+            processor.search_documents("ما هو الإِعْراب؟", "arabic")
+        
+        embedded = processor.model.texts
+        self.assertIn("ما هو الإِعْراب؟", embedded)
+        self.assertIn("إِعْرابُ الجملة الاسمية مهم جداً", embedded)
+        self.assertNotIn(normalize_text("إعراب الجملة الاسمية مهم جدا"), embedded)
+        # الصيغتان مفهوم واحد بمفتاح مطبَّع
+        self.assertEqual(list(processor.ram_knowledge["arabic"]), [normalize_text("إعراب الجملة الاسمية مهم جدا")])
+
+if __name__ == "__main__":
+    unittest.main()
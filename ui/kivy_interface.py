@@ -18,6 +18,22 @@ Window.size = (1000, 700)
 Window.minimum_width = 800
 Window.minimum_height = 600
 
+# أسماء المواد في القائمة ← رموزها في قاعدة المعرفة (None لكل المواد)
+SUBJECT_MAP = {
+    'جميع المواد': None,
+    'الرياضيات': 'math',
+    'اللغة الإنجليزية': 'english',
+    'اللغة الفرنسية': 'french',
+    'العلوم': 'science',
+    'العربية': 'arabic',
+    'الفيزياء': 'physics',
+    'الكيمياء': 'chemistry',
+    'التاريخ': 'history',
+    'الجغرافيا': 'geography',
+    'الفلسفة': 'philosophy',
+    'الاقتصاد': 'economics'
+}
+
 class EnhancedTutorApp(App):
     def __init__(self):
         super().__init__()
@@ -45,7 +61,7 @@ class EnhancedTutorApp(App):
         # اختيار المادة
         self.subject_spinner = Spinner(
             text='جميع المواد',
-            values=['جميع المواد', 'الرياضيات', 'اللغة الإنجليزية', 'اللغة الفرنسية', 'العلوم', 'العربية', 'التاريخ'],
+            values=list(SUBJECT_MAP),
             size_hint=(0.25, 1),
             background_color=(0.3, 0.5, 0.9, 1)
         )
@@ -141,6 +157,11 @@ class EnhancedTutorApp(App):
         threading.Thread(target=init_thread, daemon=True).start()
         self.show_message("🔄 جاري تحميل النظام...")
     
+    def on_stop(self):
+        """إيقاف خيوط المعلم عند إغلاق التطبيق"""
+        if self.tutor:
+            self.tutor.close()
+    
     def toggle_smart_mode(self, instance):
         """تبديل الوضع الذكي"""
         if self.tutor:
@@ -168,29 +189,10 @@ class EnhancedTutorApp(App):
         instance.text = '🔄 جاري المعالجة...'
         
         # الحصول على المادة المختارة
-        subject = None
-        if # في ui/kivy_interface.py - تحديث قائمة المواد
-self.subject_spinner = Spinner(
-    text='جميع المواد',
-    values=[
-        'جميع المواد', 
-        'الرياضيات', 
-        'اللغة الإنجليزية', 
-        'اللغة الفرنسية', 
-        'العلوم', 
-        'العربية',
-        'الفيزياء',      # جديد
-        'الكيمياء',      # جديد  
-        'التاريخ',       # جديد
-        'الجغرافيا',     # جديد
-        'الفلسفة',       # جديد
-        'الاقتصاد'       # جديد
-    ],
-    size_hint=(0.25, 1),
-    background_color=(0.3, 0.5, 0.9, 1)
-        )
-            
-            subject = subject_map.get(self.subject_spinner.text)
+        subject = SUBJECT_MAP.get(self.subject_spinner.text)
+        
+        # الأقسام تُضاف للنتائج تباعاً
+        self.results_label.text = f"[b][size=18]❓ السؤال:[/size][/b]\n{question}\n\n[b][size=18]💡 الإجابة:[/size][/b]\n"
         
         # تشغيل المعالجة في thread منفصل
         threading.Thread(
@@ -200,30 +202,31 @@ self.subject_spinner = Spinner(
         ).start()
     
     def process_question_thread(self, question, subject, button):
-        """معالجة السؤال في thread منفصل"""
+        """معالجة السؤال في thread منفصل وعرض كل قسم فور جهوزيته"""
         try:
-            result = self.tutor.process_question(question, subject, self.tutor.smart_mode)
-            
-            # تحديث الواجهة في thread الرئيسي
-            Clock.schedule_once(lambda dt: self.display_result(result, button, question), 0)
+            for section, content in self.tutor.stream_question(question, subject, self.tutor.smart_mode):
+                # تحديث الواجهة في thread الرئيسي
+                if section == 'result':
+                    Clock.schedule_once(lambda dt, result=content: self.display_result(result, button), 0)
+                else:
+                    Clock.schedule_once(lambda dt, section=section, content=content: self.append_section(section, content), 0)
             
         except Exception as e:
-            Clock.schedule_once(lambda dt: self.show_error(f"خطأ في المعالجة: {str(e)}", button), 0)
+            Clock.schedule_once(lambda dt, error=str(e): self.show_error(f"خطأ في المعالجة: {error}", button), 0)
+    
+    def append_section(self, section, content):
+        """إضافة قسم من الإجابة إلى النتائج"""
+        if section == 'document':
+            content = f"[b]📄 من المستندات:[/b]\n{content}"
+        self.results_label.text += f"{content}\n\n"
     
-    def display_result(self, result, button, question):
-        """عرض النتيجة"""
+    def display_result(self, result, button):
+        """عرض معلومات الإجابة بعد اكتمالها"""
         # إعادة تمكين الزر
         button.disabled = False
         button.text = '🔍 اسأل'
         
-        # تنسيق النتيجة
-        result_text = f"""[b][size=18]❓ السؤال:[/size][/b]
-{question}
-
-[b][size=18]💡 الإجابة:[/size][/b]
-{result['answer']}
-
-[b]📊 معلومات الإجابة:[/b]
+        self.results_label.text += f"""[b]📊 معلومات الإجابة:[/b]
 • نوع الإجابة: {result['type']}
 • المصدر: {result['source']}
 • المادة: {result['subject']}
@@ -231,8 +234,6 @@ self.subject_spinner = Spinner(
 
 {'🎯' * 20}
 """
-        
-        self.results_label.text = result_text
     
     def show_file_chooser(self, instance):
         """عرض نافذة اختيار الملف"""
@@ -251,9 +252,7 @@ self.subject_spinner = Spinner(
         def add_document(path):
             if file_chooser.selection:
                 selected_file = file_chooser.selection[0]
-                subject = self.subject_spinner.text
-                if subject == 'جميع المواد':
-                    subject = 'general'
+                subject = SUBJECT_MAP.get(self.subject_spinner.text) or 'general'
                 
                 success, message = self.tutor.add_document(selected_file, subject)
                 if success:
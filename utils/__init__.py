@@ -9,10 +9,12 @@ from .helpers import (
     safe_filename,
     load_json,
     save_json,
+    atomic_write_bytes,
     format_confidence,
     clean_text,
     detect_file_type
 )
+from .text_normalization import normalize_text
 
 __all__ = [
     'Config',
@@ -20,7 +22,9 @@ __all__ = [
     'safe_filename', 
     'load_json',
     'save_json',
+    'atomic_write_bytes',
     'format_confidence',
     'clean_text',
-    'detect_file_type'
+    'detect_file_type',
+    'normalize_text'
 ]
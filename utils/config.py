@@ -7,7 +7,7 @@ class Config:
     
     # المسارات
     BASE_DIR = Path(__file__).parent.parent
-    DATA_DIR = BASE_DIR / "data"
+    DATA_DIR = Path(os.environ.get("SMARTTUTOR_DATA_DIR", BASE_DIR / "data"))
     MODELS_DIR = BASE_DIR / "models"
     CORE_DIR = BASE_DIR / "core"
     UI_DIR = BASE_DIR / "ui"
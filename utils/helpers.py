@@ -1,7 +1,9 @@
 # utils/helpers.py
+import os
 import re
 import json
 import logging
+import tempfile
 from typing import List, Dict, Any
 from pathlib import Path
 
@@ -44,6 +46,25 @@ def save_json(data: Dict[str, Any], file_path: Path) -> bool:
         logging.error(f"خطأ في حفظ {file_path}: {e}")
         return False
 
+def atomic_write_bytes(file_path: Path, data: bytes, fsync: bool = False) -> None:
+    """كتابة ملف بشكل ذري: ملف مؤقت في نفس المجلد ثم إعادة تسمية"""
+    file_path = Path(file_path)
+    fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        # os.replace ذري على نفس نظام الملفات، فلا يرى القارئ ملفاً نصف مكتوب
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
 def format_confidence(confidence: float) -> str:
     """تنسيق مستوى الثقة"""
     if confidence > 0.8:
@@ -0,0 +1,29 @@
+# utils/text_normalization.py
+import re
+
+# التشكيل وعلامات القرآن والتطويل تُحذف
+ARABIC_DIACRITICS = "".join(chr(code) for code in range(0x064B, 0x0660)) + "ٰ" + \
+    "".join(chr(code) for code in range(0x06D6, 0x06EE))
+TATWEEL = "ـ"
+
+# توحيد أشكال الحروف: الألف بهمزاتها ← ا، الألف المقصورة ← ي، التاء المربوطة ← ه، والأرقام العربية الهندية ← أرقام لاتينية
+ARABIC_NORMALIZATION_TABLE = str.maketrans({
+    **dict.fromkeys(ARABIC_DIACRITICS + TATWEEL),
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي",
+    "ة": "ه",
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)}
+})
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """التطبيع الموحد للفهرسة والاستعلام: حروف عربية موحدة، بلا تشكيل أو تطويل، أحرف صغيرة ومسافات مفردة
+    
+    يُطبق مرة واحدة على الكلمات المفتاحية والمفاهيم والأجزاء عند الفهرسة، ومرة واحدة على كل سؤال،
+    فتصبح المقارنة تطابقاً تاماً بدلاً من البحث التقريبي.
+    """
+    if not text:
+        return ""
+    return WHITESPACE_PATTERN.sub(" ", text.translate(ARABIC_NORMALIZATION_TABLE).lower()).strip()